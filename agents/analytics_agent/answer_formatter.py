@@ -0,0 +1,224 @@
+# agents/analytics_agent/answer_formatter.py
+"""
+Template-based answers for common result shapes.
+
+Recognizes a single scalar, a single row, a small ranked list and a time
+series from the column value types and names, and phrases them without an
+LLM call. Irregular shapes return None so the caller can fall back to the
+LLM summary.
+"""
+
+import os
+from decimal import Decimal
+from datetime import date, datetime
+
+FORMAT_MODES = ('auto', 'local', 'llm')
+DEFAULT_FORMAT_MODE = os.getenv('ANALYTICS_FORMAT_MODE', 'auto')
+
+MAX_RANKED_ROWS = 10
+# More numeric columns than this are left to the LLM rather than dropped
+MAX_METRICS = 3
+
+# Column-name words that say how a number should read
+MONEY_WORDS = {'revenue', 'amount', 'sales', 'price', 'cost', 'value', 'spend', 'spent', 'profit', 'subtotal', 'aov', 'ltv'}
+PERCENT_WORDS = {'percent', 'percentage', 'pct', 'rate', 'ratio', 'share', 'margin'}
+COUNT_WORDS = {'count', 'number', 'num', 'quantity', 'qty', 'units', 'orders', 'customers', 'products', 'items'}
+# Per-row figures that do not add up across rows (a sum of averages means nothing)
+NON_ADDITIVE_WORDS = PERCENT_WORDS | {'avg', 'average', 'mean', 'median', 'per', 'min', 'max', 'minimum',
+                                      'maximum', 'price', 'aov', 'ltv', 'score'}
+
+
+def _kind(value) -> str:
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'other'
+    if isinstance(value, (int, float, Decimal)):
+        return 'number'
+    if isinstance(value, (date, datetime)):
+        return 'time'
+    if isinstance(value, str):
+        return 'text'
+    return 'other'
+
+
+def column_kinds(rows: list) -> dict:
+    """Kind per column (number, time, text, other) from its non-null values"""
+    kinds = {}
+    for column in rows[0]:
+        seen = {_kind(row[column]) for row in rows} - {'null'}
+        kinds[column] = seen.pop() if len(seen) == 1 else ('null' if not seen else 'other')
+    return kinds
+
+
+def humanize(column: str) -> str:
+    """total_revenue -> total revenue"""
+    return column.replace('_', ' ').strip()
+
+
+def format_value(column: str, value) -> str:
+    """Render a value using hints from its column name"""
+    if value is None:
+        return 'n/a'
+    words = set(column.lower().split('_'))
+    if isinstance(value, datetime):
+        return value.strftime('%b %d, %Y %H:%M') if (value.hour or value.minute) else value.strftime('%b %d, %Y')
+    if isinstance(value, date):
+        return value.strftime('%b %d, %Y')
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        number = float(value)
+        if words & PERCENT_WORDS:
+            # Fractions (0.25) read as 25%; values already in percent stay as they are
+            if abs(number) <= 1 and not words & {'percent', 'percentage', 'pct'}:
+                number *= 100
+            return f"{number:.1f}%"
+        if words & MONEY_WORDS and not words & COUNT_WORDS:
+            return f"${number:,.2f}"
+        if isinstance(value, int) or (isinstance(value, Decimal) and value == value.to_integral_value()):
+            return f"{int(value):,}"
+        return f"{number:,.2f}"
+    return str(value)
+
+
+def is_additive(column: str) -> bool:
+    """Whether values of a count or money column can be summed across rows"""
+    words = set(column.lower().split('_'))
+    return bool(words & (COUNT_WORDS | MONEY_WORDS)) and not words & NON_ADDITIVE_WORDS
+
+
+def _join(parts: list) -> str:
+    if len(parts) <= 1:
+        return ''.join(parts)
+    return ', '.join(parts[:-1]) + ' and ' + parts[-1]
+
+
+def _sorted_by(rows: list, column: str, descending: bool) -> bool:
+    values = [row[column] for row in rows if row[column] is not None]
+    return len(values) == len(rows) and values == sorted(values, reverse=descending)
+
+
+def _scalar(rows, kinds):
+    column, value = next(iter(rows[0].items()))
+    return f"The {humanize(column)} is {format_value(column, value)}."
+
+
+def _single_row(rows, kinds):
+    parts = [f"{humanize(c)}: {format_value(c, v)}" for c, v in rows[0].items() if kinds[c] != 'other']
+    if not parts:
+        return None
+    text = '; '.join(parts)
+    return text[0].upper() + text[1:] + '.'
+
+
+def _ranked_list(rows, kinds):
+    labels = [c for c, k in kinds.items() if k == 'text']
+    metrics = [c for c, k in kinds.items() if k == 'number']
+    if not labels or not metrics or len(metrics) > MAX_METRICS or len(rows) > MAX_RANKED_ROWS:
+        return None
+
+    label = labels[0]
+    # The metric the rows are ranked by (descending first), else the first numeric column
+    metric = next(
+        (m for descending in (True, False) for m in metrics if _sorted_by(rows, m, descending)),
+        metrics[0]
+    )
+    others = [m for m in metrics if m != metric]
+    items = []
+    for row in rows:
+        values = [format_value(metric, row[metric])]
+        values += [f"{humanize(m)} {format_value(m, row[m])}" for m in others]
+        name = row[label] if row[label] is not None else 'Unknown'
+        items.append(f"{name} ({', '.join(values)})")
+    return f"By {humanize(metric)}: {_join(items)}."
+
+
+def _series_metric(rows, period, metric, stats, complete, only):
+    """How one metric of a time series reads: totals for counts/money, range otherwise"""
+    column = stats.get(metric, {})
+    valued = [r for r in rows if r[metric] is not None]
+    if is_additive(metric):
+        total = column.get('sum')
+        if total is None:
+            total = sum(r[metric] for r in valued)
+        text = f"{humanize(metric)} totaled {format_value(metric, total)}"
+        if complete and valued:
+            peak = max(valued, key=lambda r: r[metric])
+            at = f"{format_value(metric, peak[metric])} on {format_value(period, peak[period])}"
+            text += f", peaking at {at}" if only else f" (peak {at})"
+        return text
+
+    low, high = column.get('min'), column.get('max')
+    if low is None or high is None:
+        if not valued:
+            return None
+        low, high = min(r[metric] for r in valued), max(r[metric] for r in valued)
+    text = f"{humanize(metric)} ranged from {format_value(metric, low)} to {format_value(metric, high)}"
+    dated = [r for r in rows if r[period] is not None]
+    if complete and dated:
+        # The latest period's own value, even when it is missing (n/a)
+        latest = max(dated, key=lambda r: r[period])
+        text += f" ({format_value(metric, latest[metric])} in the latest period)"
+    return text
+
+
+def _time_series(rows, kinds, summary):
+    times = [c for c, k in kinds.items() if k == 'time']
+    metrics = [c for c, k in kinds.items() if k == 'number']
+    texts = [c for c, k in kinds.items() if k == 'text']
+    if len(times) != 1 or not metrics or len(metrics) > MAX_METRICS or texts or len(rows) < 2:
+        return None
+
+    period = times[0]
+    complete = summary is None or (summary['complete'] and summary['row_count'] == len(rows))
+    stats = (summary or {}).get('columns', {})
+    count = summary['row_count'] if summary else len(rows)
+
+    if period in stats and 'min' in stats[period]:
+        first, last = stats[period]['min'], stats[period]['max']
+    else:
+        first, last = min(r[period] for r in rows), max(r[period] for r in rows)
+
+    parts = [_series_metric(rows, period, m, stats, complete, len(metrics) == 1) for m in metrics]
+    if None in parts:
+        return None
+    return (f"Across {count:,} periods from {format_value(period, first)} to {format_value(period, last)}, "
+            f"{_join(parts)}.")
+
+
+def format_locally(results: list, summary: dict = None):
+    """
+    Phrase a result without the LLM.
+
+    Returns:
+        (answer, shape) or (None, None) when the shape is irregular
+    """
+    if not results:
+        return "No data found for your query.", 'empty'
+
+    kinds = column_kinds(results)
+    row_count = summary['row_count'] if summary else len(results)
+
+    if row_count == 1 and len(kinds) == 1 and kinds[next(iter(kinds))] != 'other':
+        return _scalar(results, kinds), 'scalar'
+    if row_count == 1:
+        answer = _single_row(results, kinds)
+        return (answer, 'single_row') if answer else (None, None)
+
+    answer = _time_series(results, kinds, summary)
+    if answer:
+        return answer, 'time_series'
+    if row_count == len(results):
+        answer = _ranked_list(results, kinds)
+        if answer:
+            return answer, 'ranked_list'
+    return None, None
+
+
+def format_generic(results: list, summary: dict = None) -> str:
+    """Plain rendering for any shape (used when the local path is forced)"""
+    row_count = summary['row_count'] if summary else len(results)
+    more = '' if not summary or summary['complete'] else '+'
+    lines = [f"{row_count:,}{more} rows."]
+    for row in results[:10]:
+        lines.append('; '.join(f"{humanize(c)}: {format_value(c, v)}" for c, v in row.items()))
+    return ' '.join(lines) if len(lines) <= 2 else '\n'.join(lines)
@@ -45,6 +45,7 @@ class AnalyticsAgentChat:
         print("  - 'stats' - Show quick business statistics")
         print("  - 'top' - Show top selling products")
         print("  - 'customers' - Show customer insights")
+        print("  - 'trends' - Show the monthly revenue trend and forecast")
         print("  - 'examples' - Show example questions")
         print("  - 'help' - Show this help")
         print("  - 'quit' or 'exit' - Exit the chat")
@@ -85,7 +86,8 @@ class AnalyticsAgentChat:
         
         # Print row count
         if 'row_count' in result:
-            print(f"[STATS] Rows returned: {result['row_count']}")
+            more = "" if result.get('row_count_complete', True) else "+"
+            print(f"[STATS] Rows returned: {result['row_count']}{more}")
         
         # Print stats if present
         if 'stats' in result:
@@ -170,6 +172,12 @@ class AnalyticsAgentChat:
             self.format_response(result)
             return True
         
+        elif command == 'trends':
+            print("\n[WAIT] Computing revenue trends...")
+            result = self.analytics.get_sales_trends()
+            self.format_response(result)
+            return True
+        
         else:
             # Treat as a natural language question
             print("\n[WAIT] Processing your question...")
@@ -0,0 +1,123 @@
+# agents/analytics_agent/deadline.py
+"""
+Per-request time budgets for the analytics tools.
+
+The MCP layer (call_analytics_tool) opens a deadline for every tool call,
+from the caller's timeout_ms or ANALYTICS_REQUEST_BUDGET_MS. The deadline
+lives in a context variable, so every stage of the call sees it without
+extra arguments: LLM requests get a client timeout, SQL a statement_timeout
+and pool waits a cutoff, each no longer than the time left. Optional
+stages (semantic SQL-cache lookup, schema linking, the LLM summary) are
+skipped when the time left would not also cover the stages after them,
+and are listed under 'degraded'. A required stage that cannot start in
+time raises DeadlineExceeded.
+
+Work handed to other threads keeps the deadline via bind().
+"""
+
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Budget for calls that do not set timeout_ms (0: no deadline)
+DEFAULT_BUDGET_MS = int(os.getenv('ANALYTICS_REQUEST_BUDGET_MS', '30000'))
+
+# Time kept back for the stages after SQL generation and after the query
+GENERATION_RESERVE_MS = int(os.getenv('ANALYTICS_DEADLINE_GENERATION_MS', '4000'))
+QUERY_RESERVE_MS = int(os.getenv('ANALYTICS_DEADLINE_QUERY_MS', '1000'))
+# Shortest time an optional stage is started with
+STAGE_MIN_MS = int(os.getenv('ANALYTICS_DEADLINE_STAGE_MIN_MS', '1000'))
+# Below this, answers are phrased locally instead of by the LLM
+SUMMARY_MIN_MS = int(os.getenv('ANALYTICS_DEADLINE_SUMMARY_MS', '1500'))
+
+_current = contextvars.ContextVar('analytics_deadline', default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """A required stage could not run within the request's time budget"""
+
+    def __init__(self, stage: str, deadline: 'Deadline'):
+        super().__init__(f"Time budget of {deadline.budget_ms} ms ran out before {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    """A point in time a request must finish by, and the stages it skipped to get there"""
+
+    def __init__(self, budget_ms: int):
+        self.budget_ms = int(budget_ms)
+        self.started = time.monotonic()
+        self.expires_at = self.started + self.budget_ms / 1000
+        self.degraded = []
+        self._lock = threading.Lock()
+
+    def remaining_ms(self) -> float:
+        return max((self.expires_at - time.monotonic()) * 1000, 0.0)
+
+    def allows(self, stage: str, needed_ms: float) -> bool:
+        """Whether an optional stage fits; records it as degraded when it does not"""
+        if self.remaining_ms() > needed_ms:
+            return True
+        with self._lock:
+            if stage not in self.degraded:
+                self.degraded.append(stage)
+        return False
+
+    def ms_for(self, stage: str, reserve_ms: float = 0) -> int:
+        """Milliseconds a required stage may take, leaving reserve_ms for what follows"""
+        available = self.remaining_ms() - reserve_ms
+        if available < 1:
+            # Keep going on the last of the budget rather than fail a stage that may be quick
+            available = self.remaining_ms()
+        if available < 1:
+            raise DeadlineExceeded(stage, self)
+        return int(available)
+
+    def as_dict(self) -> dict:
+        return {
+            'budget_ms': self.budget_ms,
+            'elapsed_ms': round((time.monotonic() - self.started) * 1000, 1),
+            'degraded': list(self.degraded)
+        }
+
+
+def current_deadline():
+    """The deadline of the call in progress (None outside one)"""
+    return _current.get()
+
+
+@contextmanager
+def deadline_scope(budget_ms=None):
+    """
+    Run a call under a budget_ms deadline (ANALYTICS_REQUEST_BUDGET_MS when None).
+
+    Inside an existing deadline the earlier of the two applies.
+    """
+    budget_ms = DEFAULT_BUDGET_MS if budget_ms is None else int(budget_ms)
+    outer = _current.get()
+    deadline = Deadline(budget_ms) if budget_ms > 0 else None
+    if outer is not None and (deadline is None or outer.expires_at <= deadline.expires_at):
+        deadline = outer
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def bind(fn):
+    """fn running under the caller's deadline in whichever thread calls it"""
+    deadline = _current.get()
+
+    def bound(*args, **kwargs):
+        token = _current.set(deadline)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return bound
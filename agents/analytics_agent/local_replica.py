@@ -0,0 +1,419 @@
+# agents/analytics_agent/local_replica.py
+"""
+Optional in-process DuckDB copy of the analytics tables.
+
+Each Postgres schema gets its own in-memory DuckDB database holding the
+tables tracked in analytics_table_versions. A table is copied whole (COPY
+out of Postgres, Arrow CSV reader, INSERT in DuckDB) whenever its write
+counter moves, so only the tables that changed are re-synced, in a
+background thread.
+
+A query is answered locally when every table it reads is in sync with
+Postgres (the counters are checked per query), or was synced less than
+ANALYTICS_REPLICA_MAX_LAG seconds ago. Anything else falls back to
+Postgres: stale or untracked tables, tables over
+ANALYTICS_REPLICA_MAX_ROWS, and SQL that DuckDB rejects.
+
+Needs duckdb and pyarrow (pip install "streamlineagents[replica]") and
+ANALYTICS_LOCAL_REPLICA=true.
+"""
+
+import io
+import os
+import re
+import time
+import threading
+import psycopg2
+import psycopg2.errors
+from psycopg2.extras import RealDictCursor
+from dotenv import load_dotenv
+
+from agents.analytics_agent.result_cache import table_versions
+from agents.analytics_agent.result_stream import read_stream
+
+try:
+    import duckdb
+    import pyarrow.csv as pa_csv
+except ImportError:  # duckdb and pyarrow are optional
+    duckdb = None
+    pa_csv = None
+
+load_dotenv()
+
+TRACKED_TABLES_QUERY = """
+SELECT v.table_name, v.version, GREATEST(c.reltuples, 0)::bigint AS estimated_rows
+FROM public.analytics_table_version_values v
+JOIN pg_catalog.pg_namespace n ON n.nspname = v.table_schema
+JOIN pg_catalog.pg_class c ON c.relnamespace = n.oid AND c.relname = v.table_name
+WHERE v.table_schema = %s;
+"""
+
+COLUMNS_QUERY = """
+SELECT a.attname AS column_name, format_type(a.atttypid, a.atttypmod) AS data_type
+FROM pg_catalog.pg_attribute a
+JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = %s
+AND c.relname = %s
+AND a.attnum > 0
+AND NOT a.attisdropped
+ORDER BY a.attnum;
+"""
+
+# Postgres types DuckDB reads the same way; everything else is kept as text
+TYPE_MAP = {
+    'smallint': 'SMALLINT',
+    'integer': 'INTEGER',
+    'bigint': 'BIGINT',
+    'real': 'REAL',
+    'double precision': 'DOUBLE',
+    'boolean': 'BOOLEAN',
+    'date': 'DATE',
+    'uuid': 'UUID',
+    'timestamp without time zone': 'TIMESTAMP',
+    'timestamp with time zone': 'TIMESTAMPTZ',
+    'time without time zone': 'TIME',
+    'interval': 'INTERVAL',
+}
+
+NUMERIC_TYPE = re.compile(r'^numeric\((\d+),(\d+)\)$')
+
+
+def duckdb_type(pg_type: str) -> str:
+    """DuckDB column type for a format_type() string"""
+    match = NUMERIC_TYPE.match(pg_type)
+    if match:
+        precision, scale = int(match.group(1)), int(match.group(2))
+        return f"DECIMAL({precision},{scale})" if precision <= 38 else 'DOUBLE'
+    if pg_type == 'numeric':
+        # Unconstrained numeric would be truncated to DuckDB's default DECIMAL(18,3)
+        return 'DOUBLE'
+    return TYPE_MAP.get(pg_type, 'VARCHAR')
+
+
+def quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def duckdb_sql(query: str, params=None):
+    """psycopg2 placeholders -> DuckDB ones; None when they can't be mapped"""
+    if not params:
+        return query
+    if isinstance(params, dict) or '%(' in query:
+        return None
+    return re.sub(r'%[s%]', lambda m: '?' if m.group() == '%s' else '%', query)
+
+
+DEFAULT_NAME = re.compile(r'^(\w+)\((.*)\)$', re.DOTALL)
+
+
+def postgres_column_name(name: str) -> str:
+    """
+    Postgres's name for an unaliased output column, from DuckDB's.
+
+    DuckDB names "count(*)" count_star() and "sum(x)" sum(x) where Postgres
+    says count and sum; a cast keeps the name of the column being cast.
+    """
+    match = DEFAULT_NAME.match(name)
+    if not match:
+        return name
+    function, argument = match.group(1).lower(), match.group(2)
+    if function == 'count_star':
+        return 'count'
+    if function == 'cast':
+        inner = re.match(r'^(?:\w+\.)?(\w+)\s+AS\s', argument, re.IGNORECASE)
+        return inner.group(1) if inner else '?column?'
+    return function
+
+
+class ReplicaTimeout(Exception):
+    """A local query ran past its statement timeout"""
+
+
+class _SchemaReplica:
+    """DuckDB database mirroring the tracked tables of one Postgres schema"""
+
+    def __init__(self, memory_limit: str = None):
+        config = {
+            # Generated SQL must not reach files or the network through DuckDB
+            'enable_external_access': False,
+            # Postgres semantics for 7 / 2
+            'integer_division': True,
+        }
+        if memory_limit:
+            config['memory_limit'] = memory_limit
+        self.db = duckdb.connect(':memory:', config=config)
+        self.tables = {}   # table -> (version, snapshot time)
+        self.skipped = {}  # table -> version seen when it was too large to copy
+        self.syncing = False
+
+
+class LocalReplica:
+    """Per-schema DuckDB copies of the analytics tables with Postgres fallback"""
+
+    def __init__(self, enabled: bool = None, max_lag: float = None, max_rows: int = None):
+        if enabled is None:
+            enabled = os.getenv('ANALYTICS_LOCAL_REPLICA', 'false').lower() in ('1', 'true', 'yes')
+        if enabled and duckdb is None:
+            print("⚠️  ANALYTICS_LOCAL_REPLICA is set but duckdb/pyarrow are not installed; "
+                  "queries run on Postgres (pip install duckdb pyarrow)")
+            enabled = False
+        self.enabled = enabled
+        # How long a table may lag Postgres and still be queried locally (0 = never)
+        self.max_lag = float(os.getenv('ANALYTICS_REPLICA_MAX_LAG', '0')) if max_lag is None else max_lag
+        self.max_rows = max_rows or int(os.getenv('ANALYTICS_REPLICA_MAX_ROWS', '2000000'))
+        self.memory_limit = os.getenv('ANALYTICS_REPLICA_MEMORY_LIMIT')
+
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._source = None  # Postgres connection used only by sync threads
+        self._replicas = {}  # schema -> _SchemaReplica
+        self._stats = {'local': 0, 'stale': 0, 'untracked': 0, 'errors': 0, 'syncs': 0, 'sync_errors': 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _replica(self, schema: str) -> _SchemaReplica:
+        with self._lock:
+            replica = self._replicas.get(schema)
+            if replica is None:
+                replica = self._replicas[schema] = _SchemaReplica(self.memory_limit)
+            return replica
+
+    def _servable(self, replica: _SchemaReplica, tables: list, versions: dict):
+        """(every table can be read locally, a sync is due)"""
+        now = time.time()
+        servable, due = True, False
+        with self._lock:
+            for table in tables:
+                version = versions.get(table)
+                if version is None or replica.skipped.get(table) == version:
+                    return False, False
+                synced = replica.tables.get(table)
+                if synced and synced[0] == version:
+                    continue
+                due = True
+                if not synced or now - synced[1] > self.max_lag:
+                    servable = False
+        return servable, due
+
+    def run(self, conn, schema: str, tables: list, query: str, params=None,
+            max_rows: int = None, timeout_ms: int = None):
+        """
+        Answer a query from the local copy.
+
+        Args:
+            conn: Postgres connection (used to read the tables' write counters)
+            schema: Postgres schema the query targets
+            tables: Tables the query reads
+            query, params: The query as it would run on Postgres
+            max_rows: Stream with this row cap (None = fetch every row)
+            timeout_ms: Interrupt the local query after this long
+
+        Returns:
+            (rows, summary) - summary is None unless max_rows is given - or
+            None when the query should run on Postgres instead
+
+        Raises:
+            ReplicaTimeout: the local query ran past timeout_ms
+        """
+        if not self.enabled or not tables:
+            return None
+        sql = duckdb_sql(query, params)
+        if sql is None:
+            return None
+
+        try:
+            versions = table_versions(conn, schema, tables)
+        except psycopg2.errors.UndefinedTable:
+            print("⚠️  analytics_table_versions does not exist; local replica disabled "
+                  "(run database/migrations/create_analytics_table_versions.sql)")
+            self.enabled = False
+            conn.rollback()
+            return None
+
+        replica = self._replica(schema)
+        servable, due = self._servable(replica, tables, versions)
+        if due:
+            self._schedule_sync(schema, replica)
+        if not servable:
+            self._count('stale' if due else 'untracked')
+            return None
+
+        cur = replica.db.cursor()
+        timer = threading.Timer(timeout_ms / 1000, cur.interrupt) if timeout_ms else None
+        try:
+            if timer:
+                timer.start()
+            cur.execute(sql, list(params) if params else None)
+            names = [postgres_column_name(desc[0]) for desc in cur.description]
+
+            def fetch(n):
+                return [dict(zip(names, row)) for row in cur.fetchmany(n)]
+
+            if max_rows is None:
+                results, summary = [dict(zip(names, row)) for row in cur.fetchall()], None
+            else:
+                summary = read_stream(fetch, max_rows)
+                results = summary.pop('rows')
+        except duckdb.InterruptException:
+            raise ReplicaTimeout(f"Local query interrupted after {timeout_ms} ms")
+        except duckdb.Error:
+            # Postgres-only syntax or functions; Postgres will run it
+            self._count('errors')
+            return None
+        finally:
+            if timer:
+                timer.cancel()
+            cur.close()
+
+        self._count('local')
+        return results, summary
+
+    def _schedule_sync(self, schema: str, replica: _SchemaReplica):
+        with self._lock:
+            if replica.syncing:
+                return
+            replica.syncing = True
+        threading.Thread(target=self.sync, args=(schema,), daemon=True).start()
+
+    def _source_connection(self):
+        if self._source is None or self._source.closed:
+            self._source = psycopg2.connect(os.getenv('DATABASE_URL'))
+        return self._source
+
+    def sync(self, schema: str) -> list:
+        """
+        Copy every tracked table of the schema whose counter moved.
+
+        Returns:
+            Names of the tables copied
+        """
+        replica = self._replica(schema)
+        copied = []
+        try:
+            with self._sync_lock:
+                conn = self._source_connection()
+                try:
+                    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                        cur.execute(TRACKED_TABLES_QUERY, (schema,))
+                        tracked = cur.fetchall()
+                    conn.rollback()
+                    for row in tracked:
+                        table, version = row['table_name'], row['version']
+                        synced = replica.tables.get(table)
+                        if (synced and synced[0] == version) or replica.skipped.get(table) == version:
+                            continue
+                        if row['estimated_rows'] > self.max_rows:
+                            replica.skipped[table] = version
+                            continue
+                        try:
+                            self._copy_table(conn, replica, schema, table)
+                            copied.append(table)
+                        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                            raise
+                        except Exception as e:
+                            # One table failing must not keep the others stale
+                            self._count('sync_errors')
+                            print(f"⚠️  Local replica could not copy {schema}.{table}: {e}")
+                except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                    conn.close()
+                    raise
+                finally:
+                    if not conn.closed:
+                        conn.rollback()
+        except Exception as e:
+            self._count('sync_errors')
+            print(f"⚠️  Local replica sync failed for schema {schema}: {e}")
+        finally:
+            with self._lock:
+                replica.syncing = False
+        return copied
+
+    def _copy_table(self, conn, replica: _SchemaReplica, schema: str, table: str):
+        """Replace the local copy of one table with a consistent snapshot"""
+        # Counter and rows from one snapshot, so the version matches the data
+        conn.rollback()
+        conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+        try:
+            snapshot_at = time.time()
+            version = table_versions(conn, schema, [table])[table]
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(COLUMNS_QUERY, (schema, table))
+                columns = [(c['column_name'], duckdb_type(c['data_type'])) for c in cur.fetchall()]
+            column_list = ', '.join(quote_ident(name) for name, _ in columns)
+            buffer = io.BytesIO()
+            with conn.cursor() as cur:
+                cur.copy_expert(
+                    f"COPY (SELECT {column_list} FROM {quote_ident(schema)}.{quote_ident(table)}) "
+                    f"TO STDOUT WITH (FORMAT csv)",
+                    buffer
+                )
+        finally:
+            conn.rollback()
+            conn.set_session(isolation_level='DEFAULT', readonly='DEFAULT')
+
+        # Everything is read as text and cast by DuckDB; "" stays an empty string, unquoted empty is NULL
+        # (an empty table gives an empty buffer, which the CSV reader rejects)
+        buffer.seek(0)
+        names = [name for name, _ in columns]
+        data = None
+        if buffer.getbuffer().nbytes:
+            data = pa_csv.read_csv(
+                buffer,
+                read_options=pa_csv.ReadOptions(column_names=names),
+                convert_options=pa_csv.ConvertOptions(
+                    column_types={name: 'string' for name in names},
+                    null_values=[''],
+                    strings_can_be_null=True,
+                    quoted_strings_can_be_null=False
+                )
+            )
+
+        staging = quote_ident(f"{table}__sync")
+        casts = ', '.join(f"CAST({quote_ident(name)} AS {kind})" for name, kind in columns)
+        definition = ', '.join(f"{quote_ident(name)} {kind}" for name, kind in columns)
+        cur = replica.db.cursor()
+        try:
+            cur.execute(f"CREATE OR REPLACE TABLE {staging} ({definition})")
+            if data is not None:
+                cur.register('analytics_sync_source', data)
+                cur.execute(f"INSERT INTO {staging} SELECT {casts} FROM analytics_sync_source")
+                cur.unregister('analytics_sync_source')
+            cur.execute("BEGIN TRANSACTION")
+            cur.execute(f"DROP TABLE IF EXISTS {quote_ident(table)}")
+            cur.execute(f"ALTER TABLE {staging} RENAME TO {quote_ident(table)}")
+            cur.execute("COMMIT")
+        finally:
+            cur.close()
+
+        with self._lock:
+            replica.tables[table] = (version, snapshot_at)
+            replica.skipped.pop(table, None)
+        self._count('syncs')
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(
+                self._stats,
+                enabled=self.enabled,
+                schemas={
+                    schema: {table: version for table, (version, _) in replica.tables.items()}
+                    for schema, replica in self._replicas.items()
+                }
+            )
+
+
+_replica = None
+_replica_lock = threading.Lock()
+
+
+def get_local_replica() -> LocalReplica:
+    """Process-wide replica shared by every AnalyticsTools instance"""
+    global _replica
+    if _replica is None:
+        with _replica_lock:
+            if _replica is None:
+                _replica = LocalReplica()
+    return _replica
@@ -7,12 +7,24 @@ Provides HTTP interface for the analytics agent tools
 
 import os
 import json
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import queue
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from typing import Dict, Any
 from dotenv import load_dotenv
 
-from agents.analytics_agent.tools import AnalyticsTools
+from agents.analytics_agent.registry import get_registry
 from agents.analytics_agent.schemas import MCP_TOOL_SCHEMAS, TOOL_DESCRIPTIONS
+from agents.analytics_agent.result_encoding import json_default
+from agents.analytics_agent.statements import get_statement_registry
+from agents.analytics_agent.result_cache import get_result_cache
+from agents.analytics_agent.local_replica import get_local_replica
+from agents.analytics_agent.tenants import get_tenant_directory
+from agents.analytics_agent.schema_linking import get_schema_linker
+from agents.analytics_agent.trends import get_trend_cache
+from agents.analytics_agent.segments import get_segment_engine
+from agents.analytics_agent.stock_alerts import get_stock_alert_listener
+from agents.analytics_agent.deadline import deadline_scope
 
 load_dotenv()
 
@@ -58,6 +70,26 @@ class AnalyticsMCPHandler(BaseHTTPRequestHandler):
             self.wfile.write(json.dumps({"status": "healthy", "agent": "analytics"}).encode())
             return
         
+        if self.path == '/metrics':
+            # Prepared-statement timings and cache/replica counters for this process
+            self._set_headers(200)
+            self.wfile.write(json.dumps({
+                "statements": get_statement_registry().stats(),
+                "result_cache": get_result_cache().stats(),
+                "local_replica": get_local_replica().stats(),
+                "tenants": get_tenant_directory().stats(),
+                "schema_linking": get_schema_linker().stats(),
+                "trends": get_trend_cache().stats(),
+                "segments": get_segment_engine().stats(),
+                "stock_alerts": get_stock_alert_listener().stats(),
+                "registry": get_registry().stats()
+            }, default=json_default).encode())
+            return
+        
+        if urlparse(self.path).path == '/alerts':
+            self._stream_alerts()
+            return
+        
         if self.path == '/mcp' or self.path == '/mcp/tools':
             # Return list of available tools
             tools = [
@@ -77,6 +109,39 @@ class AnalyticsMCPHandler(BaseHTTPRequestHandler):
         self._set_headers(404)
         self.wfile.write(json.dumps({"error": "Not found"}).encode())
     
+    def _stream_alerts(self):
+        """Server-sent events: one 'data:' line per stock alert, optionally for one business"""
+        business_id = parse_qs(urlparse(self.path).query).get('business_id', [None])[0]
+        schema = alert_schema(business_id) if business_id else None
+        
+        alerts = queue.Queue(maxsize=1000)
+        def deliver(alert):
+            if schema is None or alert.get('schema') == schema:
+                try:
+                    alerts.put_nowait(alert)
+                except queue.Full:
+                    pass
+        
+        listener = get_stock_alert_listener()
+        listener.start()
+        listener.subscribe(deliver)
+        try:
+            self._set_headers(200, 'text/event-stream')
+            self.wfile.write(b": connected\n\n")
+            self.wfile.flush()
+            while True:
+                try:
+                    alert = alerts.get(timeout=15)
+                    message = f"event: {alert.get('event', 'alert')}\ndata: {json.dumps(alert, default=json_default)}\n\n"
+                except queue.Empty:
+                    message = ": keepalive\n\n"  # also notices clients that went away
+                self.wfile.write(message.encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            listener.unsubscribe(deliver)
+    
     def do_POST(self):
         """Handle POST requests - execute tool calls"""
         if not self._check_auth():
@@ -107,7 +172,7 @@ class AnalyticsMCPHandler(BaseHTTPRequestHandler):
                 result = call_analytics_tool(tool_name, arguments)
                 
                 self._set_headers(200)
-                self.wfile.write(json.dumps({"result": result}).encode())
+                self.wfile.write(json.dumps({"result": result}, default=json_default).encode())
                 return
             
             elif method == 'tools/list':
@@ -143,10 +208,24 @@ class AnalyticsMCPHandler(BaseHTTPRequestHandler):
         print(f"[Analytics MCP] {self.address_string()} - {format % args}")
 
 
+def alert_schema(business_id) -> str:
+    """The schema whose stock alerts belong to the business"""
+    pool = get_registry().pool
+    conn = pool.getconn()
+    try:
+        return get_tenant_directory().schema_for(conn, business_id)
+    finally:
+        conn.rollback()
+        pool.putconn(conn)
+
+
 def call_analytics_tool(tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
     """
     Call an analytics tool with given arguments
     
+    Every call runs under a deadline of arguments['timeout_ms'] (or
+    ANALYTICS_REQUEST_BUDGET_MS), which each stage of the tool respects.
+    
     Args:
         tool_name: Name of the tool to call
         arguments: Dictionary of arguments for the tool
@@ -155,34 +234,72 @@ def call_analytics_tool(tool_name: str, arguments: Dict[str, Any]) -> Dict[str,
         Result dictionary from the tool
     """
     try:
-        # Create analytics tools instance
-        # In production, you might want to pass business_id from arguments
-        business_id = arguments.get('business_id')
-        tools = AnalyticsTools(business_id=business_id)
-        
-        # Route to appropriate tool
-        if tool_name == 'query_database':
-            question = arguments.get('question')
-            if not question:
-                return {"success": False, "error": "Missing required argument: question"}
-            return tools.query_database(question)
-        
-        elif tool_name == 'get_quick_stats':
-            return tools.get_quick_stats()
-        
-        elif tool_name == 'get_top_products':
-            limit = arguments.get('limit', 10)
-            return tools.get_top_products(limit)
-        
-        elif tool_name == 'get_customer_insights':
-            customer_id = arguments.get('customer_id')
-            return tools.get_customer_insights(customer_id)
-        
-        else:
-            return {
-                "success": False,
-                "error": f"Unknown tool: {tool_name}"
-            }
+        with deadline_scope(arguments.get('timeout_ms')):
+            # Reuse the business's long-lived instance (shared pool and LLM client)
+            business_id = arguments.get('business_id')
+            tools = get_registry().get(business_id)
+            
+            # Route to appropriate tool
+            if tool_name == 'query_database':
+                question = arguments.get('question')
+                if not question:
+                    return {"success": False, "error": "Missing required argument: question"}
+                return tools.query_database(
+                    question,
+                    format_mode=arguments.get('format_mode'),
+                    result_format=arguments.get('result_format', 'rows')
+                )
+            
+            elif tool_name == 'query_database_batch':
+                questions = arguments.get('questions')
+                if not questions:
+                    return {"success": False, "error": "Missing required argument: questions"}
+                return tools.query_database_batch(
+                    questions,
+                    format_mode=arguments.get('format_mode'),
+                    result_format=arguments.get('result_format', 'rows')
+                )
+            
+            elif tool_name == 'get_quick_stats':
+                return tools.get_quick_stats()
+            
+            elif tool_name == 'get_top_products':
+                limit = arguments.get('limit', 10)
+                return tools.get_top_products(limit)
+            
+            elif tool_name == 'get_sales_trends':
+                return tools.get_sales_trends(
+                    metric=arguments.get('metric', 'revenue'),
+                    granularity=arguments.get('granularity', 'month'),
+                    periods=arguments.get('periods', 6),
+                    window=arguments.get('window', 7),
+                    forecast_days=arguments.get('forecast_days', 30)
+                )
+            
+            elif tool_name == 'get_customer_segments':
+                return tools.get_customer_segments(
+                    segment=arguments.get('segment'),
+                    limit=arguments.get('limit', 20)
+                )
+            
+            elif tool_name == 'get_customer_cohorts':
+                return tools.get_customer_cohorts(
+                    months=arguments.get('months', 12),
+                    horizon=arguments.get('horizon', 6)
+                )
+            
+            elif tool_name == 'get_low_stock':
+                return tools.get_low_stock(limit=arguments.get('limit', 50))
+            
+            elif tool_name == 'get_customer_insights':
+                customer_id = arguments.get('customer_id')
+                return tools.get_customer_insights(customer_id)
+            
+            else:
+                return {
+                    "success": False,
+                    "error": f"Unknown tool: {tool_name}"
+                }
     
     except Exception as e:
         return {
@@ -200,7 +317,8 @@ def run_server(host='0.0.0.0', port=8020):
         port: Port to listen on (default: 8020)
     """
     server_address = (host, port)
-    httpd = HTTPServer(server_address, AnalyticsMCPHandler)
+    # Threaded: concurrent tool calls share the registry's connection pool
+    httpd = ThreadingHTTPServer(server_address, AnalyticsMCPHandler)
     
     print(f"🚀 Analytics MCP Server starting on {host}:{port}")
     print(f"📊 Analytics Agent ready for business insights")
@@ -213,10 +331,15 @@ def run_server(host='0.0.0.0', port=8020):
     
     print(f"\nAvailable endpoints:")
     print(f"  GET  /health - Health check")
+    print(f"  GET  /metrics - Statement timings and cache counters")
+    print(f"  GET  /alerts - Stock alert event stream (?business_id=...)")
     print(f"  GET  /mcp/tools - List available tools")
     print(f"  POST /mcp - Execute tool calls")
     print(f"\nPress Ctrl+C to stop")
     
+    # Low-stock notifications for /alerts subscribers and ANALYTICS_STOCK_ALERT_WEBHOOK
+    get_stock_alert_listener().start()
+    
     try:
         httpd.serve_forever()
     except KeyboardInterrupt:
@@ -0,0 +1,224 @@
+# agents/analytics_agent/query_cache.py
+"""
+Question -> SQL cache for query_database.
+
+Entries are scoped to a business, schema and SchemaCatalog fingerprint, so
+a schema change naturally retires them. A question is looked up by its
+normalized text first; on a miss the closest cached question by embedding
+similarity is reused when it is close enough and asks about the same
+periods, numbers and qualifiers. Each entry stores the outcome of its last
+run, and entries whose SQL later fails are evicted.
+"""
+
+import os
+import re
+import threading
+import psycopg2
+import psycopg2.errors
+from psycopg2.extras import RealDictCursor
+from dotenv import load_dotenv
+
+from utils.embedding_store import embed_texts
+from utils.embedding_migration import get_embedding_config, vector_literal
+
+load_dotenv()
+
+CACHE_TABLE = 'analytics_query_cache'
+SEMANTIC_CANDIDATES = 5
+
+# Politeness/lead-in words that do not change what is being asked
+FILLER_WORDS = {
+    'please', 'pls', 'kindly', 'hey', 'hi', 'can', 'could', 'would', 'you',
+    'tell', 'show', 'give', 'me', 'us', 'i', 'want', 'to', 'know'
+}
+
+# Words that change the answer even when the rest of the question is identical
+# ("revenue last month" vs "revenue this month"); semantic matches must agree on them
+QUALIFIER_WORDS = {
+    'last', 'this', 'next', 'previous', 'prior', 'current', 'today', 'yesterday',
+    'day', 'days', 'week', 'weeks', 'month', 'months', 'quarter', 'quarters', 'year', 'years',
+    'daily', 'weekly', 'monthly', 'quarterly', 'yearly', 'annual',
+    'top', 'bottom', 'best', 'worst', 'most', 'least', 'highest', 'lowest',
+    'not', 'no', 'without', 'excluding', 'including', 'only',
+    'average', 'avg', 'total', 'sum', 'count', 'median',
+    'completed', 'cancelled', 'canceled', 'pending', 'refunded',
+    'january', 'february', 'march', 'april', 'may', 'june', 'july',
+    'august', 'september', 'october', 'november', 'december'
+}
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, drop punctuation and filler words, collapse whitespace"""
+    words = re.findall(r"[a-z0-9]+(?:\.[0-9]+)?", question.lower())
+    return ' '.join(w for w in words if w not in FILLER_WORDS)
+
+
+def qualifier_terms(normalized: str) -> frozenset:
+    """Numbers and qualifier words of a normalized question"""
+    return frozenset(w for w in normalized.split() if w in QUALIFIER_WORDS or w[0].isdigit())
+
+
+class QueryCache:
+    """Persistent question -> SQL cache in the analytics_query_cache table"""
+
+    def __init__(self, similarity_threshold: float = None, enabled: bool = None):
+        self.similarity_threshold = similarity_threshold or float(os.getenv('ANALYTICS_SQL_CACHE_SIMILARITY', '0.95'))
+        if enabled is None:
+            enabled = os.getenv('ANALYTICS_SQL_CACHE', 'true').lower() in ('1', 'true', 'yes')
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stats = {'exact': 0, 'semantic': 0, 'miss': 0, 'evicted': 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _disable_if_missing(self, error: Exception):
+        if isinstance(error, psycopg2.errors.UndefinedTable):
+            print(f"⚠️  {CACHE_TABLE} does not exist; SQL cache disabled "
+                  f"(run database/migrations/create_analytics_query_cache.sql)")
+            self.enabled = False
+
+    def _embed(self, cur, question: str, llm=None) -> str:
+        model, dimensions = get_embedding_config(CACHE_TABLE, cur=cur)
+        return vector_literal(embed_texts([question], model=model, dimensions=dimensions, client=llm)[0])
+
+    def lookup(self, conn, business_id, schema: str, fingerprint: str, question: str, llm=None,
+               semantic: bool = True):
+        """
+        Find cached SQL for a question (exact matches only with semantic=False).
+
+        Returns:
+            Dict with id, sql_query, match ('exact' or 'semantic') and
+            similarity, or None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        normalized = normalize_question(question)
+        scope = (str(business_id) if business_id else '', schema, fingerprint)
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(f"""
+                    SELECT id, sql_query
+                    FROM public.{CACHE_TABLE}
+                    WHERE business_id = %s AND schema_name = %s AND schema_fingerprint = %s
+                    AND normalized_question = %s AND status = 'ok'
+                """, (*scope, normalized))
+                row = cur.fetchone()
+                if row:
+                    self._count('exact')
+                    return {'id': row['id'], 'sql_query': row['sql_query'], 'match': 'exact', 'similarity': 1.0}
+                if not semantic:
+                    self._count('miss')
+                    return None
+
+                embedding = self._embed(cur, question, llm)
+                cur.execute(f"""
+                    SELECT id, sql_query, normalized_question,
+                           1 - (embedding <=> %s::vector) AS similarity
+                    FROM public.{CACHE_TABLE}
+                    WHERE business_id = %s AND schema_name = %s AND schema_fingerprint = %s
+                    AND status = 'ok' AND embedding IS NOT NULL
+                    ORDER BY embedding <=> %s::vector
+                    LIMIT %s
+                """, (embedding, *scope, embedding, SEMANTIC_CANDIDATES))
+                candidates = cur.fetchall()
+        except Exception as e:
+            print(f"Error reading SQL cache: {e}")
+            self._disable_if_missing(e)
+            return None
+
+        terms = qualifier_terms(normalized)
+        for row in candidates:
+            if row['similarity'] < self.similarity_threshold:
+                break
+            if qualifier_terms(row['normalized_question']) == terms:
+                self._count('semantic')
+                return {
+                    'id': row['id'],
+                    'sql_query': row['sql_query'],
+                    'match': 'semantic',
+                    'similarity': float(row['similarity'])
+                }
+
+        self._count('miss')
+        return None
+
+    def store(self, conn, business_id, schema: str, fingerprint: str, question: str, sql_query: str,
+              status: str = 'ok', row_count: int = None, error: str = None, llm=None,
+              semantic: bool = True):
+        """Record generated SQL and the outcome of running it (semantic=False: no embedding)"""
+        if not self.enabled:
+            return
+
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                embedding = self._embed(cur, question, llm) if status == 'ok' and semantic else None
+                cur.execute(f"""
+                    INSERT INTO public.{CACHE_TABLE}
+                        (business_id, schema_name, schema_fingerprint, normalized_question, question,
+                         sql_query, embedding, status, row_count, last_error)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s::vector, %s, %s, %s)
+                    ON CONFLICT (business_id, schema_name, schema_fingerprint, normalized_question)
+                    DO UPDATE SET
+                        question = EXCLUDED.question,
+                        sql_query = EXCLUDED.sql_query,
+                        embedding = EXCLUDED.embedding,
+                        status = EXCLUDED.status,
+                        row_count = EXCLUDED.row_count,
+                        last_error = EXCLUDED.last_error,
+                        last_used_at = NOW()
+                """, (
+                    str(business_id) if business_id else '', schema, fingerprint,
+                    normalize_question(question), question, sql_query, embedding,
+                    status, row_count, error
+                ))
+            conn.commit()
+        except Exception as e:
+            print(f"Error writing SQL cache: {e}")
+            conn.rollback()
+            self._disable_if_missing(e)
+
+    def record_hit(self, conn, entry_id: int, row_count: int = None):
+        """Note a successful reuse of a cached entry"""
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    UPDATE public.{CACHE_TABLE}
+                    SET hit_count = hit_count + 1, row_count = %s, last_used_at = NOW()
+                    WHERE id = %s
+                """, (row_count, entry_id))
+            conn.commit()
+        except psycopg2.Error as e:
+            print(f"Error updating SQL cache: {e}")
+            conn.rollback()
+
+    def evict(self, conn, entry_id: int):
+        """Drop a cached entry whose SQL no longer works"""
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"DELETE FROM public.{CACHE_TABLE} WHERE id = %s", (entry_id,))
+            conn.commit()
+            self._count('evicted')
+        except psycopg2.Error as e:
+            print(f"Error evicting SQL cache entry: {e}")
+            conn.rollback()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, enabled=self.enabled, similarity_threshold=self.similarity_threshold)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_query_cache() -> QueryCache:
+    """Process-wide SQL cache shared by every AnalyticsTools instance"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = QueryCache()
+    return _cache
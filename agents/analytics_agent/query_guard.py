@@ -0,0 +1,211 @@
+# agents/analytics_agent/query_guard.py
+"""
+Execution guard for LLM-generated SQL.
+
+Generated queries run in a read-only transaction with a statement_timeout.
+Before running, the plan is checked with EXPLAIN: queries whose estimated
+cost or row count exceed the business's limits are rejected, and queries
+expected to return more than the row cap get a LIMIT injected (or their
+own LIMIT tightened). Every run produces a decision dict that is returned
+to the caller alongside the rows.
+"""
+
+import os
+import time
+import threading
+import psycopg2
+import psycopg2.errors
+import sqlglot
+import sqlglot.errors
+from sqlglot import exp
+from psycopg2.extras import RealDictCursor
+from dotenv import load_dotenv
+
+from agents.analytics_agent.sql_validator import DIALECT
+
+load_dotenv()
+
+LIMITS_TTL_SECONDS = 60
+
+
+class QueryGuardError(Exception):
+    """Generated SQL was rejected or stopped by the guard"""
+
+    def __init__(self, message: str, decision: dict):
+        super().__init__(message)
+        self.decision = decision
+
+
+class GuardLimits:
+    """Execution limits for one business"""
+
+    def __init__(self, statement_timeout_ms: int = None, max_plan_cost: float = None,
+                 max_plan_rows: int = None, row_cap: int = None):
+        self.statement_timeout_ms = statement_timeout_ms or int(os.getenv('ANALYTICS_STATEMENT_TIMEOUT_MS', '5000'))
+        self.max_plan_cost = max_plan_cost or float(os.getenv('ANALYTICS_MAX_PLAN_COST', '1000000'))
+        self.max_plan_rows = max_plan_rows or int(os.getenv('ANALYTICS_MAX_PLAN_ROWS', '10000000'))
+        # Rows read (and aggregated) at most; only the head is kept in memory
+        self.row_cap = row_cap or int(os.getenv('ANALYTICS_ROW_CAP', '10000'))
+
+    def capped(self, timeout_ms: int) -> 'GuardLimits':
+        """These limits with the statement timeout cut to timeout_ms (e.g. a request's time left)"""
+        if timeout_ms >= self.statement_timeout_ms:
+            return self
+        return GuardLimits(max(int(timeout_ms), 1), self.max_plan_cost, self.max_plan_rows, self.row_cap)
+
+    def as_dict(self) -> dict:
+        return {
+            'statement_timeout_ms': self.statement_timeout_ms,
+            'max_plan_cost': self.max_plan_cost,
+            'max_plan_rows': self.max_plan_rows,
+            'row_cap': self.row_cap
+        }
+
+
+def _fetch_is_relative(node) -> bool:
+    """FETCH ... PERCENT / WITH TIES: the row count depends on the data"""
+    options = node.args.get('limit_options') if isinstance(node, exp.Fetch) else None
+    return bool(options and (options.args.get('percent') or options.args.get('with_ties')))
+
+
+def _row_limit(node):
+    """Rows a top-level LIMIT / FETCH clause allows; None when unbounded or not a plain count"""
+    if isinstance(node, exp.Limit):
+        count = node.expression
+    elif isinstance(node, exp.Fetch) and not _fetch_is_relative(node):
+        count = node.args.get('count')
+        if count is None:
+            return 1  # FETCH FIRST ROW ONLY
+    else:
+        return None
+    if isinstance(count, exp.Literal) and count.is_int:
+        return int(count.this)
+    return None
+
+
+def apply_row_cap(query: str, row_cap: int):
+    """
+    Set the query's top-level LIMIT to row_cap, unless it already allows
+    no more rows. LIMIT ALL, larger limits and FETCH FIRST clauses are
+    replaced on the parsed query, so OFFSET and ORDER BY are kept;
+    FETCH ... PERCENT / WITH TIES queries are capped from outside instead.
+
+    Returns:
+        (query, changed)
+    """
+    query = query.strip().rstrip(';').rstrip()
+    try:
+        tree = sqlglot.parse_one(query, read=DIALECT)
+    except sqlglot.errors.SqlglotError:
+        tree = None
+    if not isinstance(tree, (exp.Select, exp.SetOperation)) or _fetch_is_relative(tree.args.get('limit')):
+        # No LIMIT to set without changing the result: cap the rows from outside
+        # (new lines keep "-- comments" closed)
+        return f"SELECT * FROM (\n{query}\n) capped\nLIMIT {row_cap}", True
+
+    limit = _row_limit(tree.args.get('limit'))
+    if limit is not None and limit <= row_cap:
+        return query, False
+    tree.set('limit', exp.Limit(expression=exp.Literal.number(row_cap)))
+    return tree.sql(dialect=DIALECT), True
+
+
+class QueryGuard:
+    """Plan checks and read-only, time-boxed execution for generated SQL"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._limits = {}  # business_id -> (expires_at, GuardLimits)
+
+    def limits_for(self, conn, business_id=None) -> GuardLimits:
+        """Limits from analytics_tenant_limits, cached briefly; env defaults otherwise"""
+        key = str(business_id) if business_id else ''
+        with self._lock:
+            cached = self._limits.get(key)
+            if cached and cached[0] > time.monotonic():
+                return cached[1]
+
+        row = None
+        if key:
+            try:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute("""
+                        SELECT statement_timeout_ms, max_plan_cost, max_plan_rows, row_cap
+                        FROM public.analytics_tenant_limits
+                        WHERE business_id = %s
+                    """, (key,))
+                    row = cur.fetchone()
+            except psycopg2.errors.UndefinedTable:
+                conn.rollback()
+        limits = GuardLimits(**row) if row else GuardLimits()
+
+        with self._lock:
+            self._limits[key] = (time.monotonic() + LIMITS_TTL_SECONDS, limits)
+        return limits
+
+    def begin(self, conn, limits: GuardLimits):
+        """Make the connection's current transaction read-only and time-boxed"""
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL transaction_read_only = on")
+        self.time_box(conn, limits.statement_timeout_ms)
+
+    def time_box(self, conn, timeout_ms: int):
+        """statement_timeout for the rest of the connection's current transaction"""
+        with conn.cursor() as cur:
+            cur.execute("SELECT set_config('statement_timeout', %s, true)", (str(int(timeout_ms)),))
+
+    def check(self, conn, query: str, limits: GuardLimits):
+        """
+        EXPLAIN the query and decide whether and how to run it.
+
+        Returns:
+            (query to run, decision dict)
+
+        Raises:
+            QueryGuardError: when the plan is over the business's limits
+        """
+        decision = {'action': 'allowed', 'limits': limits.as_dict()}
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"EXPLAIN (FORMAT JSON) {query}")
+                plan = cur.fetchone()[0][0]['Plan']
+        except psycopg2.Error as e:
+            decision.update(action='rejected', reason=f"Query could not be planned: {e.pgerror or e}".strip())
+            raise QueryGuardError(decision['reason'], decision)
+
+        cost, rows = plan['Total Cost'], plan['Plan Rows']
+        decision.update(estimated_cost=cost, estimated_rows=rows)
+
+        if cost > limits.max_plan_cost:
+            decision.update(action='rejected', reason=f"Estimated cost {cost:.0f} exceeds limit {limits.max_plan_cost:.0f}")
+            raise QueryGuardError(decision['reason'], decision)
+        if rows > limits.max_plan_rows:
+            decision.update(action='rejected', reason=f"Estimated {rows} rows exceeds limit {limits.max_plan_rows}")
+            raise QueryGuardError(decision['reason'], decision)
+
+        if rows > limits.row_cap:
+            # One row over the cap, so reading the result can still tell it was cut off
+            query, changed = apply_row_cap(query, limits.row_cap + 1)
+            if changed:
+                decision.update(action='limited', reason=f"Estimated {rows} rows; limited to {limits.row_cap}")
+        return query, decision
+
+    def record_stream(self, decision: dict, summary: dict, limits: GuardLimits):
+        """Note in the decision when reading stopped at the row cap"""
+        decision['truncated'] = not summary['complete']
+        if decision['truncated'] and decision['action'] == 'allowed':
+            decision.update(action='limited', reason=f"Stopped reading after {limits.row_cap} rows")
+
+
+_guard = None
+_guard_lock = threading.Lock()
+
+
+def get_query_guard() -> QueryGuard:
+    """Process-wide guard shared by every AnalyticsTools instance"""
+    global _guard
+    if _guard is None:
+        with _guard_lock:
+            if _guard is None:
+                _guard = QueryGuard()
+    return _guard
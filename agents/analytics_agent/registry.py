@@ -0,0 +1,144 @@
+# agents/analytics_agent/registry.py
+"""
+Long-lived AnalyticsTools instances shared across tool calls.
+
+One connection pool and one OpenAI client serve every business; each
+business gets a single AnalyticsTools instance that is reused until it
+has been idle for ANALYTICS_IDLE_TIMEOUT seconds.
+"""
+
+import os
+import time
+import threading
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+from dotenv import load_dotenv
+from openai import OpenAI
+
+from agents.analytics_agent.tools import AnalyticsTools
+from agents.analytics_agent.deadline import current_deadline
+
+load_dotenv()
+
+
+class BlockingConnectionPool(ThreadedConnectionPool):
+    """Thread-safe pool that waits for a free connection instead of failing"""
+
+    def __init__(self, minconn, maxconn, *args, wait_timeout=30, **kwargs):
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._wait_timeout = wait_timeout
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def getconn(self, key=None):
+        # Waiting past the request's deadline would only delay its error
+        deadline = current_deadline()
+        timeout = min(self._wait_timeout, deadline.remaining_ms() / 1000) if deadline else self._wait_timeout
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolError("connection pool exhausted")
+        try:
+            conn = super().getconn(key)
+            if conn.closed:
+                # Server dropped it while idle; replace it
+                super().putconn(conn, key, close=True)
+                conn = super().getconn(key)
+            return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._slots.release()
+
+
+class AnalyticsToolsRegistry:
+    """Per-business AnalyticsTools instances backed by shared resources"""
+
+    def __init__(self, min_connections: int = None, max_connections: int = None, idle_timeout: float = None):
+        self.min_connections = min_connections or int(os.getenv('ANALYTICS_POOL_MIN', '1'))
+        self.max_connections = max_connections or int(os.getenv('ANALYTICS_POOL_MAX', '10'))
+        self.idle_timeout = idle_timeout or float(os.getenv('ANALYTICS_IDLE_TIMEOUT', '600'))
+
+        self._lock = threading.Lock()
+        self._pool = None
+        self._llm = None
+        self._instances = {}  # business_id -> [AnalyticsTools, last_used]
+
+    @property
+    def pool(self) -> BlockingConnectionPool:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = BlockingConnectionPool(
+                        self.min_connections,
+                        self.max_connections,
+                        os.getenv('DATABASE_URL')
+                    )
+        return self._pool
+
+    @property
+    def llm(self) -> OpenAI:
+        if self._llm is None:
+            with self._lock:
+                if self._llm is None:
+                    self._llm = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        return self._llm
+
+    def get(self, business_id=None) -> AnalyticsTools:
+        """Return the business's instance, creating it on first use"""
+        self.evict_idle()
+        key = str(business_id) if business_id else None
+
+        with self._lock:
+            entry = self._instances.get(key)
+            if entry:
+                entry[1] = time.monotonic()
+                return entry[0]
+
+        # Build outside the lock: construction runs a query
+        tools = AnalyticsTools(business_id=business_id, connection_pool=self.pool, llm=self.llm)
+        with self._lock:
+            entry = self._instances.setdefault(key, [tools, time.monotonic()])
+            entry[1] = time.monotonic()
+            return entry[0]
+
+    def evict_idle(self) -> int:
+        """Drop instances unused for longer than idle_timeout"""
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            idle = [key for key, (_, last_used) in self._instances.items() if last_used < cutoff]
+            for key in idle:
+                del self._instances[key]
+        return len(idle)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "instances": len(self._instances),
+                "pool_min": self.min_connections,
+                "pool_max": self.max_connections,
+                "idle_timeout": self.idle_timeout
+            }
+
+    def close(self):
+        """Drop all instances and close every pooled connection"""
+        with self._lock:
+            self._instances.clear()
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> AnalyticsToolsRegistry:
+    """Process-wide registry used by the MCP server and in-process adapter"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = AnalyticsToolsRegistry()
+    return _registry
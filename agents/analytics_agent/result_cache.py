@@ -0,0 +1,150 @@
+# agents/analytics_agent/result_cache.py
+"""
+Process-wide cache of analytics query results.
+
+Results are keyed by business, schema, normalized SQL, parameters and the
+write counters (analytics_table_versions) of every table the query reads.
+Any committed write to one of those tables bumps its counter, so the next
+lookup misses and recomputes; a hit costs one small indexed lookup instead
+of the aggregation. Queries reading a table without a counter are never
+cached.
+"""
+
+import os
+import re
+import copy
+import time
+import threading
+from collections import OrderedDict
+import psycopg2
+import psycopg2.errors
+from psycopg2.extras import RealDictCursor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+VERSIONS_QUERY = """
+SELECT table_name, version
+FROM public.analytics_table_version_values
+WHERE table_schema = %s AND table_name = ANY(%s);
+"""
+
+
+def normalize_sql(query: str) -> str:
+    """Collapse whitespace and drop the trailing semicolon"""
+    return re.sub(r'\s+', ' ', query).strip().rstrip(';').strip()
+
+
+def referenced_tables(query: str, tables) -> list:
+    """Known tables mentioned in a query"""
+    return sorted(t for t in tables if re.search(rf'\b{re.escape(t)}\b', query, re.IGNORECASE))
+
+
+def table_versions(conn, schema: str, tables) -> dict:
+    """Write counter per tracked table (untracked tables are missing)"""
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(VERSIONS_QUERY, (schema, list(tables)))
+        return {row['table_name']: row['version'] for row in cur.fetchall()}
+
+
+class ResultCache:
+    """LRU of query results validated against per-table write counters"""
+
+    def __init__(self, max_entries: int = None, max_rows: int = None, ttl: float = None, enabled: bool = None):
+        self.max_entries = max_entries or int(os.getenv('ANALYTICS_RESULT_CACHE_SIZE', '256'))
+        self.max_rows = max_rows or int(os.getenv('ANALYTICS_RESULT_CACHE_MAX_ROWS', '5000'))
+        # Upper bound on entry age, for writes that bypass the triggers
+        self.ttl = ttl or float(os.getenv('ANALYTICS_RESULT_CACHE_TTL', '3600'))
+        if enabled is None:
+            enabled = os.getenv('ANALYTICS_RESULT_CACHE', 'true').lower() in ('1', 'true', 'yes')
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (stored_at, rows, summary)
+        self._stats = {'hits': 0, 'misses': 0, 'uncacheable': 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def version_token(self, conn, schema: str, tables: list):
+        """Tuple of (table, version) for the tables, or None if any is untracked"""
+        if not self.enabled:
+            return None
+        if not tables:
+            self._count('uncacheable')
+            return None
+        try:
+            versions = table_versions(conn, schema, tables)
+        except psycopg2.errors.UndefinedTable:
+            print("⚠️  analytics_table_versions does not exist; result cache disabled "
+                  "(run database/migrations/create_analytics_table_versions.sql)")
+            self.enabled = False
+            conn.rollback()
+            return None
+        if len(versions) != len(tables):
+            self._count('uncacheable')
+            return None
+        return tuple((t, versions[t]) for t in tables)
+
+    def key(self, business_id, schema: str, query: str, params, token, mode: str = 'rows') -> tuple:
+        """mode separates full results from streamed (head + summary) ones"""
+        return (
+            str(business_id) if business_id else None,
+            schema,
+            normalize_sql(query),
+            tuple(params) if params else (),
+            token,
+            mode
+        )
+
+    def get(self, key):
+        """Cached (rows, summary), copied, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            rows, summary = entry[1], entry[2]
+        return [dict(row) for row in rows], copy.deepcopy(summary)
+
+    def put(self, key, rows: list, summary: dict = None):
+        if len(rows) > self.max_rows:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), [dict(row) for row in rows], copy.deepcopy(summary))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, business_id=None):
+        """Drop entries for one business, or everything"""
+        with self._lock:
+            if business_id is None:
+                self._entries.clear()
+                return
+            business = str(business_id)
+            for key in [k for k in self._entries if k[0] == business]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), enabled=self.enabled)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Process-wide result cache shared by every AnalyticsTools instance"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResultCache()
+    return _cache
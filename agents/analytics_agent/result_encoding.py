@@ -0,0 +1,133 @@
+# agents/analytics_agent/result_encoding.py
+"""
+Response encodings for analytics result rows.
+
+    rows      - list of per-row dicts (default)
+    columnar  - column names, type tags and one value array per column
+    arrow     - Arrow IPC stream, base64-encoded (needs pyarrow)
+
+Values are converted once per column with a converter picked from the
+column's type, instead of json.dumps(default=str) probing every value.
+"""
+
+import io
+import json
+import uuid
+import base64
+from decimal import Decimal
+from datetime import date, datetime, time
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow is optional (pip install pyarrow)
+    pa = None
+
+RESULT_FORMATS = ('rows', 'columnar', 'arrow')
+
+
+def _type_tag(value) -> str:
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, int):
+        return 'int'
+    if isinstance(value, float):
+        return 'float'
+    if isinstance(value, Decimal):
+        return 'decimal'
+    if isinstance(value, uuid.UUID):
+        return 'uuid'
+    if isinstance(value, datetime):
+        return 'datetime'
+    if isinstance(value, date):
+        return 'date'
+    if isinstance(value, time):
+        return 'time'
+    if isinstance(value, str):
+        return 'text'
+    return 'json'
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+CONVERTERS = {
+    'decimal': float,
+    'uuid': str,
+    'datetime': _isoformat,
+    'date': _isoformat,
+    'time': _isoformat,
+}
+
+
+def json_default(value):
+    """json.dumps default for the types psycopg2 returns"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return str(value)
+
+
+def column_types(rows: list) -> dict:
+    """Type tag per column from its first non-null value ('null' if all null)"""
+    types = {}
+    for column in (rows[0] if rows else {}):
+        value = next((row[column] for row in rows if row[column] is not None), None)
+        types[column] = 'null' if value is None else _type_tag(value)
+    return types
+
+
+def encode_columnar(rows: list) -> dict:
+    """Rows -> {'format', 'columns', 'types', 'values'} with JSON-native values"""
+    types = column_types(rows)
+    columns = list(types)
+    values = []
+    for column in columns:
+        convert = CONVERTERS.get(types[column])
+        data = [row[column] for row in rows]
+        if convert:
+            data = [None if v is None else convert(v) for v in data]
+        values.append(data)
+    return {
+        'format': 'columnar',
+        'columns': columns,
+        'types': [types[c] for c in columns],
+        'values': values
+    }
+
+
+def encode_arrow(rows: list) -> dict:
+    """Rows -> Arrow IPC stream (base64) plus column names and type tags"""
+    if pa is None:
+        raise ImportError("result_format 'arrow' requires pyarrow (pip install pyarrow)")
+
+    types = column_types(rows)
+    arrays = {}
+    for column, tag in types.items():
+        data = [row[column] for row in rows]
+        if tag in ('uuid', 'json'):
+            data = [None if v is None else (str(v) if tag == 'uuid' else json.dumps(v, default=json_default))
+                    for v in data]
+        arrays[column] = data
+    table = pa.Table.from_pydict(arrays)
+
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return {
+        'format': 'arrow',
+        'encoding': 'base64',
+        'columns': list(types),
+        'types': list(types.values()),
+        'data': base64.b64encode(sink.getvalue()).decode('ascii')
+    }
+
+
+def encode_rows(rows: list, result_format: str = 'rows'):
+    """Encode rows in the requested response format"""
+    if result_format == 'columnar':
+        return encode_columnar(rows)
+    if result_format == 'arrow':
+        return encode_arrow(rows)
+    return rows
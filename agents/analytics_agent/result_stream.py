@@ -0,0 +1,153 @@
+# agents/analytics_agent/result_stream.py
+"""
+Bounded-memory reading of large query results.
+
+Rows are pulled through a named (server-side) cursor in batches of
+fetch_size. Only the first head_rows rows are kept; every row read
+contributes to running per-column aggregates (non-null count, min, max and
+sum for numeric columns). Reading stops after max_rows rows and the cursor
+is closed, which ends the query on the server.
+
+read_stream holds the batch loop, so other engines (the local replica)
+can reuse it with their own fetch function.
+"""
+
+import os
+import uuid
+from decimal import Decimal
+from datetime import date, datetime, time
+from psycopg2.extras import RealDictCursor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_FETCH_SIZE = int(os.getenv('ANALYTICS_FETCH_SIZE', '500'))
+DEFAULT_HEAD_ROWS = int(os.getenv('ANALYTICS_HEAD_ROWS', '100'))
+
+NUMERIC_TYPES = (int, float, Decimal)
+ORDERED_TYPES = NUMERIC_TYPES + (str, date, datetime, time)
+
+
+class ColumnStats:
+    """Running aggregates for one result column"""
+
+    def __init__(self):
+        self.count = 0
+        self.nulls = 0
+        self.min = None
+        self.max = None
+        self.sum = None
+        self._numeric = True
+        self._ordered = True
+
+    def update(self, value):
+        if value is None:
+            self.nulls += 1
+            return
+        self.count += 1
+
+        if self._numeric and isinstance(value, NUMERIC_TYPES) and not isinstance(value, bool):
+            self.sum = value if self.sum is None else self.sum + value
+        else:
+            self._numeric = False
+            self.sum = None
+
+        if self._ordered and isinstance(value, ORDERED_TYPES) and not isinstance(value, bool):
+            try:
+                if self.min is None or value < self.min:
+                    self.min = value
+                if self.max is None or value > self.max:
+                    self.max = value
+            except TypeError:
+                # Mixed types in one column (e.g. Decimal and float) that don't compare
+                self._ordered = False
+                self.min = self.max = None
+        else:
+            self._ordered = False
+            self.min = self.max = None
+
+    def as_dict(self) -> dict:
+        stats = {'count': self.count, 'nulls': self.nulls}
+        if self._ordered and self.count:
+            stats['min'] = self.min
+            stats['max'] = self.max
+        if self._numeric and self.count:
+            stats['sum'] = self.sum
+        return stats
+
+
+def read_stream(fetch, max_rows: int = None, head_rows: int = None, fetch_size: int = None) -> dict:
+    """
+    Read rows in batches, keeping the head and per-column stats.
+
+    Args:
+        fetch: Callable returning up to n rows (as dicts); empty when done
+        max_rows: Stop reading after this many rows (None = read all)
+        head_rows: Number of leading rows to keep
+        fetch_size: Rows per batch
+
+    Returns:
+        Dict with rows (the head), row_count (rows read), complete (False
+        when reading stopped at max_rows) and per-column stats
+    """
+    head_rows = DEFAULT_HEAD_ROWS if head_rows is None else head_rows
+    fetch_size = fetch_size or DEFAULT_FETCH_SIZE
+
+    head = []
+    columns = None
+    row_count = 0
+    complete = True
+
+    while True:
+        want = fetch_size if max_rows is None else min(fetch_size, max_rows - row_count + 1)
+        batch = fetch(want)
+        if not batch:
+            break
+        if columns is None:
+            columns = {name: ColumnStats() for name in batch[0]}
+
+        for row in batch:
+            if max_rows is not None and row_count >= max_rows:
+                complete = False
+                break
+            row_count += 1
+            if len(head) < head_rows:
+                head.append(dict(row))
+            for name, value in row.items():
+                columns[name].update(value)
+        if not complete or len(batch) < want:
+            break
+
+    return {
+        'rows': head,
+        'row_count': row_count,
+        'complete': complete,
+        'columns': {name: stats.as_dict() for name, stats in (columns or {}).items()}
+    }
+
+
+def stream_query(conn, query: str, params=None, max_rows: int = None,
+                 head_rows: int = None, fetch_size: int = None) -> dict:
+    """
+    Run a query through a server-side cursor, keeping bounded state.
+
+    Args:
+        conn: Connection inside an open transaction
+        query: SQL to run
+        params: Optional query parameters
+        max_rows: Stop reading after this many rows (None = read all)
+        head_rows: Number of leading rows to keep
+        fetch_size: Rows per round trip
+
+    Returns:
+        See read_stream
+    """
+    fetch_size = fetch_size or DEFAULT_FETCH_SIZE
+    cur = conn.cursor(name=f"analytics_{uuid.uuid4().hex[:12]}", cursor_factory=RealDictCursor)
+    try:
+        cur.itersize = fetch_size
+        cur.execute(query, params)
+        return read_stream(cur.fetchmany, max_rows, head_rows, fetch_size)
+    finally:
+        # Closing the portal stops the rest of the query on the server
+        cur.close()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# agents/analytics_agent/rollups.py
+"""
+Rollup tables for the analytics agent.
+
+The tables are created and kept current by
+database/migrations/create_analytics_rollups.sql. This module holds the
+queries the fixed tools run against them, plus a small CLI for the
+deferred refresh mode used by bulk loads:
+
+    python -m agents.analytics_agent.rollups status
+    python -m agents.analytics_agent.rollups refresh
+    python -m agents.analytics_agent.rollups rebuild
+
+Add --schema <name> to work on a business's own schema.
+
+The daily rollups bucket orders by order_date, which is NOT NULL in
+analytics_demo_orders, so every order is counted; a NULL loyalty tier is
+stored as 'Unknown'.
+"""
+
+import os
+import sys
+import argparse
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ROLLUP_TABLES = (
+    'analytics_demo_daily_product_sales',
+    'analytics_demo_daily_category_sales',
+    'analytics_demo_daily_tier_sales',
+    'analytics_demo_daily_payment_sales',
+    'analytics_demo_customer_totals',
+)
+
+QUICK_STATS_QUERY = """
+SELECT
+    (SELECT COUNT(*) FROM analytics_demo_customers) as total_customers,
+    (SELECT COUNT(*) FROM analytics_demo_products) as total_products,
+    (SELECT COALESCE(SUM(order_count), 0) FROM analytics_demo_daily_payment_sales) as total_orders,
+    (SELECT COALESCE(SUM(order_count), 0) FROM analytics_demo_daily_payment_sales WHERE status = 'completed') as completed_orders,
+    (SELECT ROUND(COALESCE(SUM(revenue), 0), 2) FROM analytics_demo_daily_payment_sales WHERE status = 'completed') as total_revenue,
+    (SELECT ROUND(COALESCE(SUM(revenue) / NULLIF(SUM(order_count), 0), 0), 2) FROM analytics_demo_daily_payment_sales WHERE status = 'completed') as avg_order_value,
+    (SELECT COUNT(*) FROM analytics_demo_customer_totals WHERE total_orders > 0) as customers_with_orders,
+    (SELECT MAX(order_date) FROM analytics_demo_orders) as last_order_date;
+"""
+
+TOP_PRODUCTS_QUERY = """
+SELECT
+    p.product_name,
+    p.category,
+    p.brand,
+    SUM(s.order_count) as order_count,
+    SUM(s.units_sold) as total_units_sold,
+    ROUND(SUM(s.revenue), 2) as total_revenue,
+    ROUND(SUM(s.unit_price_total) / SUM(s.line_count), 2) as avg_selling_price
+FROM analytics_demo_daily_product_sales s
+JOIN analytics_demo_products p ON p.id = s.product_id
+WHERE s.status = 'completed'
+GROUP BY p.id, p.product_name, p.category, p.brand
+ORDER BY total_revenue DESC
+LIMIT %s;
+"""
+
+CUSTOMER_QUERY = """
+SELECT
+    c.customer_name,
+    c.email,
+    c.loyalty_tier,
+    c.city,
+    c.state,
+    c.customer_since,
+    COALESCE(t.total_orders, 0) as total_orders,
+    COALESCE(t.completed_orders, 0) as completed_orders,
+    ROUND(COALESCE(t.lifetime_value, 0), 2) as lifetime_value,
+    ROUND(t.lifetime_value / NULLIF(t.completed_orders, 0), 2) as avg_order_value,
+    t.last_order_date
+FROM analytics_demo_customers c
+LEFT JOIN analytics_demo_customer_totals t ON t.customer_id = c.id
+WHERE c.id = %s;
+"""
+
+# The rollup stores a NULL tier as 'Unknown'; customers are matched (and labelled) the same way
+TIER_QUERY = """
+SELECT
+    COALESCE(c.loyalty_tier, 'Unknown') as loyalty_tier,
+    COUNT(*) as customer_count,
+    COALESCE(MAX(s.order_count), 0) as total_orders,
+    ROUND(MAX(s.revenue) / NULLIF(MAX(s.order_count), 0), 2) as avg_order_value,
+    ROUND(MAX(s.revenue), 2) as total_revenue
+FROM analytics_demo_customers c
+LEFT JOIN (
+    SELECT loyalty_tier, SUM(order_count) as order_count, SUM(revenue) as revenue
+    FROM analytics_demo_daily_tier_sales
+    WHERE status = 'completed'
+    GROUP BY loyalty_tier
+) s ON s.loyalty_tier = COALESCE(c.loyalty_tier, 'Unknown')
+GROUP BY COALESCE(c.loyalty_tier, 'Unknown')
+ORDER BY total_revenue DESC;
+"""
+
+DAILY_SERIES_QUERY = """
+SELECT
+    sales_date as day,
+    SUM(order_count) as orders,
+    SUM(revenue) as revenue
+FROM analytics_demo_daily_payment_sales
+WHERE status = 'completed'
+GROUP BY sales_date
+ORDER BY sales_date;
+"""
+
+# Added to the SQL-generation prompt when the rollups exist
+PROMPT_GUIDANCE = """Rollup tables (kept current on every order change) hold pre-aggregated daily totals.
+Prefer them over scanning analytics_demo_orders / analytics_demo_order_items whenever the
+question only needs daily (or coarser) totals by product, category, loyalty tier, payment
+method or order status, or lifetime totals per customer:
+- analytics_demo_daily_product_sales / analytics_demo_daily_category_sales: revenue = SUM(order_items.subtotal)
+- analytics_demo_daily_tier_sales / analytics_demo_daily_payment_sales: revenue = SUM(orders.total_amount)
+- analytics_demo_customer_totals: lifetime_value counts completed orders only
+Every daily rollup has a status column; filter status = 'completed' for sales figures.
+"""
+
+
+def has_rollups(tables) -> bool:
+    """Whether every rollup table is present in an introspected schema"""
+    return all(t in tables for t in ROLLUP_TABLES)
+
+
+def refresh_rollups(conn) -> int:
+    """Drain the rollup work queue; returns the number of days/customers recomputed"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT analytics_refresh_rollups()")
+        refreshed = cur.fetchone()[0]
+    conn.commit()
+    return refreshed
+
+
+def rebuild_rollups(conn):
+    """Recompute every rollup from the base tables"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT analytics_rebuild_rollups()")
+    conn.commit()
+
+
+def rollup_status(conn) -> dict:
+    """Row counts per rollup table and pending queue sizes"""
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        status = {}
+        for table in ROLLUP_TABLES:
+            cur.execute(f"SELECT COUNT(*) AS count FROM {table}")
+            status[table] = cur.fetchone()['count']
+        cur.execute("""
+            SELECT (SELECT COUNT(DISTINCT sales_date) FROM analytics_rollup_dirty_days) AS pending_days,
+                   (SELECT COUNT(DISTINCT customer_id) FROM analytics_rollup_dirty_customers) AS pending_customers
+        """)
+        status.update(cur.fetchone())
+    conn.rollback()
+    return status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the analytics rollup tables")
+    parser.add_argument("command", choices=["status", "refresh", "rebuild"])
+    parser.add_argument("--schema", help="A business's schema (see tenants.py); default search_path otherwise")
+    args = parser.parse_args(argv)
+
+    conn = psycopg2.connect(os.getenv('DATABASE_URL'))
+    try:
+        if args.schema:
+            with conn.cursor() as cur:
+                cur.execute("SELECT set_config('search_path', quote_ident(%s), false)", (args.schema,))
+            conn.commit()
+        if args.command == "refresh":
+            print(f"✅ Refreshed {refresh_rollups(conn)} queued days/customers")
+        elif args.command == "rebuild":
+            rebuild_rollups(conn)
+            print("✅ Rebuilt all rollup tables")
+        else:
+            for key, value in rollup_status(conn).items():
+                print(f"  {key}: {value}")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
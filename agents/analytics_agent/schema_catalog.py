@@ -0,0 +1,196 @@
+# agents/analytics_agent/schema_catalog.py
+"""
+Process-wide cache of the analytics schema and its prompt text.
+
+The schema is introspected once per business/schema and the markdown
+description used in SQL-generation prompts is built at the same time.
+Entries are validated against a catalog fingerprint (a hash over the
+relevant pg_attribute rows), which costs one small catalog query instead
+of re-reading information_schema and rebuilding the prompt every call.
+"""
+
+import time
+import threading
+from psycopg2.extras import RealDictCursor
+
+from agents.analytics_agent.rollups import ROLLUP_TABLES, PROMPT_GUIDANCE as ROLLUP_GUIDANCE
+
+TABLE_PATTERN = 'analytics_demo_%'
+
+TABLE_DESCRIPTIONS = {
+    'analytics_demo_customers': 'Customer information including name, email, loyalty tier, and location',
+    'analytics_demo_products': 'Product catalog with names, categories, SKUs, prices, and costs',
+    'analytics_demo_orders': 'Order transactions with totals, dates, status, and payment methods',
+    'analytics_demo_order_items': 'Individual line items for each order with quantities and prices',
+    'analytics_demo_inventory': 'Current inventory levels and warehouse locations',
+    'analytics_demo_daily_product_sales': 'Rollup: orders, units and revenue per day, product and order status',
+    'analytics_demo_daily_category_sales': 'Rollup: orders, units and revenue per day, product category and order status',
+    'analytics_demo_daily_tier_sales': 'Rollup: orders, customers and revenue per day, customer loyalty tier and order status',
+    'analytics_demo_daily_payment_sales': 'Rollup: orders, revenue and discounts per day, payment method and order status',
+    'analytics_demo_customer_totals': 'Rollup: lifetime order counts, completed-order value and first/last order per customer',
+    'analytics_demo_customer_segments': 'RFM scores (1-5, 5 = best), segment name and first-order cohort month per customer with completed orders',
+    'analytics_demo_low_stock': 'Inventory rows currently at or below their reorder point, with when each product went low'
+}
+
+SCHEMA_QUERY = """
+SELECT
+    table_name,
+    column_name,
+    data_type,
+    is_nullable
+FROM information_schema.columns
+WHERE table_schema = %s
+AND table_name LIKE %s
+ORDER BY table_name, ordinal_position;
+"""
+
+FINGERPRINT_QUERY = """
+SELECT md5(COALESCE(string_agg(
+    c.relname || '.' || a.attname || ':' || format_type(a.atttypid, a.atttypmod),
+    ',' ORDER BY c.relname, a.attnum
+), '')) AS fingerprint
+FROM pg_catalog.pg_attribute a
+JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = %s
+AND c.relname LIKE %s
+AND c.relkind IN ('r', 'p', 'v', 'm')
+AND a.attnum > 0
+AND NOT a.attisdropped;
+"""
+
+FOREIGN_KEYS_QUERY = """
+SELECT c.relname AS table_name, a.attname AS column_name, rc.relname AS ref_table, ra.attname AS ref_column
+FROM pg_catalog.pg_constraint k
+JOIN pg_catalog.pg_class c ON c.oid = k.conrelid
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+JOIN pg_catalog.pg_class rc ON rc.oid = k.confrelid
+CROSS JOIN LATERAL unnest(k.conkey, k.confkey) AS u(attnum, ref_attnum)
+JOIN pg_catalog.pg_attribute a ON a.attrelid = k.conrelid AND a.attnum = u.attnum
+JOIN pg_catalog.pg_attribute ra ON ra.attrelid = k.confrelid AND ra.attnum = u.ref_attnum
+WHERE k.contype = 'f'
+AND n.nspname = %s
+AND c.relname LIKE %s
+ORDER BY c.relname, a.attname;
+"""
+
+
+class CatalogEntry:
+    """Introspected schema of one business/schema plus its prebuilt prompt text"""
+
+    def __init__(self, schema: str, fingerprint: str, tables: dict, foreign_keys: list = None):
+        self.schema = schema
+        self.fingerprint = fingerprint
+        self.tables = tables
+        # [{'table_name', 'column_name', 'ref_table', 'ref_column'}, ...]
+        self.foreign_keys = foreign_keys or []
+        self.loaded_at = time.time()
+
+        self.table_blocks = {}
+        for table, columns in tables.items():
+            desc = TABLE_DESCRIPTIONS.get(table, 'Table description')
+            block = f"## {table}\n{desc}\n\nColumns:\n"
+            for col in columns:
+                block += f"- {col['column']} ({col['type']})\n"
+            self.table_blocks[table] = block + "\n"
+
+        self.prompt_text = self.describe(list(tables))
+
+    def describe(self, tables: list, columns: dict = None) -> str:
+        """Schema description for a subset of tables (and optionally of their columns)"""
+        description = "# Database Schema for Retail Business Analytics\n\n"
+        for table in tables:
+            if table not in self.table_blocks:
+                continue
+            if columns is None or table not in columns:
+                description += self.table_blocks[table]
+                continue
+            keep = columns[table]
+            shown = [col for col in self.tables[table] if col['column'] in keep]
+            block = f"## {table}\n{TABLE_DESCRIPTIONS.get(table, 'Table description')}\n\nColumns:\n"
+            for col in shown:
+                block += f"- {col['column']} ({col['type']})\n"
+            hidden = len(self.tables[table]) - len(shown)
+            if hidden:
+                block += f"- ({hidden} other columns not relevant to this question)\n"
+            description += block + "\n"
+        if any(t in self.table_blocks for t in tables if t in ROLLUP_TABLES):
+            description += ROLLUP_GUIDANCE
+        return description
+
+
+class SchemaCatalog:
+    """Cache of CatalogEntry objects keyed by (business_id, schema)"""
+
+    def __init__(self, table_pattern: str = TABLE_PATTERN):
+        self.table_pattern = table_pattern
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def fingerprint(self, conn, schema: str) -> str:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(FINGERPRINT_QUERY, (schema, self.table_pattern))
+            return cur.fetchone()['fingerprint']
+
+    def _load(self, conn, schema: str, fingerprint: str) -> CatalogEntry:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(SCHEMA_QUERY, (schema, self.table_pattern))
+            columns = cur.fetchall()
+            cur.execute(FOREIGN_KEYS_QUERY, (schema, self.table_pattern))
+            foreign_keys = cur.fetchall()
+
+        # Organize schema by table
+        tables = {}
+        for col in columns:
+            tables.setdefault(col['table_name'], []).append({
+                'column': col['column_name'],
+                'type': col['data_type'],
+                'nullable': col['is_nullable']
+            })
+        foreign_keys = [dict(fk) for fk in foreign_keys if fk['ref_table'] in tables]
+        return CatalogEntry(schema, fingerprint, tables, foreign_keys)
+
+    def get(self, conn, business_id=None, schema: str = 'public') -> CatalogEntry:
+        """Cached entry, reloaded only when the catalog fingerprint changed"""
+        key = (str(business_id) if business_id else None, schema)
+        fingerprint = self.fingerprint(conn, schema)
+
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry.fingerprint == fingerprint:
+            return entry
+
+        entry = self._load(conn, schema, fingerprint)
+        with self._lock:
+            self._entries[key] = entry
+        return entry
+
+    def peek(self, business_id=None, schema: str = 'public'):
+        """Cached entry without validating it (None if never loaded)"""
+        with self._lock:
+            return self._entries.get((str(business_id) if business_id else None, schema))
+
+    def invalidate(self, business_id=None, schema: str = None):
+        """Drop cached entries for a business (and schema), or all when no business is given"""
+        with self._lock:
+            if business_id is None and schema is None:
+                self._entries.clear()
+                return
+            key_business = str(business_id) if business_id else None
+            for key in list(self._entries):
+                if key[0] == key_business and (schema is None or key[1] == schema):
+                    del self._entries[key]
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_schema_catalog() -> SchemaCatalog:
+    """Process-wide schema catalog shared by every AnalyticsTools instance"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = SchemaCatalog()
+    return _catalog
@@ -0,0 +1,253 @@
+# agents/analytics_agent/schema_linking.py
+"""
+Question-relevant schema subsets for SQL-generation prompts.
+
+Every table and column of a CatalogEntry is described in one line
+("orders total amount (numeric): Order transactions with ...") and
+embedded once per catalog version; the vectors also persist in the local
+embedding store across restarts. A question is embedded and scored
+against them, with a bonus for table/column names it mentions. The best
+tables are kept, then the foreign-key graph (declared keys plus <name>_id
+columns pointing at an existing table) adds the tables needed to join
+them. Within wide tables only key columns and the best-scoring columns
+are described.
+
+Schemas with at most ANALYTICS_SCHEMA_LINK_MIN_TABLES tables are sent
+whole, and so is the full schema whenever ranking fails.
+"""
+
+import os
+import re
+import threading
+from collections import deque
+import numpy as np
+from dotenv import load_dotenv
+
+from agents.analytics_agent.schema_catalog import TABLE_DESCRIPTIONS
+from utils.embedding_store import embed_texts
+from utils.tokens import count_tokens
+
+load_dotenv()
+
+TABLE_PREFIX = 'analytics_demo_'
+NAME_MATCH_BONUS = 0.1
+
+
+def _words(text: str) -> set:
+    """Lowercased words, with a trailing plural s dropped"""
+    return {w[:-1] if len(w) > 3 and w.endswith('s') else w for w in re.findall(r'[a-z0-9]+', text.lower())}
+
+
+def _label(name: str) -> str:
+    return name.replace(TABLE_PREFIX, '').replace('_', ' ')
+
+
+def is_key_column(column: str) -> bool:
+    return column == 'id' or column.endswith('_id')
+
+
+class SchemaLink:
+    """The tables/columns chosen for one question and what that saved"""
+
+    def __init__(self, tables: list, columns: dict, prompt_text: str, full_tokens: int, method: str):
+        self.tables = tables
+        self.columns = columns
+        self.prompt_text = prompt_text
+        self.full_tokens = full_tokens
+        self.linked_tokens = count_tokens(prompt_text)
+        self.method = method
+
+    def summary(self) -> dict:
+        return {
+            'method': self.method,
+            'tables': self.tables,
+            'prompt_tokens': {'full': self.full_tokens, 'linked': self.linked_tokens}
+        }
+
+
+class SchemaLinker:
+    """Ranks a catalog entry's tables and columns against questions"""
+
+    def __init__(self, enabled: bool = None, model: str = None, min_tables: int = None,
+                 top_tables: int = None, top_columns: int = None):
+        if enabled is None:
+            enabled = os.getenv('ANALYTICS_SCHEMA_LINKING', 'true').lower() in ('1', 'true', 'yes')
+        self.enabled = enabled
+        self.model = model or os.getenv('ANALYTICS_SCHEMA_LINK_MODEL', 'text-embedding-3-small')
+        self.min_tables = min_tables or int(os.getenv('ANALYTICS_SCHEMA_LINK_MIN_TABLES', '6'))
+        self.top_tables = top_tables or int(os.getenv('ANALYTICS_SCHEMA_LINK_TOP_TABLES', '3'))
+        # Non-key columns described per table; narrower tables are described whole
+        self.top_columns = top_columns or int(os.getenv('ANALYTICS_SCHEMA_LINK_TOP_COLUMNS', '8'))
+
+        self._lock = threading.Lock()
+        self._indexes = {}  # (schema, fingerprint) -> (items, unit vectors)
+        self._stats = {'linked': 0, 'full': 0, 'errors': 0, 'full_tokens': 0, 'linked_tokens': 0}
+
+    @staticmethod
+    def _items(entry) -> list:
+        """(table, column or None, text) for every table and column"""
+        items = []
+        for table, columns in entry.tables.items():
+            description = TABLE_DESCRIPTIONS.get(table, '')
+            items.append((table, None, f"{_label(table)}: {description}"))
+            for col in columns:
+                items.append((table, col['column'], f"{_label(table)} {_label(col['column'])} ({col['type']}): {description}"))
+        return items
+
+    def _index(self, entry, llm=None):
+        key = (entry.schema, entry.fingerprint)
+        with self._lock:
+            index = self._indexes.get(key)
+        if index is None:
+            items = self._items(entry)
+            vectors = np.array(embed_texts([text for _, _, text in items], model=self.model, client=llm), dtype=np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+            index = (items, vectors)
+            with self._lock:
+                # One version per schema is enough
+                for stale in [k for k in self._indexes if k[0] == entry.schema]:
+                    del self._indexes[stale]
+                self._indexes[key] = index
+        return index
+
+    @staticmethod
+    def join_graph(entry) -> dict:
+        """Undirected table adjacency from foreign keys and <name>_id columns"""
+        graph = {table: set() for table in entry.tables}
+        for fk in entry.foreign_keys:
+            graph[fk['table_name']].add(fk['ref_table'])
+            graph[fk['ref_table']].add(fk['table_name'])
+        by_entity = {}
+        for table in entry.tables:
+            label = table.replace(TABLE_PREFIX, '')
+            by_entity.setdefault(label[:-1] if label.endswith('s') else label, table)
+        for table, columns in entry.tables.items():
+            for col in columns:
+                if col['column'].endswith('_id'):
+                    target = by_entity.get(col['column'][:-3])
+                    if target and target != table:
+                        graph[table].add(target)
+                        graph[target].add(table)
+        return graph
+
+    @staticmethod
+    def _connect(graph: dict, tables: list) -> list:
+        """tables plus the tables on shortest join paths between them"""
+        selected = tables[:1]
+        for target in tables[1:]:
+            if target in selected:
+                continue
+            # BFS from everything selected so far to the next table
+            previous = {t: None for t in selected}
+            queue = deque(selected)
+            while queue and target not in previous:
+                node = queue.popleft()
+                for neighbor in sorted(graph.get(node, ())):
+                    if neighbor not in previous:
+                        previous[neighbor] = node
+                        queue.append(neighbor)
+            if target not in previous:
+                selected.append(target)  # no join path; described anyway
+                continue
+            node = target
+            while node is not None and node not in selected:
+                selected.append(node)
+                node = previous[node]
+        return selected
+
+    def link(self, entry, question: str, llm=None) -> SchemaLink:
+        """Choose the schema subset to describe for a question"""
+        return self.link_many(entry, [question], llm)[0]
+
+    def link_many(self, entry, questions: list, llm=None) -> list:
+        """SchemaLinks for several questions, embedding them in one request"""
+        full_tokens = count_tokens(entry.prompt_text)
+        if not self.enabled or len(entry.tables) <= self.min_tables:
+            return [self._record(SchemaLink(list(entry.tables), None, entry.prompt_text, full_tokens, 'full'))
+                    for _ in questions]
+
+        try:
+            items, vectors = self._index(entry, llm)
+            queries = np.array(embed_texts(list(questions), model=self.model, client=llm), dtype=np.float32)
+            queries /= np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12
+            all_scores = queries @ vectors.T
+            method = 'embedding'
+        except Exception as e:
+            print(f"Schema linking fell back to name matching: {e}")
+            with self._lock:
+                self._stats['errors'] += 1
+            items = self._items(entry)
+            all_scores = np.zeros((len(questions), len(items)), dtype=np.float32)
+            method = 'names'
+
+        return [self._record(self._select(entry, question, items, scores, method, full_tokens))
+                for question, scores in zip(questions, all_scores)]
+
+    def _select(self, entry, question: str, items: list, scores, method: str, full_tokens: int) -> SchemaLink:
+        question_words = _words(question)
+        table_scores, column_scores = {}, {}
+        for (table, column, _), score in zip(items, scores):
+            name = column or table.replace(TABLE_PREFIX, '')
+            if _words(name) <= question_words:
+                score += NAME_MATCH_BONUS
+            if column is not None:
+                column_scores.setdefault(table, {})[column] = float(score)
+            table_scores[table] = max(table_scores.get(table, -1.0), float(score))
+
+        if method == 'names' and not any(table_scores.values()):
+            return SchemaLink(list(entry.tables), None, entry.prompt_text, full_tokens, 'full')
+
+        ranked = sorted(table_scores, key=table_scores.get, reverse=True)[:self.top_tables]
+        tables = self._connect(self.join_graph(entry), ranked)
+
+        columns = {}
+        for table in tables:
+            names = [col['column'] for col in entry.tables[table]]
+            keys = {c for c in names if is_key_column(c)}
+            others = [c for c in names if c not in keys]
+            if len(others) <= self.top_columns:
+                continue
+            best = sorted(others, key=lambda c: column_scores[table][c], reverse=True)[:self.top_columns]
+            columns[table] = keys | set(best)
+
+        tables.sort(key=list(entry.tables).index)
+        return SchemaLink(tables, columns, entry.describe(tables, columns), full_tokens, method)
+
+    @staticmethod
+    def combine(entry, links: list) -> SchemaLink:
+        """One schema subset covering every link (a column subset only where all links agree on one)"""
+        full_tokens = count_tokens(entry.prompt_text)
+        if not links or any(link.method == 'full' for link in links):
+            return SchemaLink(list(entry.tables), None, entry.prompt_text, full_tokens, 'full')
+        tables = [t for t in entry.tables if any(t in link.tables for link in links)]
+        columns = {}
+        for table in tables:
+            subsets = [link.columns.get(table) for link in links if table in link.tables]
+            if all(subset is not None for subset in subsets):
+                columns[table] = set().union(*subsets)
+        return SchemaLink(tables, columns, entry.describe(tables, columns), full_tokens, links[0].method)
+
+    def _record(self, link: SchemaLink) -> SchemaLink:
+        with self._lock:
+            self._stats['full' if link.method == 'full' else 'linked'] += 1
+            self._stats['full_tokens'] += link.full_tokens
+            self._stats['linked_tokens'] += link.linked_tokens
+        return link
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, enabled=self.enabled, indexed_schemas=len(self._indexes))
+
+
+_linker = None
+_linker_lock = threading.Lock()
+
+
+def get_schema_linker() -> SchemaLinker:
+    """Process-wide schema linker shared by every AnalyticsTools instance"""
+    global _linker
+    if _linker is None:
+        with _linker_lock:
+            if _linker is None:
+                _linker = SchemaLinker()
+    return _linker
@@ -7,8 +7,13 @@ Defines the structure and documentation for all analytics tools
 # Tool descriptions for MCP
 TOOL_DESCRIPTIONS = {
     "query_database": "Ask any question about the business data in natural language. The agent will generate and execute appropriate SQL queries to answer your question.",
+    "query_database_batch": "Ask several questions about the business data at once (e.g. for a dashboard). SQL for all of them is generated together and the queries run concurrently; returns one answer per question, in order.",
     "get_quick_stats": "Get a quick overview of key business metrics including total customers, orders, revenue, and average order value.",
     "get_top_products": "Retrieve the top-selling products ranked by revenue, with details on units sold and order counts.",
+    "get_sales_trends": "Get the trend of revenue, orders or average order value by day, week or month: per-period totals, growth rates, rolling average, weekday seasonality and a forecast. Use this for trend, growth and forecast questions instead of query_database.",
+    "get_customer_segments": "Get RFM (recency, frequency, monetary) customer segments such as Champions, Loyal Customers, At Risk and Hibernating, with counts and averages, or list the customers in one segment.",
+    "get_customer_cohorts": "Get monthly acquisition cohorts (customers grouped by the month of their first completed order) with size, lifetime revenue and the share still ordering in each following month.",
+    "get_low_stock": "List the products whose inventory is at or below their reorder point, most urgent first, with quantities, reorder amounts and warehouse locations.",
     "get_customer_insights": "Get insights about customer segments by loyalty tier or detailed information about a specific customer."
 }
 
@@ -20,11 +25,49 @@ MCP_TOOL_SCHEMAS = {
             "question": {
                 "type": "string",
                 "description": "Natural language question about the business data (e.g., 'What were our total sales last month?', 'Who are our top 5 customers?', 'Which products are low in stock?')"
+            },
+            "format_mode": {
+                "type": "string",
+                "description": "How to phrase the answer: 'auto' uses templates for common result shapes and the LLM otherwise, 'local' always uses templates, 'llm' always uses the LLM",
+                "enum": ["auto", "local", "llm"],
+                "default": "auto"
+            },
+            "result_format": {
+                "type": "string",
+                "description": "Encoding of the returned data: 'rows' (list of objects), 'columnar' (column names, type tags and per-column value arrays) or 'arrow' (base64 Arrow IPC stream, requires pyarrow on the server)",
+                "enum": ["rows", "columnar", "arrow"],
+                "default": "rows"
             }
         },
         "required": ["question"]
     },
     
+    "query_database_batch": {
+        "type": "object",
+        "properties": {
+            "questions": {
+                "type": "array",
+                "description": "Natural language questions about the business data",
+                "items": {"type": "string"},
+                "minItems": 1,
+                "maxItems": 20
+            },
+            "format_mode": {
+                "type": "string",
+                "description": "How to phrase each answer (see query_database)",
+                "enum": ["auto", "local", "llm"],
+                "default": "auto"
+            },
+            "result_format": {
+                "type": "string",
+                "description": "Encoding of each result's data (see query_database)",
+                "enum": ["rows", "columnar", "arrow"],
+                "default": "rows"
+            }
+        },
+        "required": ["questions"]
+    },
+    
     "get_quick_stats": {
         "type": "object",
         "properties": {},
@@ -45,6 +88,101 @@ MCP_TOOL_SCHEMAS = {
         "required": []
     },
     
+    "get_sales_trends": {
+        "type": "object",
+        "properties": {
+            "metric": {
+                "type": "string",
+                "description": "Metric over completed orders",
+                "enum": ["revenue", "orders", "avg_order_value"],
+                "default": "revenue"
+            },
+            "granularity": {
+                "type": "string",
+                "description": "Period length",
+                "enum": ["day", "week", "month"],
+                "default": "month"
+            },
+            "periods": {
+                "type": "integer",
+                "description": "Number of most recent periods to report (e.g. 6 for 'the past 6 months')",
+                "default": 6,
+                "minimum": 1,
+                "maximum": 366
+            },
+            "window": {
+                "type": "integer",
+                "description": "Rolling-average window in days",
+                "default": 7,
+                "minimum": 1,
+                "maximum": 365
+            },
+            "forecast_days": {
+                "type": "integer",
+                "description": "Days to forecast past the last order",
+                "default": 30,
+                "minimum": 0,
+                "maximum": 365
+            }
+        },
+        "required": []
+    },
+    
+    "get_customer_segments": {
+        "type": "object",
+        "properties": {
+            "segment": {
+                "type": "string",
+                "description": "Optional segment to list customers for; without it, returns the overview of all segments",
+                "enum": ["Champions", "Loyal Customers", "Potential Loyalists", "New Customers",
+                         "Needs Attention", "At Risk", "Hibernating", "Others"]
+            },
+            "limit": {
+                "type": "integer",
+                "description": "Customers to list for a segment, by completed-order value (default: 20)",
+                "default": 20,
+                "minimum": 1,
+                "maximum": 500
+            }
+        },
+        "required": []
+    },
+    
+    "get_customer_cohorts": {
+        "type": "object",
+        "properties": {
+            "months": {
+                "type": "integer",
+                "description": "Number of most recent cohorts to return (default: 12)",
+                "default": 12,
+                "minimum": 1,
+                "maximum": 120
+            },
+            "horizon": {
+                "type": "integer",
+                "description": "Months after acquisition to report retention for (default: 6)",
+                "default": 6,
+                "minimum": 1,
+                "maximum": 63
+            }
+        },
+        "required": []
+    },
+    
+    "get_low_stock": {
+        "type": "object",
+        "properties": {
+            "limit": {
+                "type": "integer",
+                "description": "Maximum number of products to return, most urgent first (default: 50)",
+                "default": 50,
+                "minimum": 1,
+                "maximum": 500
+            }
+        },
+        "required": []
+    },
+    
     "get_customer_insights": {
         "type": "object",
         "properties": {
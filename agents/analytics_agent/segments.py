@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+# agents/analytics_agent/segments.py
+"""
+RFM segmentation and acquisition cohorts for every customer.
+
+database/migrations/create_analytics_customer_segments.sql keeps one
+compact row per customer (completed-order count and value, first/last
+order, cohort month and a bitmask of the months after it with orders) and a
+queue of customers whose orders changed. A refresh drains the queue, reads
+only those customers' completed orders, aggregates them in one NumPy pass
+and replaces their rows; then recency/frequency/monetary quintiles and
+segments are recomputed over the whole compact table, again in NumPy, and
+only rows whose scores moved are written back.
+
+Recency is measured from the latest order in the table, not today.
+
+    python -m agents.analytics_agent.segments status
+    python -m agents.analytics_agent.segments refresh
+    python -m agents.analytics_agent.segments rebuild
+
+Add --schema <name> to work on a business's own schema.
+"""
+
+import os
+import sys
+import argparse
+import threading
+import numpy as np
+import psycopg2
+import psycopg2.errors
+from psycopg2.extras import execute_values
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SEGMENTS_TABLE = 'analytics_demo_customer_segments'
+
+# Months after the cohort month tracked in activity_mask
+MASK_MONTHS = 63
+
+# (segment, recency scores, average of frequency and monetary scores); first match wins
+RFM_SEGMENTS = (
+    ('Champions', (4, 5), (4, 5)),
+    ('Loyal Customers', (3, 5), (3, 5)),
+    ('Potential Loyalists', (4, 5), (2, 2)),
+    ('New Customers', (4, 5), (1, 1)),
+    ('Needs Attention', (3, 3), (1, 2)),
+    ('At Risk', (1, 2), (3, 5)),
+    ('Hibernating', (1, 2), (1, 2)),
+)
+
+ORDERS_QUERY = """
+SELECT customer_id::text, order_date::date, total_amount
+FROM analytics_demo_orders
+WHERE status = 'completed'
+"""
+
+SCORES_QUERY = f"""
+SELECT customer_id::text, last_order_date, frequency, monetary, r_score, f_score, m_score, segment
+FROM {SEGMENTS_TABLE};
+"""
+
+SEGMENT_SUMMARY_QUERY = f"""
+SELECT
+    s.segment,
+    COUNT(*) as customer_count,
+    ROUND(AVG(a.as_of - s.last_order_date), 1) as avg_recency_days,
+    ROUND(AVG(s.frequency), 2) as avg_frequency,
+    ROUND(AVG(s.monetary), 2) as avg_monetary,
+    ROUND(SUM(s.monetary), 2) as total_monetary,
+    MAX(a.as_of) as as_of
+FROM {SEGMENTS_TABLE} s
+CROSS JOIN (SELECT MAX(last_order_date) as as_of FROM {SEGMENTS_TABLE}) a
+GROUP BY s.segment
+ORDER BY total_monetary DESC;
+"""
+
+SEGMENT_CUSTOMERS_QUERY = f"""
+SELECT
+    c.id as customer_id,
+    c.customer_name,
+    c.email,
+    c.loyalty_tier,
+    s.segment,
+    s.r_score,
+    s.f_score,
+    s.m_score,
+    s.frequency,
+    s.monetary,
+    s.last_order_date,
+    s.cohort_month
+FROM {SEGMENTS_TABLE} s
+JOIN analytics_demo_customers c ON c.id = s.customer_id
+WHERE s.segment = %s
+ORDER BY s.monetary DESC
+LIMIT %s;
+"""
+
+COHORT_QUERY = f"""
+SELECT
+    cohort_month,
+    activity_mask,
+    COUNT(*) as customers,
+    SUM(monetary) as revenue,
+    MAX(MAX(last_order_date)) OVER () as as_of
+FROM {SEGMENTS_TABLE}
+GROUP BY cohort_month, activity_mask
+ORDER BY cohort_month;
+"""
+
+
+def _months(days: np.ndarray) -> np.ndarray:
+    """datetime64[D] -> months since 1970-01"""
+    return days.astype('datetime64[M]').astype(np.int64)
+
+
+def aggregate_orders(rows: list) -> dict:
+    """
+    Per-customer aggregates of (customer_id, order_date, total_amount) rows.
+
+    Returns:
+        Dict of equal-length arrays keyed by the segment table's columns
+    """
+    if not rows:
+        return {'customer_id': np.array([], dtype=object)}
+    ids = np.array([row[0] for row in rows], dtype=object)
+    days = np.array([row[1] for row in rows], dtype='datetime64[D]')
+    amounts = np.array([float(row[2]) for row in rows])
+
+    customers, inverse = np.unique(ids, return_inverse=True)
+    inverse = inverse.ravel()
+    day_numbers = days.astype(np.int64)
+    first = np.full(len(customers), np.iinfo(np.int64).max)
+    last = np.full(len(customers), np.iinfo(np.int64).min)
+    np.minimum.at(first, inverse, day_numbers)
+    np.maximum.at(last, inverse, day_numbers)
+
+    cohort = _months(first.astype('datetime64[D]'))
+    offsets = _months(days) - cohort[inverse]
+    tracked = offsets < MASK_MONTHS
+    activity = np.zeros(len(customers), dtype=np.int64)
+    np.bitwise_or.at(activity, inverse[tracked], np.left_shift(np.int64(1), offsets[tracked]))
+
+    return {
+        'customer_id': customers,
+        'first_order_date': first.astype('datetime64[D]'),
+        'last_order_date': last.astype('datetime64[D]'),
+        'frequency': np.bincount(inverse, minlength=len(customers)),
+        'monetary': np.round(np.bincount(inverse, weights=amounts, minlength=len(customers)), 2),
+        'cohort_month': cohort.astype('datetime64[M]').astype('datetime64[D]'),
+        'activity_mask': activity,
+    }
+
+
+def quintiles(values: np.ndarray) -> np.ndarray:
+    """1-5 score per value from its mid-rank percentile (ties share a score)"""
+    ordered = np.sort(values)
+    below = np.searchsorted(ordered, values, side='left')
+    through = np.searchsorted(ordered, values, side='right')
+    percentile = (below + through) / (2.0 * len(values))
+    return np.clip(np.ceil(percentile * 5), 1, 5).astype(np.int64)
+
+
+def score(last_order_dates: np.ndarray, frequency: np.ndarray, monetary: np.ndarray) -> tuple:
+    """(r, f, m, segment) arrays; recency counts days before the latest order"""
+    last = np.asarray(last_order_dates, dtype='datetime64[D]')
+    recency = (last.max() - last).astype(np.int64)
+    r = quintiles(-recency)
+    f = quintiles(np.asarray(frequency, dtype=float))
+    m = quintiles(np.asarray(monetary, dtype=float))
+    fm = np.floor((f + m) / 2 + 0.5)
+    conditions = [(r >= r_low) & (r <= r_high) & (fm >= fm_low) & (fm <= fm_high)
+                  for _, (r_low, r_high), (fm_low, fm_high) in RFM_SEGMENTS]
+    segment = np.select(conditions, [name for name, _, _ in RFM_SEGMENTS], default='Others')
+    return r, f, m, segment
+
+
+def retention(cohort_months: np.ndarray, masks: np.ndarray, counts: np.ndarray, as_of_month: int, horizon: int) -> tuple:
+    """
+    Customers active k months after acquisition, per cohort.
+
+    Returns:
+        (cohort month numbers, cohort sizes, active counts of shape
+        [cohorts, horizon] with -1 where month k is still in the future)
+    """
+    cohorts, inverse = np.unique(cohort_months, return_inverse=True)
+    inverse = inverse.ravel()
+    sizes = np.bincount(inverse, weights=counts, minlength=len(cohorts))
+    offsets = np.arange(horizon)
+    active_bits = (masks[:, None] >> offsets[None, :]) & 1
+    active = np.zeros((len(cohorts), horizon))
+    np.add.at(active, inverse, active_bits * counts[:, None])
+    active[cohorts[:, None] + offsets[None, :] > as_of_month] = -1
+    return cohorts, sizes, active
+
+
+def cohort_table(rows: list, months: int = 12, horizon: int = 6) -> tuple:
+    """
+    Retention table from COHORT_QUERY rows (one per cohort and activity mask).
+
+    Returns:
+        (as_of date, list of the last `months` cohorts with size, lifetime
+        revenue and the share of the cohort ordering 0..horizon-1 months
+        after acquisition; None for months not reached yet)
+    """
+    if not rows:
+        return None, []
+    cohort_months = _months(np.array([row['cohort_month'] for row in rows], dtype='datetime64[D]'))
+    masks = np.array([row['activity_mask'] for row in rows], dtype=np.int64)
+    counts = np.array([row['customers'] for row in rows], dtype=float)
+    revenue = np.array([float(row['revenue']) for row in rows])
+    as_of = rows[0]['as_of']
+
+    cohorts, sizes, active = retention(cohort_months, masks, counts, _months(np.array([as_of], dtype='datetime64[D]'))[0], horizon)
+    revenue = np.bincount(np.searchsorted(cohorts, cohort_months), weights=revenue, minlength=len(cohorts))
+    rates = np.where(active >= 0, active / sizes[:, None], np.nan)
+
+    table = []
+    for month, size, total, row in list(zip(cohorts, sizes, revenue, rates))[-months:]:
+        table.append({
+            'cohort': str(np.datetime64(int(month), 'M')),
+            'customers': int(size),
+            'revenue': round(float(total), 2),
+            'retention': [None if np.isnan(rate) else round(float(rate), 4) for rate in row]
+        })
+    return as_of, table
+
+
+class SegmentEngine:
+    """Refreshes the per-customer segment table of the connection's schema"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {'refreshes': 0, 'customers_refreshed': 0, 'rows_rescored': 0, 'errors': 0}
+
+    def pending(self, conn) -> bool:
+        """Whether customers are queued for a refresh (False without the migration)"""
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT EXISTS (SELECT 1 FROM analytics_segment_dirty_customers)")
+                return cur.fetchone()[0]
+        except psycopg2.errors.UndefinedTable:
+            conn.rollback()
+            return False
+
+    def refresh(self, conn, full: bool = False) -> dict:
+        """
+        Recompute queued customers (every customer with full=True) and rescore.
+
+        Commits on success; runs one refresh at a time per schema.
+        """
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext('analytics_segments:' || current_schema()))")
+                if full:
+                    cur.execute("TRUNCATE analytics_segment_dirty_customers")
+                    cur.execute(ORDERS_QUERY)
+                else:
+                    cur.execute("""
+                        WITH drained AS (DELETE FROM analytics_segment_dirty_customers RETURNING customer_id)
+                        SELECT DISTINCT customer_id::text FROM drained
+                    """)
+                    customers = [row[0] for row in cur.fetchall()]
+                    if not customers:
+                        conn.commit()
+                        return {'customers': 0, 'rescored': 0}
+                    cur.execute(ORDERS_QUERY + " AND customer_id = ANY(%s::uuid[])", (customers,))
+                aggregates = aggregate_orders(cur.fetchall())
+
+                if full:
+                    cur.execute(f"TRUNCATE {SEGMENTS_TABLE}")
+                else:
+                    # Includes customers left without completed orders
+                    cur.execute(f"DELETE FROM {SEGMENTS_TABLE} WHERE customer_id = ANY(%s::uuid[])", (customers,))
+                if len(aggregates['customer_id']):
+                    execute_values(cur, f"""
+                        INSERT INTO {SEGMENTS_TABLE}
+                            (customer_id, first_order_date, last_order_date, frequency, monetary, cohort_month, activity_mask)
+                        VALUES %s
+                    """, list(zip(
+                        aggregates['customer_id'],
+                        aggregates['first_order_date'].tolist(),
+                        aggregates['last_order_date'].tolist(),
+                        aggregates['frequency'].tolist(),
+                        aggregates['monetary'].tolist(),
+                        aggregates['cohort_month'].tolist(),
+                        aggregates['activity_mask'].tolist(),
+                    )), template="(%s::uuid, %s, %s, %s, %s, %s, %s)", page_size=1000)
+                rescored = self._rescore(cur)
+            conn.commit()
+        except psycopg2.Error:
+            conn.rollback()
+            with self._lock:
+                self._stats['errors'] += 1
+            raise
+
+        with self._lock:
+            self._stats['refreshes'] += 1
+            self._stats['customers_refreshed'] += len(aggregates['customer_id'])
+            self._stats['rows_rescored'] += rescored
+        return {'customers': len(aggregates['customer_id']), 'rescored': rescored}
+
+    def _rescore(self, cur) -> int:
+        """Re-rank every row; write back only rows whose scores changed"""
+        cur.execute(SCORES_QUERY)
+        rows = cur.fetchall()
+        if not rows:
+            return 0
+        ids = np.array([row[0] for row in rows], dtype=object)
+        r, f, m, segment = score(
+            np.array([row[1] for row in rows], dtype='datetime64[D]'),
+            np.array([row[2] for row in rows]),
+            np.array([float(row[3]) for row in rows])
+        )
+        previous = np.array([(row[4] or 0, row[5] or 0, row[6] or 0) for row in rows])
+        changed = (
+            (previous[:, 0] != r) | (previous[:, 1] != f) | (previous[:, 2] != m)
+            | (np.array([row[7] or '' for row in rows], dtype=object) != segment)
+        )
+        if not changed.any():
+            return 0
+        execute_values(cur, f"""
+            UPDATE {SEGMENTS_TABLE} s
+            SET r_score = v.r, f_score = v.f, m_score = v.m, segment = v.segment, scored_at = NOW()
+            FROM (VALUES %s) AS v(customer_id, r, f, m, segment)
+            WHERE s.customer_id = v.customer_id::uuid
+        """, list(zip(ids[changed], r[changed].tolist(), f[changed].tolist(), m[changed].tolist(),
+                      segment[changed].tolist())), page_size=1000)
+        return int(changed.sum())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+
+def segment_status(conn) -> dict:
+    """Scored customers, segment counts and queued customers"""
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT segment, COUNT(*) FROM {SEGMENTS_TABLE} GROUP BY segment ORDER BY 2 DESC")
+        status = {f"segment {segment}": count for segment, count in cur.fetchall()}
+        cur.execute("SELECT COUNT(DISTINCT customer_id) FROM analytics_segment_dirty_customers")
+        status['pending_customers'] = cur.fetchone()[0]
+    conn.rollback()
+    return status
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_segment_engine() -> SegmentEngine:
+    """Process-wide segment engine shared by every AnalyticsTools instance"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = SegmentEngine()
+    return _engine
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the customer segment table")
+    parser.add_argument("command", choices=["status", "refresh", "rebuild"])
+    parser.add_argument("--schema", help="A business's schema (see tenants.py); default search_path otherwise")
+    args = parser.parse_args(argv)
+
+    conn = psycopg2.connect(os.getenv('DATABASE_URL'))
+    try:
+        if args.schema:
+            with conn.cursor() as cur:
+                cur.execute("SELECT set_config('search_path', quote_ident(%s), false)", (args.schema,))
+            conn.commit()
+        if args.command in ("refresh", "rebuild"):
+            result = get_segment_engine().refresh(conn, full=args.command == "rebuild")
+            print(f"✅ Recomputed {result['customers']} customers, rescored {result['rescored']} rows")
+        else:
+            for key, value in segment_status(conn).items():
+                print(f"  {key}: {value}")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+# agents/analytics_agent/sql_validator.py
+"""
+Parser-based validation of generated SQL.
+
+Queries are parsed with sqlglot (Postgres dialect) rather than searched for
+keywords, so columns such as created_at or last_update are fine while
+anything other than one read-only query is rejected:
+
+- exactly one statement: a SELECT or a UNION/INTERSECT/EXCEPT, optionally
+  with WITH, and no data-modifying CTEs, SELECT INTO or row locks
+- tables: the business's tables and the query's own CTEs, unqualified or
+  qualified with the business's schema
+- functions: the standard functions sqlglot models, except server
+  introspection and row generators, plus an allow-list of read-only
+  Postgres built-ins (extend it with ANALYTICS_SQL_FUNCTIONS)
+
+validate_sql returns the canonical text of the parsed query: unquoted
+identifiers lowercased, keywords uppercased, whitespace normalized and
+comments dropped. That text is what runs and what the SQL and result caches
+store, so queries that differ only in formatting share one entry.
+"""
+
+import os
+from functools import lru_cache
+import sqlglot
+import sqlglot.errors
+from sqlglot import exp
+from sqlglot.optimizer.normalize_identifiers import normalize_identifiers
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DIALECT = 'postgres'
+
+# Nodes that write, lock or run utility commands, wherever they appear
+FORBIDDEN_NODES = tuple(
+    getattr(exp, name) for name in (
+        'Insert', 'Update', 'Delete', 'Merge', 'Into', 'Lock', 'Create', 'Drop',
+        'Alter', 'Command', 'Set', 'Copy', 'Transaction', 'Commit', 'Rollback'
+    ) if hasattr(exp, name)
+)
+
+# Functions sqlglot models natively that reveal server details or generate
+# rows without reading a table
+DENIED_FUNCTIONS = tuple(
+    getattr(exp, name) for name in (
+        'CurrentVersion', 'CurrentUser', 'SessionUser', 'CurrentRole', 'CurrentDatabase',
+        'CurrentSchema', 'CurrentSchemas', 'CurrentCatalog',
+        'GenerateSeries', 'ExplodingGenerateSeries', 'GenerateDateArray', 'GenerateTimestampArray'
+    ) if hasattr(exp, name)
+)
+
+# Read-only Postgres functions that sqlglot parses as anonymous calls
+ALLOWED_FUNCTIONS = {
+    'age', 'date_bin', 'justify_days', 'justify_hours', 'justify_interval',
+    'isfinite', 'make_date', 'make_timestamp', 'to_timestamp', 'clock_timestamp',
+    'initcap', 'btrim', 'strpos', 'translate', 'regexp_replace', 'regexp_matches',
+    'char_length', 'octet_length', 'to_number', 'num_nulls', 'num_nonnulls',
+    'sign', 'trunc', 'div', 'mod', 'log', 'ln', 'cbrt', 'width_bucket',
+    'array_length', 'array_position', 'array_to_string', 'string_to_array', 'cardinality',
+    'json_build_object', 'jsonb_build_object', 'json_object_agg', 'jsonb_object_agg',
+    'jsonb_agg', 'jsonb_array_elements', 'jsonb_array_length', 'jsonb_each', 'jsonb_typeof',
+    'bool_and', 'bool_or', 'every', 'mode', 'corr', 'covar_pop', 'covar_samp',
+    'regr_slope', 'regr_intercept', 'regr_r2', 'cume_dist', 'nth_value',
+}
+ALLOWED_FUNCTIONS |= {
+    name.strip().lower() for name in os.getenv('ANALYTICS_SQL_FUNCTIONS', '').split(',') if name.strip()
+}
+
+
+class SQLValidationError(ValueError):
+    """A query that is not a single read-only SELECT over the business's tables"""
+
+
+def validate_sql(query: str, tables, schema: str = 'public') -> str:
+    """Canonical SQL for a permitted query; raises SQLValidationError otherwise"""
+    return _canonical_sql(query, frozenset(t.lower() for t in tables), schema.lower())
+
+
+@lru_cache(maxsize=1024)
+def _canonical_sql(query: str, tables: frozenset, schema: str) -> str:
+    try:
+        statements = [s for s in sqlglot.parse(query, read=DIALECT) if s is not None]
+    except sqlglot.errors.SqlglotError as e:
+        raise SQLValidationError(f"could not parse query: {str(e).splitlines()[0]}")
+    if len(statements) != 1:
+        raise SQLValidationError("exactly one statement is allowed")
+
+    tree = normalize_identifiers(statements[0], dialect=DIALECT)
+    if not isinstance(tree, (exp.Select, exp.SetOperation)):
+        raise SQLValidationError("only SELECT queries are allowed")
+
+    for node in tree.walk():
+        if isinstance(node, FORBIDDEN_NODES):
+            raise SQLValidationError(f"{node.key.upper()} is not allowed")
+        if isinstance(node, DENIED_FUNCTIONS):
+            name = node.sql(dialect=DIALECT).split('(')[0].lower()
+            raise SQLValidationError(f"function {name} is not allowed")
+
+    ctes = {cte.alias_or_name for cte in tree.find_all(exp.CTE)}
+    for table in tree.find_all(exp.Table):
+        if isinstance(table.this, exp.Func):
+            continue  # Set-returning function, checked with the other functions
+        if table.catalog or (table.db and table.db != schema):
+            raise SQLValidationError(f"schema {table.catalog or table.db} is not allowed")
+        if table.name not in tables and (table.db or table.name not in ctes):
+            raise SQLValidationError(f"table {table.name} is not allowed")
+
+    for func in tree.find_all(exp.Anonymous):
+        name = func.name.lower()
+        if isinstance(func.parent, exp.Dot) or name not in ALLOWED_FUNCTIONS:
+            raise SQLValidationError(f"function {name} is not allowed")
+
+    return tree.sql(dialect=DIALECT, comments=False)
@@ -0,0 +1,265 @@
+# agents/analytics_agent/statements.py
+"""
+Named prepared statements for the fixed analytics tools.
+
+Each fixed tool query is registered under a name, with a variant that
+reads the rollup tables when they exist. On first use on a connection the
+query is PREPAREd (psycopg2 %s placeholders become $1, $2, ...); after that
+every call is an EXECUTE with bound parameters, so Postgres skips parsing
+and, once it settles on a generic plan, planning. Prepared statements live
+for the session, so the registry remembers per connection what it has
+prepared. Call counts and execution times are kept per statement.
+
+Set ANALYTICS_PREPARED_STATEMENTS=false behind a transaction-mode pooler
+(PgBouncer, Supavisor) that does not keep session state.
+"""
+
+import os
+import re
+import time
+import hashlib
+import threading
+import weakref
+import psycopg2.errors
+from psycopg2.extras import RealDictCursor
+from dotenv import load_dotenv
+
+from agents.analytics_agent import rollups
+from agents.analytics_agent import segments
+from agents.analytics_agent import stock_alerts
+
+load_dotenv()
+
+QUICK_STATS_QUERY = """
+SELECT
+    (SELECT COUNT(*) FROM analytics_demo_customers) as total_customers,
+    (SELECT COUNT(*) FROM analytics_demo_products) as total_products,
+    (SELECT COUNT(*) FROM analytics_demo_orders) as total_orders,
+    (SELECT COUNT(*) FROM analytics_demo_orders WHERE status = 'completed') as completed_orders,
+    (SELECT ROUND(COALESCE(SUM(total_amount), 0), 2) FROM analytics_demo_orders WHERE status = 'completed') as total_revenue,
+    (SELECT ROUND(COALESCE(AVG(total_amount), 0), 2) FROM analytics_demo_orders WHERE status = 'completed') as avg_order_value,
+    (SELECT COUNT(DISTINCT customer_id) FROM analytics_demo_orders) as customers_with_orders,
+    (SELECT MAX(order_date) FROM analytics_demo_orders) as last_order_date;
+"""
+
+TOP_PRODUCTS_QUERY = """
+SELECT
+    p.product_name,
+    p.category,
+    p.brand,
+    COUNT(DISTINCT oi.order_id) as order_count,
+    SUM(oi.quantity) as total_units_sold,
+    ROUND(SUM(oi.subtotal), 2) as total_revenue,
+    ROUND(AVG(oi.unit_price), 2) as avg_selling_price
+FROM analytics_demo_products p
+JOIN analytics_demo_order_items oi ON p.id = oi.product_id
+JOIN analytics_demo_orders o ON oi.order_id = o.id
+WHERE o.status = 'completed'
+GROUP BY p.id, p.product_name, p.category, p.brand
+ORDER BY total_revenue DESC
+LIMIT %s;
+"""
+
+CUSTOMER_QUERY = """
+SELECT
+    c.customer_name,
+    c.email,
+    c.loyalty_tier,
+    c.city,
+    c.state,
+    c.customer_since,
+    COUNT(o.id) as total_orders,
+    COUNT(CASE WHEN o.status = 'completed' THEN 1 END) as completed_orders,
+    ROUND(SUM(CASE WHEN o.status = 'completed' THEN o.total_amount ELSE 0 END), 2) as lifetime_value,
+    ROUND(AVG(CASE WHEN o.status = 'completed' THEN o.total_amount END), 2) as avg_order_value,
+    MAX(o.order_date) as last_order_date
+FROM analytics_demo_customers c
+LEFT JOIN analytics_demo_orders o ON c.id = o.customer_id
+WHERE c.id = %s
+GROUP BY c.id, c.customer_name, c.email, c.loyalty_tier, c.city, c.state, c.customer_since;
+"""
+
+TIER_QUERY = """
+SELECT
+    COALESCE(c.loyalty_tier, 'Unknown') as loyalty_tier,
+    COUNT(DISTINCT c.id) as customer_count,
+    COUNT(o.id) as total_orders,
+    ROUND(AVG(o.total_amount), 2) as avg_order_value,
+    ROUND(SUM(o.total_amount), 2) as total_revenue
+FROM analytics_demo_customers c
+LEFT JOIN analytics_demo_orders o ON c.id = o.customer_id AND o.status = 'completed'
+GROUP BY COALESCE(c.loyalty_tier, 'Unknown')
+ORDER BY total_revenue DESC;
+"""
+
+DAILY_SERIES_QUERY = """
+SELECT
+    order_date::date as day,
+    COUNT(*) as orders,
+    SUM(total_amount) as revenue
+FROM analytics_demo_orders
+WHERE status = 'completed'
+GROUP BY order_date::date
+ORDER BY day;
+"""
+
+# name -> (query on the base tables, query on the rollups)
+FIXED_STATEMENTS = {
+    'quick_stats': (QUICK_STATS_QUERY, rollups.QUICK_STATS_QUERY),
+    'top_products': (TOP_PRODUCTS_QUERY, rollups.TOP_PRODUCTS_QUERY),
+    'customer': (CUSTOMER_QUERY, rollups.CUSTOMER_QUERY),
+    'tier': (TIER_QUERY, rollups.TIER_QUERY),
+    'daily_series': (DAILY_SERIES_QUERY, rollups.DAILY_SERIES_QUERY),
+    'customer_segments': (segments.SEGMENT_SUMMARY_QUERY, segments.SEGMENT_SUMMARY_QUERY),
+    'segment_customers': (segments.SEGMENT_CUSTOMERS_QUERY, segments.SEGMENT_CUSTOMERS_QUERY),
+    'customer_cohorts': (segments.COHORT_QUERY, segments.COHORT_QUERY),
+    'low_stock': (stock_alerts.LOW_STOCK_QUERY, stock_alerts.LOW_STOCK_QUERY),
+    'low_stock_scan': (stock_alerts.LOW_STOCK_SCAN_QUERY, stock_alerts.LOW_STOCK_SCAN_QUERY),
+}
+
+PLACEHOLDER = re.compile(r'%[s%]')
+
+
+def statement_sql(name: str, tables) -> str:
+    """The registered query for name, reading the rollups when they exist"""
+    base, rollup = FIXED_STATEMENTS[name]
+    return rollup if rollups.has_rollups(tables) else base
+
+
+def to_prepared(query: str) -> str:
+    """psycopg2 %s placeholders -> $1, $2, ... for PREPARE"""
+    count = 0
+
+    def number(match):
+        nonlocal count
+        if match.group() == '%%':
+            return '%'
+        count += 1
+        return f"${count}"
+
+    return PLACEHOLDER.sub(number, query.strip().rstrip(';'))
+
+
+class StatementRegistry:
+    """Prepares fixed statements once per connection and times their execution"""
+
+    def __init__(self, enabled: bool = None):
+        if enabled is None:
+            enabled = os.getenv('ANALYTICS_PREPARED_STATEMENTS', 'true').lower() in ('1', 'true', 'yes')
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._prepared = weakref.WeakKeyDictionary()  # connection -> set of server-side names
+        self._timings = {}  # name -> {'calls', 'prepares', 'total_ms', 'max_ms'}
+
+    @staticmethod
+    def server_name(name: str, query: str) -> str:
+        """Server-side name; the hash keeps the base and rollup variants apart"""
+        return f"analytics_{name}_{hashlib.md5(query.encode()).hexdigest()[:8]}"
+
+    def _record(self, name: str, elapsed_ms: float, prepared: bool):
+        with self._lock:
+            timing = self._timings.setdefault(name, {'calls': 0, 'prepares': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            timing['calls'] += 1
+            timing['prepares'] += int(prepared)
+            timing['total_ms'] += elapsed_ms
+            timing['max_ms'] = max(timing['max_ms'], elapsed_ms)
+
+    def execute(self, conn, name: str, query: str, params=None) -> list:
+        """
+        Run a registered query as a prepared statement on conn.
+
+        Args:
+            conn: Connection to run on
+            name: Registered statement name (timings are kept under it)
+            query: The statement's SQL with %s placeholders
+            params: Values for the placeholders
+
+        Returns:
+            Rows as dicts
+        """
+        params = tuple(params) if params else ()
+        started = time.perf_counter()
+
+        if not self.enabled:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(query, params or None)
+                rows = [dict(row) for row in cur.fetchall()]
+            self._record(name, (time.perf_counter() - started) * 1000, False)
+            return rows
+
+        server_name = self.server_name(name, query)
+        execute = f"EXECUTE {server_name}" + (f" ({', '.join(['%s'] * len(params))})" if params else "")
+        with self._lock:
+            prepared = self._prepared.setdefault(conn, set())
+            needs_prepare = server_name not in prepared
+
+        # A retry undoes only this statement, not the transaction's
+        # settings (the time box set with set_config(..., true))
+        savepoint = not conn.autocommit
+        for attempt in range(2):
+            try:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    if savepoint:
+                        cur.execute("SAVEPOINT analytics_statement")
+                    if needs_prepare:
+                        cur.execute(f"PREPARE {server_name} AS {to_prepared(query)}")
+                    cur.execute(execute, params or None)
+                    rows = [dict(row) for row in cur.fetchall()]
+                    if savepoint:
+                        cur.execute("RELEASE SAVEPOINT analytics_statement")
+                break
+            except (psycopg2.errors.InvalidSqlStatementName, psycopg2.errors.DuplicatePreparedStatement,
+                    psycopg2.errors.FeatureNotSupported):
+                # Session state differs from what we remember (reset by a pooler, or
+                # prepared elsewhere), or a table changed shape under the cached plan
+                if attempt:
+                    raise
+                if savepoint:
+                    with conn.cursor() as cur:
+                        cur.execute("ROLLBACK TO SAVEPOINT analytics_statement")
+                if self._exists(conn, server_name):
+                    with conn.cursor() as cur:
+                        cur.execute(f"DEALLOCATE {server_name}")
+                needs_prepare = True
+
+        with self._lock:
+            prepared.add(server_name)
+        self._record(name, (time.perf_counter() - started) * 1000, needs_prepare)
+        return rows
+
+    @staticmethod
+    def _exists(conn, server_name: str) -> bool:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1 FROM pg_prepared_statements WHERE name = %s", (server_name,))
+            return cur.fetchone() is not None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'connections': len(self._prepared),
+                'statements': {
+                    name: dict(
+                        timing,
+                        total_ms=round(timing['total_ms'], 3),
+                        max_ms=round(timing['max_ms'], 3),
+                        avg_ms=round(timing['total_ms'] / timing['calls'], 3)
+                    )
+                    for name, timing in self._timings.items()
+                }
+            }
+
+
+_statements = None
+_statements_lock = threading.Lock()
+
+
+def get_statement_registry() -> StatementRegistry:
+    """Process-wide statement registry shared by every AnalyticsTools instance"""
+    global _statements
+    if _statements is None:
+        with _statements_lock:
+            if _statements is None:
+                _statements = StatementRegistry()
+    return _statements
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# agents/analytics_agent/stock_alerts.py
+"""
+Low-stock lookups and reorder alert delivery.
+
+database/migrations/create_analytics_stock_alerts.sql keeps
+analytics_demo_low_stock equal to the inventory rows at or below their
+reorder point and sends a pg_notify on the analytics_stock_alerts channel
+whenever a product enters (low_stock) or leaves (restocked) that set.
+get_low_stock reads the set; without the migration it falls back to the
+inventory table, which the partial index still keeps cheap.
+
+StockAlertListener holds one LISTEN connection per process and forwards
+each alert to in-process subscribers (the MCP server's GET /alerts event
+stream) and, when ANALYTICS_STOCK_ALERT_WEBHOOK is set, POSTs it there.
+
+    python -m agents.analytics_agent.stock_alerts listen
+"""
+
+import os
+import sys
+import json
+import time
+import select
+import argparse
+import threading
+import urllib.request
+from collections import deque
+import psycopg2
+import psycopg2.extensions
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CHANNEL = 'analytics_stock_alerts'
+LOW_STOCK_TABLE = 'analytics_demo_low_stock'
+RECENT_ALERTS = 200
+
+LOW_STOCK_QUERY = f"""
+SELECT
+    p.id as product_id,
+    p.product_name,
+    p.sku,
+    p.category,
+    s.quantity_on_hand,
+    s.reorder_point,
+    s.reorder_quantity,
+    s.warehouse_location,
+    s.low_since,
+    COUNT(*) OVER () as total_low
+FROM {LOW_STOCK_TABLE} s
+JOIN analytics_demo_products p ON p.id = s.product_id
+ORDER BY s.quantity_on_hand - s.reorder_point, p.product_name
+LIMIT %s;
+"""
+
+# Without the low-stock table: the same rows straight from inventory (partial index scan)
+LOW_STOCK_SCAN_QUERY = """
+SELECT
+    p.id as product_id,
+    p.product_name,
+    p.sku,
+    p.category,
+    i.quantity_on_hand,
+    i.reorder_point,
+    i.reorder_quantity,
+    i.warehouse_location,
+    NULL::timestamp as low_since,
+    COUNT(*) OVER () as total_low
+FROM analytics_demo_inventory i
+JOIN analytics_demo_products p ON p.id = i.product_id
+WHERE i.quantity_on_hand <= i.reorder_point
+ORDER BY i.quantity_on_hand - i.reorder_point, p.product_name
+LIMIT %s;
+"""
+
+
+class StockAlertListener:
+    """LISTENs for stock alerts on a dedicated connection and fans them out"""
+
+    def __init__(self, dsn: str = None, webhook_url: str = None):
+        self.dsn = dsn or os.getenv('DATABASE_URL')
+        self.webhook_url = webhook_url if webhook_url is not None else os.getenv('ANALYTICS_STOCK_ALERT_WEBHOOK')
+
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self._recent = deque(maxlen=RECENT_ALERTS)
+        self._thread = None
+        self._stop = threading.Event()
+        self._connected = False
+        self._stats = {'received': 0, 'delivered': 0, 'webhook_errors': 0, 'reconnects': 0}
+
+    def start(self):
+        """Start listening in a background thread (idempotent)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='stock-alert-listener', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def subscribe(self, callback):
+        """Call callback(alert) for every alert from now on"""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def recent(self, schema: str = None, limit: int = 20) -> list:
+        """Latest alerts, newest first, optionally for one schema"""
+        with self._lock:
+            alerts = [a for a in reversed(self._recent) if schema is None or a.get('schema') == schema]
+        return alerts[:limit]
+
+    def _run(self):
+        delay = 1
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {CHANNEL}")
+                self._connected, delay = True, 1
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._dispatch(conn.notifies.pop(0).payload)
+            except psycopg2.Error as e:
+                print(f"⚠️  Stock alert listener disconnected: {e}")
+                with self._lock:
+                    self._stats['reconnects'] += 1
+                self._stop.wait(delay)
+                delay = min(delay * 2, 60)
+            finally:
+                self._connected = False
+                if conn is not None:
+                    conn.close()
+
+    def _dispatch(self, payload: str):
+        try:
+            alert = json.loads(payload)
+        except ValueError:
+            return
+        alert['received_at'] = time.time()
+        with self._lock:
+            self._recent.append(alert)
+            self._stats['received'] += 1
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(alert)
+                with self._lock:
+                    self._stats['delivered'] += 1
+            except Exception as e:
+                print(f"⚠️  Stock alert subscriber failed: {e}")
+        if self.webhook_url:
+            self._post(alert)
+
+    def _post(self, alert: dict):
+        request = urllib.request.Request(
+            self.webhook_url,
+            data=json.dumps(alert).encode(),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=5):
+                pass
+        except Exception as e:
+            print(f"⚠️  Stock alert webhook failed: {e}")
+            with self._lock:
+                self._stats['webhook_errors'] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(
+                self._stats,
+                listening=self._connected,
+                subscribers=len(self._subscribers),
+                webhook=bool(self.webhook_url)
+            )
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def get_stock_alert_listener() -> StockAlertListener:
+    """Process-wide listener (not started until start() is called)"""
+    global _listener
+    if _listener is None:
+        with _listener_lock:
+            if _listener is None:
+                _listener = StockAlertListener()
+    return _listener
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print stock alerts as they arrive")
+    parser.add_argument("command", choices=["listen"])
+    parser.parse_args(argv)
+
+    listener = get_stock_alert_listener()
+    listener.subscribe(lambda alert: print(json.dumps(alert)))
+    listener.start()
+    print(f"👂 Listening on {CHANNEL} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        listener.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
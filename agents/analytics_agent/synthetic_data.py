@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+# agents/analytics_agent/synthetic_data.py
+"""
+Seeded synthetic data for the analytics tables, loaded with COPY.
+
+Generates customers, products, inventory, orders and order items at any
+scale (10^5 to 10^8 rows) for benchmarking the analytics tools:
+
+- order volume follows weekly and yearly seasonality (weekend and
+  November/December peaks) on top of steady growth
+- loyalty tiers are skewed towards Bronze; higher tiers order more often
+  and buy bigger baskets
+- customers only order after they sign up, products sell with a long-tail
+  (Zipf) popularity, and a few percent of products are at or below their
+  reorder point
+
+Everything is drawn with NumPy in fixed-size chunks, each from its own
+generator seeded by (seed, table, chunk), so the same seed and sizes always
+produce the same rows. Rows are streamed to Postgres with COPY, one
+transaction per chunk. Rollups are put in deferred mode for the load and
+rebuilt once at the end, together with the customer segments, followed by
+ANALYZE.
+
+    python -m agents.analytics_agent.synthetic_data load --customers 100000 --orders 1000000
+    python -m agents.analytics_agent.synthetic_data load --customers 2000000 --orders 30000000 --replace
+
+IDs are derived from the seed, so load more data into the same tables with
+another --seed (or use --replace).
+"""
+
+import io
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import psycopg2
+from dotenv import load_dotenv
+
+from agents.analytics_agent.rollups import rebuild_rollups, ROLLUP_TABLES
+from agents.analytics_agent.segments import get_segment_engine, SEGMENTS_TABLE
+from agents.analytics_agent.stock_alerts import LOW_STOCK_TABLE
+
+load_dotenv()
+
+CHUNK_ROWS = 100_000  # customers or orders generated (and committed) at a time
+
+# Table kinds, also the second group of the generated UUIDs
+CUSTOMERS, PRODUCTS, INVENTORY, ORDERS, ORDER_ITEMS, DAYS = 1, 2, 3, 4, 5, 6
+
+TIERS = np.array(['Bronze', 'Silver', 'Gold', 'Platinum'])
+TIER_SHARE = np.array([0.55, 0.27, 0.13, 0.05])
+TIER_ACTIVITY = np.array([1.0, 1.8, 3.0, 5.0])     # relative order frequency
+TIER_BASKET = np.array([0.9, 1.1, 1.4, 1.8])       # mean extra lines per order (Poisson)
+MAX_LINES = 12
+
+# category -> (code, subcategories, brands, median price)
+CATEGORIES = {
+    'Electronics': ('ELEC', ['Audio', 'Computer', 'Accessories', 'Lighting', 'Wearables'],
+                    ['TechGear', 'SoundPro', 'PowerPlus', 'StreamCam', 'BrightHome'], 55.0),
+    'Home & Kitchen': ('HOME', ['Cookware', 'Appliances', 'Storage', 'Decor', 'Bedding'],
+                       ['ChefMate', 'HomeEase', 'KitchenPro', 'CozyNest', 'PureLiving'], 35.0),
+    'Clothing': ('CLTH', ['Tops', 'Bottoms', 'Outerwear', 'Footwear', 'Accessories'],
+                 ['UrbanThread', 'TrailWear', 'ClassicFit', 'StrideLine', 'NorthLoom'], 40.0),
+    'Sports & Outdoors': ('SPRT', ['Camping', 'Fitness', 'Cycling', 'Water Sports', 'Hiking'],
+                          ['PeakFlow', 'IronCore', 'RideOn', 'AquaFin', 'SummitGear'], 45.0),
+    'Books & Media': ('BOOK', ['Fiction', 'Non-Fiction', 'Children', 'Music', 'Movies'],
+                      ['PageTurner', 'Northwind Press', 'Maple Books', 'SoundWave', 'ReelHouse'], 18.0),
+}
+ADJECTIVES = ['Classic', 'Pro', 'Ultra', 'Eco', 'Compact', 'Deluxe', 'Essential', 'Premium', 'Lite', 'Max']
+
+STATUS_CANCELLED = 0.06
+STATUS_PENDING = 0.25  # share of orders still pending in the last PENDING_DAYS
+PENDING_DAYS = 10
+PAYMENT_METHODS = np.array(['Credit Card', 'Debit Card', 'PayPal', 'Gift Card'])
+PAYMENT_SHARE = np.array([0.58, 0.22, 0.16, 0.04])
+TAX_RATE = 0.08
+FREE_SHIPPING_CENTS = 7500
+SHIPPING_CENTS = np.array([599, 799, 999])
+
+# (state, city, zip, relative population)
+CITIES = [
+    ('WA', 'Seattle', '98101', 8), ('WA', 'Tacoma', '98402', 3), ('WA', 'Spokane', '99201', 3),
+    ('WA', 'Bellevue', '98004', 2), ('WA', 'Vancouver', '98660', 2), ('WA', 'Renton', '98057', 1),
+    ('OR', 'Portland', '97201', 7), ('OR', 'Salem', '97301', 2), ('OR', 'Eugene', '97401', 2),
+    ('OR', 'Gresham', '97030', 1), ('OR', 'Medford', '97501', 1),
+]
+FIRST_NAMES = ['James', 'Mary', 'Michael', 'Emily', 'David', 'Sarah', 'Daniel', 'Jessica', 'Chris', 'Ashley',
+               'Matthew', 'Amanda', 'Andrew', 'Olivia', 'Joshua', 'Sophia', 'Ryan', 'Emma', 'Kevin', 'Grace',
+               'Brian', 'Chloe', 'Jason', 'Mia', 'Eric', 'Hannah', 'Tyler', 'Lily', 'Aaron', 'Zoe']
+LAST_NAMES = ['Smith', 'Johnson', 'Chen', 'Davis', 'Garcia', 'Miller', 'Wilson', 'Martinez', 'Anderson', 'Taylor',
+              'Thomas', 'Nguyen', 'Moore', 'Jackson', 'Lee', 'Harris', 'Clark', 'Lewis', 'Walker', 'Young',
+              'Allen', 'King', 'Wright', 'Scott', 'Patel', 'Kim', 'Baker', 'Adams', 'Nelson', 'Hill']
+STREETS = ['Main St', 'Oak Ave', 'Pine Ave', 'Elm Blvd', 'Cedar Ln', 'Maple Dr', 'Lake Rd', 'Park Way', 'Hill St', 'River Rd']
+
+
+def _rng(seed: int, kind: int, chunk: int = 0) -> np.random.Generator:
+    return np.random.default_rng([seed, kind, chunk])
+
+
+def _ids(seed: int, kind: int, start: int, stop: int) -> list:
+    """Deterministic UUIDs for rows start..stop-1 of a table"""
+    prefix = f"{seed & 0xffffffff:08x}-{kind:04x}-4000-8000-"
+    return [f"{prefix}{i:012x}" for i in range(start, stop)]
+
+
+def _money(cents: np.ndarray) -> list:
+    return (cents / 100).tolist()
+
+
+def _pick(rng: np.random.Generator, cdf: np.ndarray, size: int) -> np.ndarray:
+    """Indexes drawn with probabilities given by a cumulative weight array"""
+    return np.searchsorted(cdf, rng.random(size) * cdf[-1], side='right')
+
+
+def _copy(cur, table: str, columns: dict):
+    """COPY equal-length columns (name -> values) into table"""
+    buffer = io.StringIO()
+    buffer.writelines('\t'.join(map(str, row)) + '\n' for row in zip(*columns.values()))
+    buffer.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer, size=1 << 20)
+
+
+class SyntheticDataset:
+    """Sizes, date range and the shared draws (weights, signups, prices) of one dataset"""
+
+    def __init__(self, customers: int, orders: int, products: int, start: str, days: int, seed: int):
+        self.customers, self.orders, self.products = customers, orders, products
+        self.start = np.datetime64(start, 'D')
+        self.days = days
+        self.seed = seed
+
+        rng = _rng(seed, DAYS)
+        # Day weights: growth x weekday x holiday season; orders per day drawn once, in date order
+        offsets = np.arange(days)
+        dates = self.start + offsets
+        weekday = (dates.astype('datetime64[D]').view('int64') - 4) % 7  # 0 = Monday
+        day_of_year = (dates - dates.astype('datetime64[Y]')).astype(int)
+        weights = (
+            1.25 ** (offsets / 365)
+            * np.array([0.92, 0.95, 0.98, 1.0, 1.08, 1.15, 0.97])[weekday]
+            * (1 + 0.6 * np.exp(-((day_of_year - 332) / 20.0) ** 2) + 0.1 * np.exp(-((day_of_year - 190) / 30.0) ** 2))
+        )
+        self.order_day_ends = np.cumsum(rng.multinomial(orders, weights / weights.sum()))
+
+        # Customers, in signup order; some signed up in the year before the range
+        rng = _rng(seed, CUSTOMERS)
+        signup = np.sort(rng.integers(-365, days, customers))
+        signup[0] = min(signup[0], 0)  # someone can place the first order
+        self.signup = signup.astype(np.int32)
+        self.tier = np.searchsorted(np.cumsum(TIER_SHARE), rng.random(customers) * TIER_SHARE.sum(), side='right').astype(np.int8)
+        self.customer_cdf = np.cumsum(TIER_ACTIVITY[self.tier] * rng.lognormal(0.0, 0.8, customers))
+
+        # Products: category, price, and long-tail popularity
+        rng = _rng(seed, PRODUCTS)
+        names = list(CATEGORIES)
+        self.category = rng.integers(0, len(names), products)
+        median = np.array([CATEGORIES[name][3] for name in names])[self.category]
+        dollars = np.maximum(np.floor(median * rng.lognormal(0.0, 0.6, products)), 1)
+        self.price_cents = (dollars * 100 + 99).astype(np.int64)
+        self.cost_cents = np.round(self.price_cents * rng.uniform(0.35, 0.65, products)).astype(np.int64)
+        popularity = 1.0 / (rng.permutation(products) + 1) ** 1.07
+        self.product_cdf = np.cumsum(popularity)
+        self.popularity = popularity / popularity.max()
+
+    def order_ranges(self):
+        for start in range(0, self.orders, CHUNK_ROWS):
+            yield start // CHUNK_ROWS, start, min(start + CHUNK_ROWS, self.orders)
+
+    def customer_ranges(self):
+        for start in range(0, self.customers, CHUNK_ROWS):
+            yield start // CHUNK_ROWS, start, min(start + CHUNK_ROWS, self.customers)
+
+    def product_rows(self) -> dict:
+        rng = _rng(self.seed, PRODUCTS, 1)
+        names = list(CATEGORIES)
+        subcategory = rng.integers(0, 5, self.products)
+        brand = rng.integers(0, 5, self.products)
+        adjective = rng.integers(0, len(ADJECTIVES), self.products)
+        rows = {'id': _ids(self.seed, PRODUCTS, 0, self.products),
+                'product_name': [], 'category': [], 'subcategory': [], 'sku': [], 'brand': [], 'description': []}
+        for i, (c, s, b, a) in enumerate(zip(self.category.tolist(), subcategory.tolist(), brand.tolist(), adjective.tolist())):
+            name = names[c]
+            code, subcategories, brands, _ = CATEGORIES[name]
+            rows['product_name'].append(f"{brands[b]} {ADJECTIVES[a]} {subcategories[s]} {i % 1000:03d}")
+            rows['category'].append(name)
+            rows['subcategory'].append(subcategories[s])
+            rows['sku'].append(f"SYN{self.seed}-{code}-{i:07d}")
+            rows['brand'].append(brands[b])
+            rows['description'].append(f"{ADJECTIVES[a]} {subcategories[s].lower()} by {brands[b]}")
+        rows['price'] = _money(self.price_cents)
+        rows['cost'] = _money(self.cost_cents)
+        return rows
+
+    def inventory_rows(self) -> dict:
+        rng = _rng(self.seed, INVENTORY)
+        reorder_point = np.clip(np.round(5 + 75 * self.popularity ** 0.3), 5, 80).astype(np.int64)
+        # ~5% of products end up at or below their reorder point
+        on_hand = np.round(reorder_point * rng.lognormal(1.0, 0.6, self.products)).astype(np.int64)
+        restocked = self.start + np.timedelta64(self.days - 1, 'D') - rng.integers(0, 60, self.products).astype('timedelta64[D]')
+        return {
+            'id': _ids(self.seed, INVENTORY, 0, self.products),
+            'product_id': _ids(self.seed, PRODUCTS, 0, self.products),
+            'quantity_on_hand': on_hand.tolist(),
+            'reorder_point': reorder_point.tolist(),
+            'reorder_quantity': (reorder_point * rng.integers(3, 7, self.products)).tolist(),
+            'warehouse_location': [f"{chr(65 + r)}-{n:02d}" for r, n in
+                                   zip(rng.integers(0, 6, self.products).tolist(), rng.integers(1, 40, self.products).tolist())],
+            'last_restock_date': restocked.astype(str).tolist(),
+        }
+
+    def customer_rows(self, chunk: int, start: int, stop: int) -> dict:
+        rng = _rng(self.seed, CUSTOMERS, chunk + 1)
+        n = stop - start
+        first = rng.integers(0, len(FIRST_NAMES), n).tolist()
+        last = rng.integers(0, len(LAST_NAMES), n).tolist()
+        city_cdf = np.cumsum([c[3] for c in CITIES])
+        city = _pick(rng, city_cdf, n).tolist()
+        number = rng.integers(100, 9999, n).tolist()
+        street = rng.integers(0, len(STREETS), n).tolist()
+        since = (self.start + self.signup[start:stop]).astype(str).tolist()
+        return {
+            'id': _ids(self.seed, CUSTOMERS, start, stop),
+            'customer_name': [f"{FIRST_NAMES[f]} {LAST_NAMES[l]}" for f, l in zip(first, last)],
+            'email': [f"{FIRST_NAMES[f].lower()}.{LAST_NAMES[l].lower()}{i}@example.com"
+                      for i, f, l in zip(range(start, stop), first, last)],
+            'phone': [f"555-{i % 10000:04d}" for i in range(start, stop)],
+            'address': [f"{a} {STREETS[s]}" for a, s in zip(number, street)],
+            'city': [CITIES[c][1] for c in city],
+            'state': [CITIES[c][0] for c in city],
+            'zip_code': [CITIES[c][2] for c in city],
+            'customer_since': since,
+            'loyalty_tier': TIERS[self.tier[start:stop]].tolist(),
+            'created_at': since,
+        }
+
+    def order_rows(self, chunk: int, start: int, stop: int):
+        """(orders, order items) columns for orders start..stop-1"""
+        rng = _rng(self.seed, ORDERS, chunk)
+        n = stop - start
+
+        # Dates in order, customers among those signed up by then
+        day = np.searchsorted(self.order_day_ends, np.arange(start, stop), side='right').astype(np.int32)
+        seconds = np.clip(rng.normal(14 * 3600, 3.5 * 3600, n), 0, 86399).astype(np.int64)
+        ordered_at = (self.start + day).astype('datetime64[s]') + seconds
+        signed_up = np.searchsorted(self.signup, day, side='right')
+        customer = np.minimum(
+            np.searchsorted(self.customer_cdf, rng.random(n) * self.customer_cdf[signed_up - 1], side='right'),
+            signed_up - 1
+        )
+
+        status = np.where(rng.random(n) < STATUS_CANCELLED, 'cancelled', 'completed').astype(object)
+        status[(day >= self.days - PENDING_DAYS) & (rng.random(n) < STATUS_PENDING)] = 'pending'
+        payment = PAYMENT_METHODS[_pick(rng, np.cumsum(PAYMENT_SHARE), n)]
+
+        # Basket: lines per order by tier, long-tail products, small quantities, occasional line discounts
+        lines = np.minimum(1 + rng.poisson(TIER_BASKET[self.tier[customer]]), MAX_LINES)
+        line_order = np.repeat(np.arange(n), lines)
+        m = len(line_order)
+        product = _pick(rng, self.product_cdf, m)
+        quantity = np.minimum(rng.geometric(0.65, m), 6)
+        unit_cents = self.price_cents[product]
+        gross = quantity * unit_cents
+        line_discount = np.where(rng.random(m) < 0.12, np.round(gross * rng.uniform(0.05, 0.25, m)), 0).astype(np.int64)
+        subtotal = gross - line_discount
+
+        items_total = np.add.reduceat(subtotal, np.cumsum(lines) - lines)
+        discount = np.where(rng.random(n) < 0.1, np.round(items_total * 0.1), 0).astype(np.int64)
+        tax = np.round((items_total - discount) * TAX_RATE).astype(np.int64)
+        shipping = np.where(items_total >= FREE_SHIPPING_CENTS, 0, SHIPPING_CENTS[rng.integers(0, 3, n)])
+        order_ids = _ids(self.seed, ORDERS, start, stop)
+        created = ordered_at.astype(str).tolist()
+
+        orders = {
+            'id': order_ids,
+            'order_number': [f"SYN{self.seed}-{i:010d}" for i in range(start, stop)],
+            'customer_id': [f"{self.seed & 0xffffffff:08x}-{CUSTOMERS:04x}-4000-8000-{c:012x}" for c in customer.tolist()],
+            'order_date': created,
+            'status': status.tolist(),
+            'total_amount': _money(items_total - discount + tax + shipping),
+            'discount_amount': _money(discount),
+            'tax_amount': _money(tax),
+            'shipping_amount': _money(shipping),
+            'payment_method': payment.tolist(),
+            'created_at': created,
+        }
+        item_start = start * MAX_LINES  # unique per order range, independent of other chunks
+        items = {
+            'id': _ids(self.seed, ORDER_ITEMS, item_start, item_start + m),
+            'order_id': [order_ids[i] for i in line_order.tolist()],
+            'product_id': [f"{self.seed & 0xffffffff:08x}-{PRODUCTS:04x}-4000-8000-{p:012x}" for p in product.tolist()],
+            'quantity': quantity.tolist(),
+            'unit_price': _money(unit_cents),
+            'discount': _money(line_discount),
+            'subtotal': _money(subtotal),
+            'created_at': [created[i] for i in line_order.tolist()],
+        }
+        return orders, items
+
+def _exists(cur, table: str) -> bool:
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL", (table,))
+    return cur.fetchone()[0]
+
+
+def load(conn, dataset: SyntheticDataset, replace: bool = False, refresh: bool = True) -> dict:
+    """Generate and COPY the dataset; returns row counts and timings"""
+    counts = {'customers': 0, 'products': 0, 'inventory': 0, 'orders': 0, 'order_items': 0}
+    started = time.perf_counter()
+
+    with conn.cursor() as cur:
+        # Rollup triggers only queue work until the rebuild at the end
+        cur.execute("SELECT set_config('analytics.rollup_mode', 'deferred', false)")
+        if replace:
+            tables = ['analytics_demo_order_items', 'analytics_demo_orders', 'analytics_demo_inventory',
+                      'analytics_demo_products', 'analytics_demo_customers']
+            tables += [t for t in (LOW_STOCK_TABLE, SEGMENTS_TABLE) if _exists(cur, t)]
+            cur.execute(f"TRUNCATE {', '.join(tables)}")
+        conn.commit()
+
+        _copy(cur, 'analytics_demo_products', dataset.product_rows())
+        counts['products'] = dataset.products
+        for chunk, start, stop in dataset.customer_ranges():
+            _copy(cur, 'analytics_demo_customers', dataset.customer_rows(chunk, start, stop))
+            counts['customers'] += stop - start
+            conn.commit()
+        _copy(cur, 'analytics_demo_inventory', dataset.inventory_rows())
+        counts['inventory'] = dataset.products
+        conn.commit()
+
+        for chunk, start, stop in dataset.order_ranges():
+            orders, items = dataset.order_rows(chunk, start, stop)
+            _copy(cur, 'analytics_demo_orders', orders)
+            _copy(cur, 'analytics_demo_order_items', items)
+            conn.commit()
+            counts['orders'] += stop - start
+            counts['order_items'] += len(items['id'])
+            elapsed = time.perf_counter() - started
+            print(f"  {counts['orders']:,} orders, {counts['order_items']:,} items "
+                  f"({sum(counts.values()) / elapsed:,.0f} rows/s)")
+
+        counts['load_seconds'] = round(time.perf_counter() - started, 1)
+        cur.execute("SELECT set_config('analytics.rollup_mode', '', false)")
+        conn.commit()
+
+    if refresh:
+        finished = time.perf_counter()
+        with conn.cursor() as cur:
+            rollups, segments = all(_exists(cur, t) for t in ROLLUP_TABLES), _exists(cur, SEGMENTS_TABLE)
+        conn.rollback()
+        if rollups:
+            rebuild_rollups(conn)
+        if segments:
+            get_segment_engine().refresh(conn, full=True)
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            for table in ('analytics_demo_customers', 'analytics_demo_products', 'analytics_demo_inventory',
+                          'analytics_demo_orders', 'analytics_demo_order_items'):
+                cur.execute(f"ANALYZE {table}")
+        conn.autocommit = False
+        counts['refresh_seconds'] = round(time.perf_counter() - finished, 1)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load seeded synthetic data into the analytics tables")
+    parser.add_argument("command", choices=["load"])
+    parser.add_argument("--customers", type=int, default=10_000)
+    parser.add_argument("--orders", type=int, help="Orders to generate (default: 8 per customer)")
+    parser.add_argument("--products", type=int, default=1_000)
+    parser.add_argument("--start", default="2024-01-01", help="First order date (default: 2024-01-01)")
+    parser.add_argument("--days", type=int, default=730, help="Days of order history (default: 730)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--replace", action="store_true", help="Empty the analytics tables first")
+    parser.add_argument("--no-refresh", action="store_true",
+                        help="Leave rollups and segments queued (run their refresh commands later)")
+    parser.add_argument("--schema", help="A business's schema (see tenants.py); default search_path otherwise")
+    args = parser.parse_args(argv)
+
+    dataset = SyntheticDataset(args.customers, args.orders or args.customers * 8, args.products,
+                               args.start, args.days, args.seed)
+    conn = psycopg2.connect(os.getenv('DATABASE_URL'))
+    try:
+        if args.schema:
+            with conn.cursor() as cur:
+                cur.execute("SELECT set_config('search_path', quote_ident(%s), false)", (args.schema,))
+            conn.commit()
+        print(f"🧪 Generating {dataset.customers:,} customers, {dataset.products:,} products and "
+              f"{dataset.orders:,} orders (seed {dataset.seed})")
+        counts = load(conn, dataset, replace=args.replace, refresh=not args.no_refresh)
+        print(f"✅ Loaded {counts['customers']:,} customers, {counts['products']:,} products, "
+              f"{counts['orders']:,} orders and {counts['order_items']:,} order items in {counts['load_seconds']}s")
+        if 'refresh_seconds' in counts:
+            print(f"✅ Rebuilt rollups and segments and analyzed the tables in {counts['refresh_seconds']}s")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
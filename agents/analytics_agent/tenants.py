@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# agents/analytics_agent/tenants.py
+"""
+Per-business schemas for the analytics tables.
+
+database/migrations/create_analytics_tenants.sql maps business ids to
+schemas. AnalyticsTools resolves its business's schema here and scopes
+every borrowed connection to it with search_path, so the fixed tools and
+generated SQL read only that business's tables. The search_path is a
+session setting: it is remembered per connection and only re-set when a
+connection moves to another scope. Businesses without a schema use public
+with the connection's default search_path, as before.
+
+    python -m agents.analytics_agent.tenants list
+    python -m agents.analytics_agent.tenants create <business_id> [--schema NAME] [--no-rollups]
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+import weakref
+import psycopg2
+import psycopg2.errors
+from psycopg2.extras import RealDictCursor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_SCHEMA = 'public'
+SCHEMA_TTL_SECONDS = 60
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'database', 'migrations')
+ROLLUPS_MIGRATION = os.path.join(MIGRATIONS_DIR, 'create_analytics_rollups.sql')
+SEGMENTS_MIGRATION = os.path.join(MIGRATIONS_DIR, 'create_analytics_customer_segments.sql')
+STOCK_ALERTS_MIGRATION = os.path.join(MIGRATIONS_DIR, 'create_analytics_stock_alerts.sql')
+
+
+class TenantDirectory:
+    """business_id -> schema lookups and per-connection search_path scoping"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._schemas = {}  # business_id -> (expires_at, schema)
+        self._scopes = weakref.WeakKeyDictionary()  # connection -> schema its search_path points at (None = default)
+        self._switches = 0
+
+    def schema_for(self, conn, business_id=None) -> str:
+        """The business's schema, cached briefly; public when it has none"""
+        key = str(business_id) if business_id else ''
+        if not key:
+            return DEFAULT_SCHEMA
+        with self._lock:
+            cached = self._schemas.get(key)
+            if cached and cached[0] > time.monotonic():
+                return cached[1]
+
+        schema = DEFAULT_SCHEMA
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT schema_name FROM public.analytics_tenants WHERE business_id = %s", (key,))
+                row = cur.fetchone()
+                schema = row[0] if row else DEFAULT_SCHEMA
+        except psycopg2.errors.UndefinedTable:
+            conn.rollback()
+
+        with self._lock:
+            self._schemas[key] = (time.monotonic() + SCHEMA_TTL_SECONDS, schema)
+        return schema
+
+    def scope(self, conn, schema: str = None):
+        """
+        Point conn's search_path at schema (None or public = the default path).
+
+        Only called on a connection with no open transaction; the change is
+        committed so it survives the rollback that ends each borrow.
+        """
+        target = None if schema in (None, DEFAULT_SCHEMA) else schema
+        with self._lock:
+            if conn in self._scopes and self._scopes[conn] == target:
+                return
+        with conn.cursor() as cur:
+            if target is None:
+                cur.execute("RESET search_path")
+            else:
+                # The tenant schema alone: no fall-through to public's tables
+                cur.execute("SELECT set_config('search_path', quote_ident(%s), false)", (target,))
+        conn.commit()
+        with self._lock:
+            self._scopes[conn] = target
+            self._switches += 1
+
+    def forget(self, business_id=None):
+        """Drop cached schema lookups for one business, or all"""
+        with self._lock:
+            if business_id is None:
+                self._schemas.clear()
+            else:
+                self._schemas.pop(str(business_id), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'businesses': len(self._schemas), 'connections': len(self._scopes), 'switches': self._switches}
+
+
+def create_tenant(conn, business_id, schema: str = None, with_rollups: bool = True) -> str:
+    """Create (or return) the business's schema, optionally with rollups, segments and stock alerts"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT public.analytics_create_tenant(%s, %s)", (str(business_id), schema))
+        schema = cur.fetchone()[0]
+        if with_rollups:
+            cur.execute("SELECT set_config('search_path', quote_ident(%s), true)", (schema,))
+            for migration in (ROLLUPS_MIGRATION, SEGMENTS_MIGRATION, STOCK_ALERTS_MIGRATION):
+                with open(migration) as f:
+                    cur.execute(f.read())
+    conn.commit()
+    get_tenant_directory().forget(business_id)
+    return schema
+
+
+def list_tenants(conn) -> list:
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute("SELECT business_id, schema_name, created_at FROM public.analytics_tenants ORDER BY created_at")
+        tenants = [dict(row) for row in cur.fetchall()]
+    conn.rollback()
+    return tenants
+
+
+_directory = None
+_directory_lock = threading.Lock()
+
+
+def get_tenant_directory() -> TenantDirectory:
+    """Process-wide tenant directory shared by every AnalyticsTools instance"""
+    global _directory
+    if _directory is None:
+        with _directory_lock:
+            if _directory is None:
+                _directory = TenantDirectory()
+    return _directory
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage per-business analytics schemas")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list")
+    create = subparsers.add_parser("create")
+    create.add_argument("business_id")
+    create.add_argument("--schema", help="Schema name (default: analytics_t_<hash of business_id>)")
+    create.add_argument("--no-rollups", action="store_true", help="Skip creating the rollup, segment and low-stock tables")
+    args = parser.parse_args(argv)
+
+    conn = psycopg2.connect(os.getenv('DATABASE_URL'))
+    try:
+        if args.command == "create":
+            schema = create_tenant(conn, args.business_id, args.schema, with_rollups=not args.no_rollups)
+            print(f"✅ Business {args.business_id} uses schema {schema}")
+        else:
+            for tenant in list_tenants(conn):
+                print(f"  {tenant['business_id']}: {tenant['schema_name']}")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,13 +2,54 @@
 
 import os
 import json
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 import psycopg2
+import psycopg2.errors
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
 from openai import OpenAI
 
+from agents.analytics_agent.schema_catalog import get_schema_catalog
+from agents.analytics_agent.schema_linking import get_schema_linker
+from agents.analytics_agent.query_cache import get_query_cache
+from agents.analytics_agent.result_cache import get_result_cache, referenced_tables
+from agents.analytics_agent.sql_validator import validate_sql, SQLValidationError
+from agents.analytics_agent.deadline import (
+    current_deadline, bind, DeadlineExceeded, GENERATION_RESERVE_MS, QUERY_RESERVE_MS, SUMMARY_MIN_MS, STAGE_MIN_MS
+)
+from agents.analytics_agent.query_guard import get_query_guard, QueryGuardError
+from agents.analytics_agent.result_stream import stream_query
+from agents.analytics_agent.local_replica import get_local_replica, ReplicaTimeout
+from agents.analytics_agent.result_encoding import encode_rows, RESULT_FORMATS
+from agents.analytics_agent.answer_formatter import (
+    format_locally, format_generic, FORMAT_MODES, DEFAULT_FORMAT_MODE
+)
+from agents.analytics_agent.statements import get_statement_registry, statement_sql
+from agents.analytics_agent.tenants import get_tenant_directory
+from agents.analytics_agent import trends
+from agents.analytics_agent import segments
+from agents.analytics_agent import stock_alerts
+
 load_dotenv()
 
+SQL_RULES = """Follow these rules:
+1. Return ONLY the SQL query, no explanations or markdown
+2. Use only SELECT statements (no INSERT, UPDATE, DELETE, DROP, etc.)
+3. Use appropriate JOINs when data spans multiple tables
+4. Format currency with 2 decimal places using ROUND()
+5. Use proper aggregations (SUM, COUNT, AVG) as needed
+6. Add ORDER BY clauses for ranked results
+7. Include LIMIT when showing top N results
+8. Use COALESCE for null handling
+9. Filter out cancelled orders unless specifically asked about them
+10. For date ranges, use appropriate date functions"""
+
+
+def _strip_markdown(sql_query: str) -> str:
+    return sql_query.replace('```sql', '').replace('```', '').strip()
+
 
 class AnalyticsTools:
     """
@@ -16,100 +57,177 @@ class AnalyticsTools:
     into SQL queries and returns insights from the business database.
     """
     
-    def __init__(self, business_id=None):
-        """Initialize analytics tools with database connection"""
+    def __init__(self, business_id=None, connection_pool=None, llm=None):
+        """
+        Initialize analytics tools
+        
+        Args:
+            business_id: Business the tools answer for
+            connection_pool: Optional shared psycopg2 pool; without one the
+                instance opens its own connection
+            llm: Optional shared OpenAI client
+        """
         self.business_id = business_id
-        self.db_connection = psycopg2.connect(os.getenv('DATABASE_URL'))
+        self._pool = connection_pool
+        self.db_connection = None if connection_pool else psycopg2.connect(os.getenv('DATABASE_URL'))
         
         # Initialize OpenAI client for SQL generation
-        self.llm = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.llm = llm or OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        
+        # The business's own schema (public unless it has one in analytics_tenants)
+        self.schema = 'public'
+        self._tenants = get_tenant_directory()
+        
+        # Warm the process-wide schema catalog
+        self._catalog = get_schema_catalog()
+        self._get_database_schema()
+        
+        # Picks the tables/columns relevant to each question for the prompt
+        self._linker = get_schema_linker()
+        
+        # Question -> SQL cache shared across instances
+        self._query_cache = get_query_cache()
+        
+        # Query results, invalidated by writes to the tables they read
+        self._result_cache = get_result_cache()
+        
+        # Timeout, plan and row-cap checks for generated SQL
+        self._guard = get_query_guard()
+        
+        # Optional in-process DuckDB copy of the tables (ANALYTICS_LOCAL_REPLICA)
+        self._replica = get_local_replica()
         
-        # Cache database schema
-        self._db_schema = self._get_database_schema()
+        # Fixed tool queries, prepared once per connection
+        self._statements = get_statement_registry()
+        
+        # Daily revenue/order arrays behind get_sales_trends
+        self._trends = trends.get_trend_cache()
+        
+        # RFM / cohort table, refreshed from queued order changes before reads
+        self._segments = segments.get_segment_engine()
+        
+        # query_database_batch: questions per call, and queries run at once
+        # (one pooled connection each; a single connection runs them in turn)
+        self.batch_max_questions = int(os.getenv('ANALYTICS_BATCH_MAX_QUESTIONS', '20'))
+        self.batch_concurrency = int(os.getenv('ANALYTICS_BATCH_CONCURRENCY', '4')) if connection_pool else 1
     
-    def _get_database_schema(self):
-        """Retrieve the schema of analytics demo tables"""
-        schema_query = """
-        SELECT 
-            table_name,
-            column_name,
-            data_type,
-            is_nullable
-        FROM information_schema.columns
-        WHERE table_schema = 'public' 
-        AND table_name LIKE 'analytics_demo_%'
-        ORDER BY table_name, ordinal_position;
+    @contextmanager
+    def _connection(self, scoped: bool = True):
         """
+        Borrow a database connection for one tool call.
         
+        Scoped connections have their search_path on the business's schema;
+        unscoped ones (for the shared tables in public) keep the default.
+        The read transaction is always ended afterwards, so pooled connections
+        never sit idle in a transaction and a failed query cannot poison the
+        next call.
+        """
+        conn = self._pool.getconn() if self._pool else self.db_connection
+        broken = False
         try:
-            with self.db_connection.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(schema_query)
-                columns = cur.fetchall()
-                
-                # Organize schema by table
-                schema = {}
-                for col in columns:
-                    table = col['table_name']
-                    if table not in schema:
-                        schema[table] = []
-                    schema[table].append({
-                        'column': col['column_name'],
-                        'type': col['data_type'],
-                        'nullable': col['is_nullable']
-                    })
-                
-                return schema
+            if scoped:
+                self.schema = self._tenants.schema_for(conn, self.business_id)
+            self._tenants.scope(conn, self.schema if scoped else None)
+            yield conn
+        except psycopg2.errors.QueryCanceled:
+            # statement_timeout: the connection itself is fine
+            raise
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            if not broken and not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+            if self._pool:
+                self._pool.putconn(conn, close=broken or bool(conn.closed))
+    
+    def _schema_entry(self, conn=None):
+        """Current catalog entry, revalidated against the catalog fingerprint"""
+        if conn is None:
+            with self._connection() as conn:
+                return self._catalog.get(conn, self.business_id, self.schema)
+        return self._catalog.get(conn, self.business_id, self.schema)
+    
+    def _get_database_schema(self):
+        """Retrieve the schema of analytics demo tables"""
+        try:
+            return self._schema_entry().tables
         except Exception as e:
             print(f"Error retrieving schema: {e}")
             return {}
     
+    @property
+    def _db_schema(self):
+        entry = self._catalog.peek(self.business_id, self.schema)
+        return entry.tables if entry else {}
+    
     def _get_schema_description(self):
-        """Format schema for LLM context"""
-        description = "# Database Schema for Retail Business Analytics\n\n"
-        
-        table_descriptions = {
-            'analytics_demo_customers': 'Customer information including name, email, loyalty tier, and location',
-            'analytics_demo_products': 'Product catalog with names, categories, SKUs, prices, and costs',
-            'analytics_demo_orders': 'Order transactions with totals, dates, status, and payment methods',
-            'analytics_demo_order_items': 'Individual line items for each order with quantities and prices',
-            'analytics_demo_inventory': 'Current inventory levels and warehouse locations'
-        }
-        
-        for table, columns in self._db_schema.items():
-            desc = table_descriptions.get(table, 'Table description')
-            description += f"## {table}\n{desc}\n\nColumns:\n"
-            for col in columns:
-                description += f"- {col['column']} ({col['type']})\n"
-            description += "\n"
+        """Format schema for LLM context (prebuilt once per catalog version)"""
+        try:
+            return self._schema_entry().prompt_text
+        except Exception as e:
+            print(f"Error retrieving schema: {e}")
+            entry = self._catalog.peek(self.business_id, self.schema)
+            return entry.prompt_text if entry else ""
+    
+    def _stage_llm(self, stage: str, reserve_ms: float = 0, optional: bool = False):
+        """
+        The LLM client for one stage of the call, timed out so that reserve_ms
+        of the request's time budget is left for the stages after it.
         
-        return description
+        Optional stages get None when they would have less than STAGE_MIN_MS
+        (the caller then skips them); required ones raise DeadlineExceeded
+        once the budget is gone.
+        """
+        deadline = current_deadline()
+        if deadline is None:
+            return self.llm
+        if optional and not deadline.allows(stage, reserve_ms + STAGE_MIN_MS):
+            return None
+        return self.llm.with_options(timeout=deadline.ms_for(stage, reserve_ms) / 1000, max_retries=0)
     
-    def _generate_sql_query(self, question: str) -> str:
+    def _link_schemas(self, entry, questions: list) -> dict:
+        """question -> schema subset of the catalog entry, embedding all the questions at once"""
+        llm = self._stage_llm('schema_link', GENERATION_RESERVE_MS + QUERY_RESERVE_MS, optional=True)
+        if llm is None:
+            return {}
+        try:
+            return dict(zip(questions, self._linker.link_many(entry, questions, llm=llm)))
+        except Exception as e:
+            print(f"Error linking schema: {e}")
+            return {}
+    
+    def _link_schema(self, entry, question: str):
+        """Subset of the catalog entry relevant to the question (None: use the whole schema)"""
+        llm = self._stage_llm('schema_link', GENERATION_RESERVE_MS + QUERY_RESERVE_MS, optional=True)
+        if llm is None:
+            return None
+        try:
+            return self._linker.link(entry, question, llm=llm)
+        except Exception as e:
+            print(f"Error linking schema: {e}")
+            return None
+    
+    def _generate_sql_query(self, question: str, schema_context: str = None) -> str:
         """Use LLM to generate SQL from natural language question"""
         
-        schema_context = self._get_schema_description()
+        schema_context = schema_context or self._get_schema_description()
         
         system_prompt = f"""You are an expert SQL query generator for a retail business analytics database.
 
 {schema_context}
 
 Generate ONLY a valid PostgreSQL SELECT query based on the user's question.
-Follow these rules:
-1. Return ONLY the SQL query, no explanations or markdown
-2. Use only SELECT statements (no INSERT, UPDATE, DELETE, DROP, etc.)
-3. Use appropriate JOINs when data spans multiple tables
-4. Format currency with 2 decimal places using ROUND()
-5. Use proper aggregations (SUM, COUNT, AVG) as needed
-6. Add ORDER BY clauses for ranked results
-7. Include LIMIT when showing top N results
-8. Use COALESCE for null handling
-9. Filter out cancelled orders unless specifically asked about them
-10. For date ranges, use appropriate date functions
+{SQL_RULES}
 
 Return just the SQL query without any formatting or explanation."""
 
+        llm = self._stage_llm('sql_generation', QUERY_RESERVE_MS)
         try:
-            response = self.llm.chat.completions.create(
+            response = llm.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -121,65 +239,218 @@ Return just the SQL query without any formatting or explanation."""
             sql_query = response.choices[0].message.content.strip()
             
             # Remove markdown code blocks if present
-            sql_query = sql_query.replace('```sql', '').replace('```', '').strip()
-            
-            return sql_query
+            return _strip_markdown(sql_query)
             
         except Exception as e:
             raise Exception(f"SQL generation failed: {str(e)}")
     
-    def _validate_sql_query(self, query: str) -> bool:
-        """Basic safety validation for SQL queries"""
-        query_upper = query.upper()
-        
-        # Forbidden keywords that could modify data
-        forbidden = ['INSERT', 'UPDATE', 'DELETE', 'DROP', 'CREATE', 'ALTER', 
-                    'TRUNCATE', 'GRANT', 'REVOKE', 'EXEC', 'EXECUTE']
+    def _generate_sql_batch(self, questions: list, schema_context: str = None) -> dict:
+        """
+        Generate SQL for several questions in one structured LLM call.
         
-        for keyword in forbidden:
-            if keyword in query_upper:
-                return False
+        Returns:
+            question -> SQL for every question the response answered
+        """
+        schema_context = schema_context or self._get_schema_description()
+        numbered = "\n".join(f"{i}. {question}" for i, question in enumerate(questions, 1))
         
-        # Must be a SELECT query
-        if not query_upper.strip().startswith('SELECT'):
-            return False
+        system_prompt = f"""You are an expert SQL query generator for a retail business analytics database.
+
+{schema_context}
+
+Generate one valid PostgreSQL SELECT query for each of the user's numbered questions.
+{SQL_RULES}
+
+Respond with a JSON object of the form {{"queries": [{{"id": <question number>, "sql": "<query>"}}]}},
+with exactly one entry per question."""
+
+        try:
+            response = self._stage_llm('sql_generation', QUERY_RESERVE_MS).chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": numbered}
+                ],
+                temperature=0.1,
+                response_format={"type": "json_object"}
+            )
+            queries = json.loads(response.choices[0].message.content).get('queries', [])
+        except Exception as e:
+            print(f"Batch SQL generation failed: {e}")
+            return {}
         
-        return True
+        generated = {}
+        for item in queries:
+            try:
+                index = int(item['id']) - 1
+                sql_query = _strip_markdown(str(item['sql']))
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 0 <= index < len(questions) and sql_query:
+                generated[questions[index]] = sql_query
+        return generated
     
-    def _execute_query(self, query: str):
-        """Execute SQL query and return results"""
+    def _validate_sql_query(self, query: str) -> str:
+        """Canonical form of a read-only query over the business's tables (see sql_validator)"""
+        return validate_sql(query, self._db_schema, self.schema)
+    
+    def _run_query(self, query: str, params=None, guard: bool = False, statement: str = None):
+        """
+        Execute SQL and return (results, guard decision, summary).
+        
+        Queries are answered from the local replica when it is enabled and
+        in sync, and otherwise from the result cache when the data is
+        unchanged. With guard=True the query runs read-only under the
+        business's statement timeout, plan limits and row cap (see
+        query_guard), and is streamed: results holds only the head rows,
+        while summary has the row count and per-column stats over every row
+        read. A named statement (see statements) runs as a prepared
+        statement on Postgres.
+        """
+        decision = None
+        deadline = current_deadline()
         try:
-            with self.db_connection.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(query)
-                results = cur.fetchall()
+            with self._connection() as conn:
+                tables = referenced_tables(query, self._db_schema)
+                # No statement may outlast the request's time budget
+                timeout_ms = deadline.ms_for('query') if deadline else None
+                if guard:
+                    limits = self._guard.limits_for(conn, self.business_id)
+                    if timeout_ms:
+                        limits = limits.capped(timeout_ms)
+                
+                # Local copy: no plan check needed, but the timeout and row cap still apply
+                try:
+                    local = self._replica.run(
+                        conn, self.schema, tables, query, params,
+                        max_rows=limits.row_cap if guard else None,
+                        timeout_ms=limits.statement_timeout_ms if guard else timeout_ms
+                    )
+                except ReplicaTimeout:
+                    if not guard:
+                        # Only the request's time budget times out unguarded queries
+                        raise DeadlineExceeded('query', deadline)
+                    decision = {'action': 'timeout', 'engine': 'replica', 'limits': limits.as_dict(),
+                                'reason': f"Cancelled after {limits.statement_timeout_ms} ms"}
+                    raise QueryGuardError(f"Query timed out after {limits.statement_timeout_ms} ms", decision)
+                if local is not None:
+                    results, summary = local
+                    if guard:
+                        decision = {'action': 'allowed', 'engine': 'replica', 'limits': limits.as_dict()}
+                        self._guard.record_stream(decision, summary, limits)
+                    return results, decision, summary
+                
+                if guard:
+                    self._guard.begin(conn, limits)
+                    query, decision = self._guard.check(conn, query, limits)
+                    decision['engine'] = 'postgres'
+                elif timeout_ms:
+                    self._guard.time_box(conn, timeout_ms)
+                
+                # Version token first: a write racing the query only costs a later miss
+                token = self._result_cache.version_token(conn, self.schema, tables)
+                key = self._result_cache.key(
+                    self.business_id, self.schema, query, params, token,
+                    mode='stream' if guard else 'rows'
+                ) if token else None
+                cached = self._result_cache.get(key) if key else None
                 
-                # Convert to list of dicts for JSON serialization
-                return [dict(row) for row in results]
+                if cached is not None:
+                    results, summary = cached
+                elif guard:
+                    summary = stream_query(conn, query, params, max_rows=limits.row_cap)
+                    results = summary.pop('rows')
+                elif statement:
+                    results = self._statements.execute(conn, statement, query, params)
+                    summary = None
+                else:
+                    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                        cur.execute(query, params)
+                        # Convert to list of dicts for JSON serialization
+                        results = [dict(row) for row in cur.fetchall()]
+                    summary = None
                 
+                if key and cached is None:
+                    self._result_cache.put(key, results, summary)
+                
+                if guard:
+                    self._guard.record_stream(decision, summary, limits)
+                return results, decision, summary
+                
+        except (QueryGuardError, DeadlineExceeded):
+            raise
+        except psycopg2.errors.QueryCanceled as e:
+            if decision is None:
+                # Unguarded queries are only time-boxed by the request's deadline
+                if deadline is not None:
+                    raise DeadlineExceeded('query', deadline)
+                raise Exception(f"Query execution failed: {str(e)}")
+            decision.update(action='timeout', reason=f"Cancelled after {limits.statement_timeout_ms} ms")
+            raise QueryGuardError(f"Query timed out after {limits.statement_timeout_ms} ms", decision)
+        except (psycopg2.errors.UndefinedTable, psycopg2.errors.UndefinedColumn) as e:
+            # The schema changed under us; rebuild the catalog on next use
+            self._catalog.invalidate(self.business_id, self.schema)
+            raise Exception(f"Query execution failed: {str(e)}")
         except Exception as e:
             raise Exception(f"Query execution failed: {str(e)}")
     
-    def _format_results(self, results: list, question: str) -> str:
-        """Format query results into human-readable response"""
+    def _execute_query(self, query: str, params=None):
+        """Execute SQL query and return results"""
+        return self._run_query(query, params)[0]
+    
+    def _execute_statement(self, name: str, params=None):
+        """Run a registered fixed-tool statement (rollup variant when available)"""
+        return self._run_query(statement_sql(name, self._db_schema), params, statement=name)[0]
+    
+    def _format_results(self, results: list, question: str, result_summary: dict = None, format_mode: str = None):
+        """
+        Format query results into human-readable response
+        
+        Common shapes (scalar, single row, ranked list, time series) are
+        phrased locally; the LLM is used for the rest unless format_mode
+        forces one path ('local' or 'llm').
+        
+        Returns:
+            (answer, how it was produced: 'local:<shape>' or 'llm')
+        """
+        format_mode = format_mode or DEFAULT_FORMAT_MODE
+        if format_mode != 'llm':
+            answer, shape = format_locally(results, result_summary)
+            if answer:
+                return answer, f"local:{shape}"
+            if format_mode == 'local':
+                return format_generic(results, result_summary), 'local:generic'
+        
         if not results:
-            return "No data found for your query."
+            return "No data found for your query.", 'local:empty'
+        
+        # Out of time for an LLM round trip: the rows as they are
+        deadline = current_deadline()
+        if deadline and not deadline.allows('summary', SUMMARY_MIN_MS):
+            return format_generic(results, result_summary), 'local:deadline'
         
         # Use LLM to create natural language summary
         try:
             data_sample = json.dumps(results[:10], indent=2, default=str)  # Limit to first 10 rows
             
+            row_count = len(results)
+            column_stats = ""
+            if result_summary:
+                row_count = result_summary['row_count'] if result_summary['complete'] else f"more than {result_summary['row_count']}"
+                column_stats = f"\nColumn statistics over all rows read:\n{json.dumps(result_summary['columns'], default=str)}\n"
+            
             summary_prompt = f"""Based on this query result, provide a clear, concise answer in 1-2 sentences.
 
 Original question: {question}
 
 Query results (showing first 10 rows):
 {data_sample}
-
-Total rows returned: {len(results)}
+{column_stats}
+Total rows returned: {row_count}
 
 Provide a direct, simple answer to the question. Be conversational and focus only on the key information. Do not use markdown formatting, bullet points, or numbered lists. Just answer the question naturally."""
 
-            response = self.llm.chat.completions.create(
+            response = self._stage_llm('summary').chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "You are a business analyst providing insights from data."},
@@ -190,54 +461,247 @@ Provide a direct, simple answer to the question. Be conversational and focus onl
             
             summary = response.choices[0].message.content.strip()
             
-            return summary
+            return summary, 'llm'
             
         except Exception as e:
             # Fallback to raw data if formatting fails
-            return f"Query returned {len(results)} results:\n\n{json.dumps(results[:10], indent=2, default=str)}"
+            return f"Query returned {len(results)} results:\n\n{json.dumps(results[:10], indent=2, default=str)}", 'raw'
+    
+    def _record_sql_outcome(self, cached, fingerprint, question, sql_query, row_count=None, error=None):
+        """Keep the SQL cache in step with how the SQL actually behaved"""
+        # The question's embedding is usually stored already; skip it when short on time
+        llm = self._stage_llm('sql_cache', SUMMARY_MIN_MS, optional=True)
+        with self._connection(scoped=False) as conn:
+            if cached and error:
+                self._query_cache.evict(conn, cached['id'])
+            elif cached:
+                self._query_cache.record_hit(conn, cached['id'], row_count)
+            else:
+                self._query_cache.store(
+                    conn, self.business_id, self.schema, fingerprint, question, sql_query,
+                    status='failed' if error else 'ok', row_count=row_count, error=error,
+                    llm=llm, semantic=llm is not None
+                )
+    
+    def _answer(self, question: str, sql_query: str, cached, fingerprint: str, link,
+                format_mode: str = None, result_format: str = 'rows', run=None) -> dict:
+        """
+        Validate, execute and phrase one question's SQL (query_database's result dict).
+        
+        run, when given, returns the _run_query result for sql_query (or raises
+        its error); query_database_batch uses it to share one execution
+        between questions that produced the same SQL.
+        """
+        # Validate query for safety; the canonical form is what runs and gets cached
+        try:
+            sql_query = self._validate_sql_query(sql_query)
+        except SQLValidationError as e:
+            error = f"Generated query failed safety validation: {e}"
+            self._record_sql_outcome(cached, fingerprint, question, sql_query, error=error)
+            return {
+                'success': False,
+                'error': error,
+                'question': question,
+                'sql_query': sql_query
+            }
+        
+        # Execute query
+        try:
+            results, guard_decision, summary = run() if run else self._run_query(sql_query, guard=True)
+        except QueryGuardError as e:
+            self._record_sql_outcome(cached, fingerprint, question, sql_query, error=str(e))
+            return {
+                'success': False,
+                'error': f"Query blocked by execution guard: {e}",
+                'question': question,
+                'sql_query': sql_query,
+                'guard': e.decision
+            }
+        except Exception as e:
+            self._record_sql_outcome(cached, fingerprint, question, sql_query, error=str(e))
+            raise
+        
+        self._record_sql_outcome(cached, fingerprint, question, sql_query, row_count=summary['row_count'])
+        
+        # Format results
+        answer, answer_source = self._format_results(results, question, summary, format_mode)
+        deadline = current_deadline()
+        
+        return {
+            'success': True,
+            'question': question,
+            'answer': answer,
+            'answer_source': answer_source,
+            'sql_query': sql_query,
+            'sql_cache': cached['match'] if cached else 'miss',
+            'schema_link': link.summary() if link else None,
+            'guard': guard_decision,
+            'row_count': summary['row_count'],
+            'row_count_complete': summary['complete'],
+            'column_stats': summary['columns'],
+            'data': encode_rows(results, result_format),  # Head rows only (ANALYTICS_HEAD_ROWS)
+            'deadline': deadline.as_dict() if deadline else None
+        }
     
-    def query_database(self, question: str) -> dict:
+    def query_database(self, question: str, format_mode: str = None, result_format: str = 'rows') -> dict:
         """
         MCP Tool: Answer business questions by querying the analytics database
         
         Args:
             question: Natural language question about the business data
+            format_mode: 'auto' (default), 'local' or 'llm' answer phrasing
+            result_format: 'rows' (default), 'columnar' or 'arrow' encoding of data
             
         Returns:
             Dict with success status, answer, SQL query used, and any errors
         """
+        if format_mode and format_mode not in FORMAT_MODES:
+            return {
+                'success': False,
+                'error': f"format_mode must be one of {', '.join(FORMAT_MODES)}",
+                'question': question
+            }
+        if result_format not in RESULT_FORMATS:
+            return {
+                'success': False,
+                'error': f"result_format must be one of {', '.join(RESULT_FORMATS)}",
+                'question': question
+            }
+        
         try:
-            # Generate SQL from question
-            sql_query = self._generate_sql_query(question)
+            # Resolved once per call; linking and generation reuse it
+            entry = self._schema_entry()
+            fingerprint = entry.fingerprint
             
-            # Validate query for safety
-            if not self._validate_sql_query(sql_query):
-                return {
-                    'success': False,
-                    'error': 'Generated query failed safety validation',
-                    'question': question
+            # Reuse SQL generated for the same (or an equivalent) question
+            llm = self._stage_llm('sql_cache', GENERATION_RESERVE_MS + QUERY_RESERVE_MS, optional=True)
+            with self._connection(scoped=False) as conn:
+                cached = self._query_cache.lookup(
+                    conn, self.business_id, self.schema, fingerprint, question,
+                    llm=llm, semantic=llm is not None
+                )
+            
+            # Generate SQL from question, describing only the relevant part of the schema
+            link = None if cached else self._link_schema(entry, question)
+            sql_query = cached['sql_query'] if cached else self._generate_sql_query(
+                question, link.prompt_text if link else entry.prompt_text
+            )
+            
+            return self._answer(question, sql_query, cached, fingerprint, link, format_mode, result_format)
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'question': question
+            }
+    
+    def query_database_batch(self, questions: list, format_mode: str = None, result_format: str = 'rows') -> dict:
+        """
+        MCP Tool: Answer several business questions at once
+        
+        SQL for every question without cached SQL is generated in a single
+        LLM call, each distinct query runs once, and the queries run
+        concurrently on pooled connections, so a batch takes about as long
+        as its slowest question.
+        
+        Args:
+            questions: Natural language questions (at most ANALYTICS_BATCH_MAX_QUESTIONS)
+            format_mode: 'auto' (default), 'local' or 'llm' answer phrasing
+            result_format: 'rows' (default), 'columnar' or 'arrow' encoding of data
+            
+        Returns:
+            Dict with success status and one query_database result per question, in order
+        """
+        if not isinstance(questions, list) or not questions or not all(isinstance(q, str) and q.strip() for q in questions):
+            return {'success': False, 'error': 'questions must be a non-empty list of questions'}
+        if len(questions) > self.batch_max_questions:
+            return {'success': False, 'error': f"At most {self.batch_max_questions} questions per batch"}
+        if format_mode and format_mode not in FORMAT_MODES:
+            return {'success': False, 'error': f"format_mode must be one of {', '.join(FORMAT_MODES)}"}
+        if result_format not in RESULT_FORMATS:
+            return {'success': False, 'error': f"result_format must be one of {', '.join(RESULT_FORMATS)}"}
+        
+        started = time.perf_counter()
+        deadline = current_deadline()
+        try:
+            entry = self._schema_entry()
+            fingerprint = entry.fingerprint
+            distinct = list(dict.fromkeys(questions))
+            
+            llm = self._stage_llm('sql_cache', GENERATION_RESERVE_MS + QUERY_RESERVE_MS, optional=True)
+            with self._connection(scoped=False) as conn:
+                cached = {
+                    question: self._query_cache.lookup(
+                        conn, self.business_id, self.schema, fingerprint, question,
+                        llm=llm, semantic=llm is not None
+                    )
+                    for question in distinct
                 }
             
-            # Execute query
-            results = self._execute_query(sql_query)
+            # One generation call for every miss, over the union of their schema subsets
+            misses = [question for question in distinct if not cached[question]]
+            links = self._link_schemas(entry, misses) if misses else {}
+            batch_link = self._linker.combine(entry, list(links.values())) if misses and len(links) == len(misses) else None
+            schema_context = batch_link.prompt_text if batch_link else entry.prompt_text
+            generated = self._generate_sql_batch(misses, schema_context) if misses else {}
+            
+            sql_queries, errors = {}, {}
+            for question in distinct:
+                if cached[question]:
+                    sql_queries[question] = cached[question]['sql_query']
+                elif question in generated:
+                    sql_queries[question] = generated[question]
+                else:
+                    # Left out of the batch response: generate it on its own
+                    try:
+                        sql_queries[question] = self._generate_sql_query(question, schema_context)
+                    except Exception as e:
+                        errors[question] = str(e)
+            
+            canonical = {}  # question -> canonical SQL (questions failing validation are left out)
+            runs = {}  # canonical SQL -> Future of its _run_query result
+            
+            def answer(question):
+                if question in errors:
+                    return {'success': False, 'error': errors[question], 'question': question}
+                sql_query = sql_queries[question]
+                run = runs.get(canonical.get(question))
+                try:
+                    return self._answer(question, sql_query, cached[question], fingerprint, links.get(question),
+                                        format_mode, result_format, run=run.result if run else None)
+                except Exception as e:
+                    return {'success': False, 'error': str(e), 'question': question}
             
-            # Format results
-            answer = self._format_results(results, question)
+            with ThreadPoolExecutor(max_workers=self.batch_concurrency) as executor:
+                for question, sql_query in sql_queries.items():
+                    try:
+                        canonical[question] = self._validate_sql_query(sql_query)
+                    except SQLValidationError:
+                        continue  # _answer reports the reason
+                    if canonical[question] not in runs:
+                        runs[canonical[question]] = executor.submit(bind(self._run_query), canonical[question], guard=True)
+                # Queued after every query, so a worker only ever waits on a query already running
+                answers = dict(zip(distinct, executor.map(bind(answer), distinct)))
             
+            results = [answers[question] for question in questions]
             return {
                 'success': True,
-                'question': question,
-                'answer': answer,
-                'sql_query': sql_query,
-                'row_count': len(results),
-                'data': results if len(results) <= 100 else results[:100]  # Limit data returned
+                'results': results,
+                'question_count': len(questions),
+                'answered': sum(1 for result in results if result['success']),
+                'distinct_queries': len(runs),
+                'sql_cache': {'hits': len(distinct) - len(misses), 'generated': len(misses)},
+                'schema_link': batch_link.summary() if batch_link else None,
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+                'deadline': deadline.as_dict() if deadline else None
             }
             
         except Exception as e:
             return {
                 'success': False,
                 'error': str(e),
-                'question': question
+                'questions': questions
             }
     
     def get_quick_stats(self) -> dict:
@@ -248,21 +712,7 @@ Provide a direct, simple answer to the question. Be conversational and focus onl
             Dict with key business metrics
         """
         try:
-            stats_query = """
-            SELECT 
-                (SELECT COUNT(*) FROM analytics_demo_customers) as total_customers,
-                (SELECT COUNT(*) FROM analytics_demo_products) as total_products,
-                (SELECT COUNT(*) FROM analytics_demo_orders) as total_orders,
-                (SELECT COUNT(*) FROM analytics_demo_orders WHERE status = 'completed') as completed_orders,
-                (SELECT ROUND(COALESCE(SUM(total_amount), 0), 2) FROM analytics_demo_orders WHERE status = 'completed') as total_revenue,
-                (SELECT ROUND(COALESCE(AVG(total_amount), 0), 2) FROM analytics_demo_orders WHERE status = 'completed') as avg_order_value,
-                (SELECT COUNT(DISTINCT customer_id) FROM analytics_demo_orders) as customers_with_orders,
-                (SELECT MAX(order_date) FROM analytics_demo_orders) as last_order_date;
-            """
-            
-            with self.db_connection.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(stats_query)
-                stats = dict(cur.fetchone())
+            stats = self._execute_statement('quick_stats')[0]
             
             return {
                 'success': True,
@@ -287,25 +737,7 @@ Provide a direct, simple answer to the question. Be conversational and focus onl
             Dict with top products and their metrics
         """
         try:
-            query = f"""
-            SELECT 
-                p.product_name,
-                p.category,
-                p.brand,
-                COUNT(DISTINCT oi.order_id) as order_count,
-                SUM(oi.quantity) as total_units_sold,
-                ROUND(SUM(oi.subtotal), 2) as total_revenue,
-                ROUND(AVG(oi.unit_price), 2) as avg_selling_price
-            FROM analytics_demo_products p
-            JOIN analytics_demo_order_items oi ON p.id = oi.product_id
-            JOIN analytics_demo_orders o ON oi.order_id = o.id
-            WHERE o.status = 'completed'
-            GROUP BY p.id, p.product_name, p.category, p.brand
-            ORDER BY total_revenue DESC
-            LIMIT {limit};
-            """
-            
-            results = self._execute_query(query)
+            results = self._execute_statement('top_products', (int(limit),))
             
             return {
                 'success': True,
@@ -331,39 +763,9 @@ Provide a direct, simple answer to the question. Be conversational and focus onl
         """
         try:
             if customer_id:
-                query = f"""
-                SELECT 
-                    c.customer_name,
-                    c.email,
-                    c.loyalty_tier,
-                    c.city,
-                    c.state,
-                    c.customer_since,
-                    COUNT(o.id) as total_orders,
-                    COUNT(CASE WHEN o.status = 'completed' THEN 1 END) as completed_orders,
-                    ROUND(SUM(CASE WHEN o.status = 'completed' THEN o.total_amount ELSE 0 END), 2) as lifetime_value,
-                    ROUND(AVG(CASE WHEN o.status = 'completed' THEN o.total_amount END), 2) as avg_order_value,
-                    MAX(o.order_date) as last_order_date
-                FROM analytics_demo_customers c
-                LEFT JOIN analytics_demo_orders o ON c.id = o.customer_id
-                WHERE c.id = '{customer_id}'
-                GROUP BY c.id, c.customer_name, c.email, c.loyalty_tier, c.city, c.state, c.customer_since;
-                """
+                results = self._execute_statement('customer', (customer_id,))
             else:
-                query = """
-                SELECT 
-                    c.loyalty_tier,
-                    COUNT(DISTINCT c.id) as customer_count,
-                    COUNT(o.id) as total_orders,
-                    ROUND(AVG(o.total_amount), 2) as avg_order_value,
-                    ROUND(SUM(o.total_amount), 2) as total_revenue
-                FROM analytics_demo_customers c
-                LEFT JOIN analytics_demo_orders o ON c.id = o.customer_id AND o.status = 'completed'
-                GROUP BY c.loyalty_tier
-                ORDER BY total_revenue DESC;
-                """
-            
-            results = self._execute_query(query)
+                results = self._execute_statement('tier')
             
             return {
                 'success': True,
@@ -377,10 +779,186 @@ Provide a direct, simple answer to the question. Be conversational and focus onl
                 'error': str(e)
             }
     
+    def get_sales_trends(self, metric: str = 'revenue', granularity: str = 'month', periods: int = 6,
+                         window: int = 7, forecast_days: int = 30) -> dict:
+        """
+        MCP Tool: Trend, growth, seasonality and forecast of daily sales
+        
+        Args:
+            metric: 'revenue' (default), 'orders' or 'avg_order_value' (completed orders)
+            granularity: 'day', 'week' or 'month' (default) periods
+            periods: Number of most recent periods to report (default 6)
+            window: Rolling-average window in days (default 7)
+            forecast_days: Days to project past the last order (default 30)
+            
+        Returns:
+            Dict with per-period values and growth, rolling average,
+            weekday seasonality, forecast and a phrased answer
+        """
+        if metric not in trends.METRICS:
+            return {'success': False, 'error': f"metric must be one of {', '.join(trends.METRICS)}"}
+        if granularity not in trends.GRANULARITIES:
+            return {'success': False, 'error': f"granularity must be one of {', '.join(trends.GRANULARITIES)}"}
+        
+        try:
+            periods = min(max(int(periods), 1), 366)
+            window = min(max(int(window), 1), 365)
+            forecast_days = min(max(int(forecast_days), 0), 365)
+            
+            with self._connection() as conn:
+                query = statement_sql('daily_series', self._db_schema)
+                series = self._trends.series(
+                    conn, self.business_id, self.schema, referenced_tables(query, self._db_schema),
+                    load=lambda: self._statements.execute(conn, 'daily_series', query)
+                )
+            
+            result = trends.analyze(series, metric, granularity, periods, window, forecast_days)
+            return dict(result, success=True, answer=trends.describe(result))
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def _refresh_segments(self):
+        """Apply queued order changes to the segment table (stale rows are served if this fails)"""
+        with self._connection() as conn:
+            if self._segments.pending(conn):
+                try:
+                    self._segments.refresh(conn)
+                except psycopg2.Error as e:
+                    print(f"⚠️  Customer segment refresh failed: {e}")
+    
+    def _segments_missing(self) -> dict:
+        if segments.SEGMENTS_TABLE in self._db_schema:
+            return None
+        return {
+            'success': False,
+            'error': 'Customer segments are not set up (run database/migrations/create_analytics_customer_segments.sql)'
+        }
+    
+    def get_customer_segments(self, segment: str = None, limit: int = 20) -> dict:
+        """
+        MCP Tool: RFM (recency, frequency, monetary) customer segments
+        
+        Args:
+            segment: Optional segment name; lists its customers instead of the overview
+            limit: Customers to list for a segment, by completed-order value (default 20)
+            
+        Returns:
+            Dict with per-segment counts and averages, or one segment's customers
+        """
+        missing = self._segments_missing()
+        if missing:
+            return missing
+        names = [name for name, _, _ in segments.RFM_SEGMENTS] + ['Others']
+        if segment and segment not in names:
+            return {'success': False, 'error': f"segment must be one of {', '.join(names)}"}
+        
+        try:
+            self._refresh_segments()
+            
+            if segment:
+                results = self._execute_statement('segment_customers', (segment, min(max(int(limit), 1), 500)))
+                return {
+                    'success': True,
+                    'segment': segment,
+                    'customers': results,
+                    'count': len(results)
+                }
+            
+            results = self._execute_statement('customer_segments')
+            total = sum(row['customer_count'] for row in results)
+            for row in results:
+                row['share'] = round(row['customer_count'] / total, 4) if total else None
+            return {
+                'success': True,
+                'as_of': results[0]['as_of'] if results else None,
+                'segments': results,
+                'customer_count': total
+            }
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def get_customer_cohorts(self, months: int = 12, horizon: int = 6) -> dict:
+        """
+        MCP Tool: Monthly acquisition cohorts and their retention
+        
+        Args:
+            months: Most recent cohorts to return (default 12)
+            horizon: Months after acquisition to report retention for (default 6)
+            
+        Returns:
+            Dict with per-cohort size, lifetime revenue and retention rates
+        """
+        missing = self._segments_missing()
+        if missing:
+            return missing
+        
+        try:
+            self._refresh_segments()
+            rows = self._execute_statement('customer_cohorts')
+            as_of, cohorts = segments.cohort_table(
+                rows, min(max(int(months), 1), 120), min(max(int(horizon), 1), segments.MASK_MONTHS)
+            )
+            return {
+                'success': True,
+                'as_of': as_of,
+                'cohorts': cohorts,
+                'count': len(cohorts)
+            }
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def get_low_stock(self, limit: int = 50) -> dict:
+        """
+        MCP Tool: Products at or below their reorder point
+        
+        Args:
+            limit: Maximum products to return, most urgent first (default 50)
+            
+        Returns:
+            Dict with the low-stock products and how many there are in total
+        """
+        try:
+            # The trigger-maintained set when it exists, else the partial-index scan
+            source = 'low_stock' if stock_alerts.LOW_STOCK_TABLE in self._db_schema else 'low_stock_scan'
+            results = self._execute_statement(source, (min(max(int(limit), 1), 500),))
+            total = results[0]['total_low'] if results else 0
+            for row in results:
+                row.pop('total_low', None)
+                row['shortfall'] = row['reorder_point'] - row['quantity_on_hand']
+            return {
+                'success': True,
+                'items': results,
+                'count': len(results),
+                'total_low': total,
+                'source': 'alerts' if source == 'low_stock' else 'inventory'
+            }
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def close(self):
+        """Close the instance's own connection (pooled connections stay in the pool)"""
+        if getattr(self, 'db_connection', None) is not None and not self.db_connection.closed:
+            self.db_connection.close()
+    
     def __del__(self):
         """Clean up database connection"""
-        if hasattr(self, 'db_connection'):
-            self.db_connection.close()
+        self.close()
 
 
 # Factory function for creating analytics tools
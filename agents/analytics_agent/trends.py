@@ -0,0 +1,312 @@
+# agents/analytics_agent/trends.py
+"""
+Revenue and order trends computed in NumPy.
+
+The daily completed-order series (from the daily rollups when they exist)
+is loaded once per business and schema into dense arrays, one slot per day
+from the first order to the last, and reused until a write bumps the
+tables' counters in analytics_table_versions (or, for untracked tables,
+for ANALYTICS_TREND_TTL seconds). Period totals, growth rates, rolling
+averages, weekday seasonality and the forecast are all array operations
+over that cache, so a trend question costs one version lookup.
+
+Windows end at the last day with orders (as_of in the results), not today,
+so a tenant whose data stops early still gets its recent trend.
+"""
+
+import os
+import threading
+import time
+from datetime import date
+import numpy as np
+import psycopg2.errors
+from dotenv import load_dotenv
+
+from agents.analytics_agent.result_cache import table_versions
+from agents.analytics_agent.answer_formatter import format_value
+
+load_dotenv()
+
+METRICS = ('revenue', 'orders', 'avg_order_value')
+GRANULARITIES = ('day', 'week', 'month')
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+# Relative daily slope below which a trend reads as flat
+FLAT_SLOPE = 0.001
+
+# Fewest trailing days the trend line is fitted on, however short the reported range
+MIN_FIT_DAYS = 28
+
+
+class DailySeries:
+    """Dense daily revenue/order arrays for one business"""
+
+    def __init__(self, rows: list, token=None):
+        self.token = token
+        self.loaded_at = time.monotonic()
+        if not rows:
+            self.days = np.array([], dtype='datetime64[D]')
+            self.revenue = np.zeros(0)
+            self.orders = np.zeros(0)
+            return
+        days = np.array([row['day'] for row in rows], dtype='datetime64[D]')
+        offsets = (days - days.min()).astype(np.int64)
+        length = int(offsets.max()) + 1
+        self.days = days.min() + np.arange(length)
+        self.revenue = np.zeros(length)
+        self.orders = np.zeros(length)
+        np.add.at(self.revenue, offsets, np.array([float(row['revenue'] or 0) for row in rows]))
+        np.add.at(self.orders, offsets, np.array([float(row['orders'] or 0) for row in rows]))
+
+    def __len__(self):
+        return len(self.days)
+
+    @property
+    def weekdays(self) -> np.ndarray:
+        """0 = Monday (1970-01-01 was a Thursday)"""
+        return (self.days.astype(np.int64) + 3) % 7
+
+    def buckets(self, granularity: str) -> np.ndarray:
+        """Start day of each day's week/month (the day itself for 'day')"""
+        if granularity == 'month':
+            return self.days.astype('datetime64[M]').astype('datetime64[D]')
+        if granularity == 'week':
+            return self.days - self.weekdays.astype('timedelta64[D]')
+        return self.days
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Element-wise ratio, NaN where the denominator is zero"""
+    out = np.full(np.shape(numerator), np.nan)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out
+
+
+def _rounded(values, digits: int = 2) -> list:
+    return [None if not np.isfinite(v) else round(float(v), digits) for v in values]
+
+
+def _value(metric: str, revenue, orders):
+    return _ratio(revenue, orders) if metric == 'avg_order_value' else (revenue if metric == 'revenue' else orders)
+
+
+def _linear_fit(x: np.ndarray, y: np.ndarray) -> tuple:
+    """(slope, intercept) of a least-squares line; flat for fewer than two points"""
+    if len(x) > 1:
+        slope, intercept = np.polyfit(x, y, 1)
+        return float(slope), float(intercept)
+    return 0.0, float(y.mean()) if len(y) else 0.0
+
+
+def _format(metric: str, value) -> str:
+    if metric == 'orders' and value is not None and float(value).is_integer():
+        value = int(value)
+    return format_value(metric, value)
+
+
+def _label(start, granularity: str) -> str:
+    day = start.astype(date)
+    if granularity == 'month':
+        return day.strftime('%Y-%m')
+    if granularity == 'week':
+        return f"week of {day.isoformat()}"
+    return day.isoformat()
+
+
+def analyze(series: DailySeries, metric: str = 'revenue', granularity: str = 'month', periods: int = 6,
+            window: int = 7, forecast_days: int = 30) -> dict:
+    """
+    Trend summary of one metric over the last `periods` weeks/months/days.
+
+    Returns:
+        Dict with per-period totals and growth, the trailing rolling
+        average, weekday seasonality and a forecast for the next days
+    """
+    if not len(series):
+        return {'metric': metric, 'granularity': granularity, 'periods': [], 'as_of': None}
+
+    as_of = series.days[-1]
+    buckets = series.buckets(granularity)
+    starts, inverse = np.unique(buckets, return_inverse=True)
+    inverse = inverse.ravel()
+    starts, first = starts[-periods:], len(starts) - min(periods, len(starts))
+    in_range = inverse >= first
+    bucket = inverse[in_range] - first
+
+    revenue = np.bincount(bucket, weights=series.revenue[in_range], minlength=len(starts))
+    orders = np.bincount(bucket, weights=series.orders[in_range], minlength=len(starts))
+    days = np.bincount(bucket, minlength=len(starts))
+    values = _value(metric, revenue, orders)
+    growth = _ratio(np.diff(values), values[:-1])
+
+    # Buckets cut short by the start or end of the data
+    if granularity == 'month':
+        next_starts = (starts.astype('datetime64[M]') + 1).astype('datetime64[D]')
+        full_days = (next_starts - starts).astype(np.int64)
+    else:
+        full_days = np.full(len(starts), 7 if granularity == 'week' else 1)
+    partial = days < full_days
+
+    # Trailing window vs the window before it
+    window = max(1, min(window, len(series) // 2 or 1))
+    cum_revenue = np.concatenate(([0.0], np.cumsum(series.revenue)))
+    cum_orders = np.concatenate(([0.0], np.cumsum(series.orders)))
+
+    def window_value(end):
+        start = max(end - window, 0)
+        r, o = cum_revenue[end] - cum_revenue[start], cum_orders[end] - cum_orders[start]
+        if metric == 'avg_order_value':
+            return r / o if o else np.nan
+        return (r if metric == 'revenue' else o) / window
+
+    current, previous = window_value(len(series)), window_value(len(series) - window)
+
+    # Weekday seasonality: each weekday's average day relative to the overall average day
+    daily = series.orders if metric == 'orders' else series.revenue
+    weekdays = series.weekdays
+    weekday_mean = _ratio(np.bincount(weekdays, weights=daily, minlength=7), np.bincount(weekdays, minlength=7))
+    seasonal = _ratio(weekday_mean, np.full(7, daily.mean()))
+    seasonal = np.where(np.isfinite(seasonal), seasonal, 1.0)
+
+    # Linear trend over the range's deseasonalized days (weekdays that never sell are left
+    # out of the fit), projected forward and re-seasonalized
+    fit = (in_range | (np.arange(len(series)) >= len(series) - MIN_FIT_DAYS)) & (seasonal[weekdays] > 0)
+    x = np.flatnonzero(fit).astype(float)
+    y = daily[fit] / seasonal[weekdays[fit]]
+    slope, intercept = _linear_fit(x, y)
+    ahead = np.arange(len(series), len(series) + forecast_days, dtype=float)
+    ahead_weekdays = (weekdays[-1] + 1 + np.arange(forecast_days)) % 7
+    forecast = np.clip((slope * ahead + intercept) * seasonal[ahead_weekdays], 0, None)
+    level = y.mean() if len(y) else 0.0
+    direction = 'flat' if not level or abs(slope) / level < FLAT_SLOPE else ('up' if slope > 0 else 'down')
+
+    forecast_result = {'days': forecast_days, 'through': (as_of + np.timedelta64(forecast_days, 'D')).astype(date).isoformat()}
+    if metric == 'avg_order_value':
+        # Order value is not additive: project orders the same way and divide
+        order_slope, order_intercept = _linear_fit(x, series.orders[fit] / seasonal[weekdays[fit]])
+        projected_orders = np.clip((order_slope * ahead + order_intercept) * seasonal[ahead_weekdays], 0, None).sum()
+        forecast_result['value'] = round(float(forecast.sum() / projected_orders), 2) if projected_orders else None
+    else:
+        forecast_result['total'] = round(float(forecast.sum()), 2)
+        forecast_result['daily_average'] = round(float(forecast.mean()), 2) if forecast_days else None
+
+    return {
+        'metric': metric,
+        'granularity': granularity,
+        'as_of': as_of.astype(date).isoformat(),
+        'periods': [
+            {'period': _label(start, granularity), 'value': value, 'days': int(n), 'partial': bool(p)}
+            for start, value, n, p in zip(starts, _rounded(values), days, partial)
+        ],
+        'growth': [
+            {'period': _label(start, granularity), 'rate': rate}
+            for start, rate in zip(starts[1:], _rounded(growth, 4))
+        ],
+        'change': _rounded(_ratio(values[-1:] - values[:1], values[:1]), 4)[0] if len(values) > 1 else None,
+        'rolling': {
+            'window_days': window,
+            'current': _rounded([current])[0],
+            'previous': _rounded([previous])[0],
+            'change': _rounded([(current - previous) / previous if previous else np.nan], 4)[0]
+        },
+        'trend': {'direction': direction, 'slope_per_day': round(float(slope), 4)},
+        'seasonality': {name: round(float(factor), 3) for name, factor in zip(WEEKDAYS, seasonal)},
+        'forecast': forecast_result
+    }
+
+
+def describe(result: dict) -> str:
+    """One-paragraph answer for an analyze() result, with exact figures"""
+    periods = result['periods']
+    if not periods:
+        return "No completed orders to build a trend from."
+    metric, label = result['metric'], result['metric'].replace('_', ' ')
+    first, last = periods[0], periods[-1]
+    sentences = [
+        f"{label.capitalize()} over the last {len(periods)} {result['granularity']}{'s' if len(periods) != 1 else ''} (through "
+        f"{format_value('day', date.fromisoformat(result['as_of']))}): "
+        + ", ".join(f"{p['period']} {_format(metric, p['value'])}" for p in periods) + "."
+    ]
+    if result['change'] is not None:
+        word = 'up' if result['change'] >= 0 else 'down'
+        sentences.append(f"That is {word} {abs(result['change']) * 100:.1f}% from {first['period']} to {last['period']}"
+                         + (" (the latest period is partial)." if last['partial'] else "."))
+    rolling = result['rolling']
+    if rolling['current'] is not None:
+        sentences.append(f"The {rolling['window_days']}-day average is {_format(metric, rolling['current'])}"
+                         + (f" ({rolling['change'] * 100:+.1f}% vs the previous {rolling['window_days']} days)."
+                            if rolling['change'] is not None else "."))
+    forecast = result['forecast']
+    projected = forecast.get('value', forecast.get('total'))
+    if metric == 'orders' and projected is not None:
+        projected = round(projected)
+    if projected is not None:
+        sentences.append(f"At the current {result['trend']['direction']} trend, the next {forecast['days']} days "
+                         f"project to {_format(metric, projected)}"
+                         + (" per order." if metric == 'avg_order_value' else "."))
+    return " ".join(sentences)
+
+
+class TrendCache:
+    """DailySeries per (business, schema), validated against table write counters"""
+
+    def __init__(self, ttl: float = None):
+        # Only for tables without write counters
+        self.ttl = ttl or float(os.getenv('ANALYTICS_TREND_TTL', '300'))
+        self._lock = threading.Lock()
+        self._series = {}  # (business_id, schema) -> DailySeries
+        self._stats = {'hits': 0, 'loads': 0}
+
+    def _token(self, conn, schema: str, tables: list):
+        try:
+            versions = table_versions(conn, schema, tables)
+        except psycopg2.errors.UndefinedTable:
+            conn.rollback()
+            return None
+        if len(versions) != len(tables):
+            return None
+        return tuple(sorted(versions.items()))
+
+    def series(self, conn, business_id, schema: str, tables: list, load) -> DailySeries:
+        """
+        The business's daily series, reloaded only when its tables changed.
+
+        Args:
+            conn: Connection scoped to the business's schema
+            tables: Tables the series query reads
+            load: Callable returning the series rows (day, orders, revenue)
+        """
+        key = (str(business_id) if business_id else None, schema)
+        token = self._token(conn, schema, tables)
+        with self._lock:
+            cached = self._series.get(key)
+            if cached is not None and (
+                (token is not None and cached.token == token)
+                or (token is None and cached.token is None and time.monotonic() - cached.loaded_at < self.ttl)
+            ):
+                self._stats['hits'] += 1
+                return cached
+
+        series = DailySeries(load(), token)
+        with self._lock:
+            self._series[key] = series
+            self._stats['loads'] += 1
+        return series
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, businesses=len(self._series))
+
+
+_trends = None
+_trends_lock = threading.Lock()
+
+
+def get_trend_cache() -> TrendCache:
+    """Process-wide trend cache shared by every AnalyticsTools instance"""
+    global _trends
+    if _trends is None:
+        with _trends_lock:
+            if _trends is None:
+                _trends = TrendCache()
+    return _trends
@@ -0,0 +1,7 @@
+-- Add provenance of near-duplicate chunks collapsed at ingestion time
+-- Run this after add_kb_chunk_structure_fields.sql
+
+ALTER TABLE assistant_knowledge_base
+ADD COLUMN IF NOT EXISTS sources JSONB DEFAULT '[]'::jsonb;
+
+COMMENT ON COLUMN assistant_knowledge_base.sources IS 'Every source chunk collapsed into this row by near-duplicate elimination';
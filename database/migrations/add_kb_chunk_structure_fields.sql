@@ -0,0 +1,9 @@
+-- Add structure metadata produced by the structure-aware knowledge base chunker
+-- Run this after create_assistant_tables_fixed.sql
+
+ALTER TABLE assistant_knowledge_base
+ADD COLUMN IF NOT EXISTS section_path TEXT,
+ADD COLUMN IF NOT EXISTS token_count INTEGER;
+
+COMMENT ON COLUMN assistant_knowledge_base.section_path IS 'Heading breadcrumb of the chunk, e.g. Services > Integrations';
+COMMENT ON COLUMN assistant_knowledge_base.token_count IS 'Token count of text_content at ingestion time';
@@ -0,0 +1,72 @@
+-- RFM scores and acquisition cohorts per customer for the analytics agent
+-- Run this after create_analytics_demo_tables.sql and create_analytics_table_versions.sql
+--
+-- One compact row per customer with at least one completed order: the
+-- customer's completed-order aggregates, acquisition cohort, monthly activity
+-- and recency/frequency/monetary scores. agents/analytics_agent/segments.py
+-- computes the rows in NumPy and keeps them current from a queue of customers
+-- whose orders changed (filled by the trigger below), so a refresh reads only
+-- those customers' orders and then re-ranks the compact table.
+--
+--     python -m agents.analytics_agent.segments refresh
+--     python -m agents.analytics_agent.segments rebuild
+--
+-- Table names are unqualified and functions pin the search_path they were
+-- created with, so the file can be applied per schema.
+
+CREATE TABLE IF NOT EXISTS analytics_demo_customer_segments (
+    customer_id UUID PRIMARY KEY,
+    first_order_date DATE NOT NULL,
+    last_order_date DATE NOT NULL,
+    frequency INTEGER NOT NULL,            -- completed orders
+    monetary DECIMAL(14, 2) NOT NULL,      -- completed-order value
+    cohort_month DATE NOT NULL,            -- month of the first completed order
+    activity_mask BIGINT NOT NULL,         -- bit k: ordered k months after cohort_month (k < 63)
+    r_score SMALLINT,                      -- 1-5 quintiles over all customers (5 = best)
+    f_score SMALLINT,
+    m_score SMALLINT,
+    segment VARCHAR(30),
+    scored_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_customer_segments_segment ON analytics_demo_customer_segments(segment);
+CREATE INDEX IF NOT EXISTS idx_customer_segments_cohort ON analytics_demo_customer_segments(cohort_month);
+
+-- Work queue (no unique constraint, so concurrent writers never block each other)
+CREATE TABLE IF NOT EXISTS analytics_segment_dirty_customers (customer_id UUID NOT NULL);
+
+CREATE OR REPLACE FUNCTION analytics_segments_orders_changed()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SET search_path FROM CURRENT
+AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO analytics_segment_dirty_customers SELECT DISTINCT customer_id FROM new_rows;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO analytics_segment_dirty_customers SELECT DISTINCT customer_id FROM old_rows;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS analytics_segments_orders_insert ON analytics_demo_orders;
+DROP TRIGGER IF EXISTS analytics_segments_orders_update ON analytics_demo_orders;
+DROP TRIGGER IF EXISTS analytics_segments_orders_delete ON analytics_demo_orders;
+CREATE TRIGGER analytics_segments_orders_insert AFTER INSERT ON analytics_demo_orders
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics_segments_orders_changed();
+CREATE TRIGGER analytics_segments_orders_update AFTER UPDATE ON analytics_demo_orders
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics_segments_orders_changed();
+CREATE TRIGGER analytics_segments_orders_delete AFTER DELETE ON analytics_demo_orders
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics_segments_orders_changed();
+
+SELECT public.analytics_track_table_version(current_schema(), 'analytics_demo_customer_segments');
+
+-- Queue every customer with orders; the first refresh builds the table
+INSERT INTO analytics_segment_dirty_customers SELECT DISTINCT customer_id FROM analytics_demo_orders;
+
+COMMENT ON TABLE analytics_demo_customer_segments IS 'RFM scores, segment and acquisition cohort per customer (refreshed by agents/analytics_agent/segments.py)';
@@ -0,0 +1,34 @@
+-- Question -> SQL cache for the analytics agent
+-- Run this after create_analytics_demo_tables.sql and create_embedding_migrations.sql
+-- Used by agents/analytics_agent/query_cache.py
+
+CREATE EXTENSION IF NOT EXISTS vector;
+
+CREATE TABLE IF NOT EXISTS analytics_query_cache (
+    id SERIAL PRIMARY KEY,
+    business_id VARCHAR(100) NOT NULL DEFAULT '',   -- '' = no business (demo)
+    schema_name VARCHAR(63) NOT NULL DEFAULT 'public',
+    schema_fingerprint VARCHAR(32) NOT NULL,        -- SchemaCatalog fingerprint the SQL was generated against
+    normalized_question TEXT NOT NULL,
+    question TEXT NOT NULL,
+    sql_query TEXT NOT NULL,
+    embedding vector(1536),
+    status VARCHAR(20) NOT NULL DEFAULT 'ok',      -- 'ok' or 'failed'
+    row_count INTEGER,
+    last_error TEXT,
+    hit_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT NOW(),
+    last_used_at TIMESTAMP DEFAULT NOW(),
+    UNIQUE (business_id, schema_name, schema_fingerprint, normalized_question)
+);
+
+CREATE INDEX IF NOT EXISTS analytics_query_cache_scope_idx
+ON analytics_query_cache(business_id, schema_name, schema_fingerprint)
+WHERE status = 'ok';
+
+-- Model the cached question embeddings are built with
+INSERT INTO embedding_models (table_schema, table_name, model, dimensions)
+VALUES ('public', 'analytics_query_cache', 'text-embedding-3-small', NULL)
+ON CONFLICT (table_schema, table_name) DO NOTHING;
+
+COMMENT ON TABLE analytics_query_cache IS 'Generated SQL per business, schema version and normalized question, with its last outcome';
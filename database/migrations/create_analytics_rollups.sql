@@ -0,0 +1,350 @@
+-- Incrementally maintained rollups for the analytics agent
+-- Run this after create_analytics_demo_tables.sql and create_analytics_table_versions.sql
+--
+-- Daily sales by product, category, customer tier and payment method, plus
+-- per-customer lifetime totals. Statement-level triggers on the base tables
+-- queue the affected days/customers and recompute just those, so refresh
+-- cost depends on the size of the change, not on the order history.
+--
+-- Bulk loads can skip the per-statement refresh with
+--     SET analytics.rollup_mode = 'deferred';
+-- and drain the queue once afterwards with SELECT analytics_refresh_rollups();
+-- (or python -m agents.analytics_agent.rollups refresh).
+--
+-- Table names are unqualified and functions pin the search_path they were
+-- created with, so the file can be applied per schema.
+
+-- ============================================================================
+-- Rollup tables
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS analytics_demo_daily_product_sales (
+    sales_date DATE NOT NULL,
+    product_id UUID NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    category VARCHAR(50),
+    order_count INTEGER NOT NULL,
+    units_sold INTEGER NOT NULL,
+    revenue DECIMAL(14, 2) NOT NULL,
+    line_count INTEGER NOT NULL,          -- order_items rows
+    unit_price_total DECIMAL(14, 2) NOT NULL,  -- SUM(unit_price); / line_count = avg selling price
+    PRIMARY KEY (sales_date, product_id, status)
+);
+
+CREATE TABLE IF NOT EXISTS analytics_demo_daily_category_sales (
+    sales_date DATE NOT NULL,
+    category VARCHAR(50) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    order_count INTEGER NOT NULL,
+    units_sold INTEGER NOT NULL,
+    revenue DECIMAL(14, 2) NOT NULL,
+    PRIMARY KEY (sales_date, category, status)
+);
+
+CREATE TABLE IF NOT EXISTS analytics_demo_daily_tier_sales (
+    sales_date DATE NOT NULL,
+    loyalty_tier VARCHAR(20) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    order_count INTEGER NOT NULL,
+    customer_count INTEGER NOT NULL,
+    revenue DECIMAL(14, 2) NOT NULL,
+    PRIMARY KEY (sales_date, loyalty_tier, status)
+);
+
+CREATE TABLE IF NOT EXISTS analytics_demo_daily_payment_sales (
+    sales_date DATE NOT NULL,
+    payment_method VARCHAR(30) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    order_count INTEGER NOT NULL,
+    revenue DECIMAL(14, 2) NOT NULL,
+    discount_total DECIMAL(14, 2) NOT NULL,
+    PRIMARY KEY (sales_date, payment_method, status)
+);
+
+CREATE TABLE IF NOT EXISTS analytics_demo_customer_totals (
+    customer_id UUID PRIMARY KEY,
+    total_orders INTEGER NOT NULL,
+    completed_orders INTEGER NOT NULL,
+    lifetime_value DECIMAL(14, 2) NOT NULL,   -- completed orders only
+    first_order_date TIMESTAMP,
+    last_order_date TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_daily_product_sales_product ON analytics_demo_daily_product_sales(product_id);
+
+-- Work queues (no unique constraints, so concurrent writers never block each other)
+CREATE TABLE IF NOT EXISTS analytics_rollup_dirty_days (sales_date DATE NOT NULL);
+CREATE TABLE IF NOT EXISTS analytics_rollup_dirty_customers (customer_id UUID NOT NULL);
+
+-- ============================================================================
+-- Recompute functions
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION analytics_rollup_days(p_days DATE[])
+RETURNS VOID
+LANGUAGE plpgsql
+SET search_path FROM CURRENT
+AS $$
+BEGIN
+    DELETE FROM analytics_demo_daily_product_sales WHERE sales_date = ANY(p_days);
+    INSERT INTO analytics_demo_daily_product_sales
+        (sales_date, product_id, status, category, order_count, units_sold, revenue, line_count, unit_price_total)
+    SELECT d.day, oi.product_id, o.status, MAX(p.category),
+           COUNT(DISTINCT oi.order_id), SUM(oi.quantity), SUM(oi.subtotal), COUNT(*), SUM(oi.unit_price)
+    FROM unnest(p_days) AS d(day)
+    JOIN analytics_demo_orders o ON o.order_date >= d.day AND o.order_date < d.day + 1
+    JOIN analytics_demo_order_items oi ON oi.order_id = o.id
+    JOIN analytics_demo_products p ON p.id = oi.product_id
+    GROUP BY d.day, oi.product_id, o.status;
+
+    DELETE FROM analytics_demo_daily_category_sales WHERE sales_date = ANY(p_days);
+    INSERT INTO analytics_demo_daily_category_sales
+        (sales_date, category, status, order_count, units_sold, revenue)
+    SELECT d.day, p.category, o.status,
+           COUNT(DISTINCT oi.order_id), SUM(oi.quantity), SUM(oi.subtotal)
+    FROM unnest(p_days) AS d(day)
+    JOIN analytics_demo_orders o ON o.order_date >= d.day AND o.order_date < d.day + 1
+    JOIN analytics_demo_order_items oi ON oi.order_id = o.id
+    JOIN analytics_demo_products p ON p.id = oi.product_id
+    GROUP BY d.day, p.category, o.status;
+
+    DELETE FROM analytics_demo_daily_tier_sales WHERE sales_date = ANY(p_days);
+    INSERT INTO analytics_demo_daily_tier_sales
+        (sales_date, loyalty_tier, status, order_count, customer_count, revenue)
+    SELECT d.day, COALESCE(c.loyalty_tier, 'Unknown'), o.status,
+           COUNT(*), COUNT(DISTINCT o.customer_id), SUM(o.total_amount)
+    FROM unnest(p_days) AS d(day)
+    JOIN analytics_demo_orders o ON o.order_date >= d.day AND o.order_date < d.day + 1
+    JOIN analytics_demo_customers c ON c.id = o.customer_id
+    GROUP BY d.day, COALESCE(c.loyalty_tier, 'Unknown'), o.status;
+
+    DELETE FROM analytics_demo_daily_payment_sales WHERE sales_date = ANY(p_days);
+    INSERT INTO analytics_demo_daily_payment_sales
+        (sales_date, payment_method, status, order_count, revenue, discount_total)
+    SELECT d.day, COALESCE(o.payment_method, 'unknown'), o.status,
+           COUNT(*), SUM(o.total_amount), SUM(COALESCE(o.discount_amount, 0))
+    FROM unnest(p_days) AS d(day)
+    JOIN analytics_demo_orders o ON o.order_date >= d.day AND o.order_date < d.day + 1
+    GROUP BY d.day, COALESCE(o.payment_method, 'unknown'), o.status;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION analytics_rollup_customers(p_customers UUID[])
+RETURNS VOID
+LANGUAGE plpgsql
+SET search_path FROM CURRENT
+AS $$
+BEGIN
+    DELETE FROM analytics_demo_customer_totals WHERE customer_id = ANY(p_customers);
+    INSERT INTO analytics_demo_customer_totals
+        (customer_id, total_orders, completed_orders, lifetime_value, first_order_date, last_order_date)
+    SELECT o.customer_id,
+           COUNT(*),
+           COUNT(*) FILTER (WHERE o.status = 'completed'),
+           COALESCE(SUM(o.total_amount) FILTER (WHERE o.status = 'completed'), 0),
+           MIN(o.order_date),
+           MAX(o.order_date)
+    FROM analytics_demo_orders o
+    WHERE o.customer_id = ANY(p_customers)
+    GROUP BY o.customer_id;
+END;
+$$;
+
+-- Drain the queues. Keys are locked in sorted order (days before customers),
+-- so concurrent refreshes of the same day serialize and the later one sees
+-- the earlier one's committed rows.
+CREATE OR REPLACE FUNCTION analytics_refresh_rollups()
+RETURNS INTEGER
+LANGUAGE plpgsql
+SET search_path FROM CURRENT
+AS $$
+DECLARE
+    v_days DATE[];
+    v_customers UUID[];
+BEGIN
+    WITH drained AS (DELETE FROM analytics_rollup_dirty_days RETURNING sales_date)
+    SELECT array_agg(DISTINCT sales_date ORDER BY sales_date) INTO v_days FROM drained;
+
+    WITH drained AS (DELETE FROM analytics_rollup_dirty_customers RETURNING customer_id)
+    SELECT array_agg(DISTINCT customer_id ORDER BY customer_id) INTO v_customers FROM drained;
+
+    IF v_days IS NOT NULL THEN
+        PERFORM pg_advisory_xact_lock(hashtext('analytics_rollup_day'), hashtext(day::text))
+        FROM unnest(v_days) AS day ORDER BY day;
+        PERFORM analytics_rollup_days(v_days);
+    END IF;
+
+    IF v_customers IS NOT NULL THEN
+        PERFORM pg_advisory_xact_lock(hashtext('analytics_rollup_customer'), hashtext(customer::text))
+        FROM unnest(v_customers) AS customer ORDER BY customer;
+        PERFORM analytics_rollup_customers(v_customers);
+    END IF;
+
+    RETURN COALESCE(array_length(v_days, 1), 0) + COALESCE(array_length(v_customers, 1), 0);
+END;
+$$;
+
+-- Recompute everything from the base tables (after loads with triggers disabled)
+CREATE OR REPLACE FUNCTION analytics_rebuild_rollups()
+RETURNS VOID
+LANGUAGE plpgsql
+SET search_path FROM CURRENT
+AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('analytics_rollup_rebuild'));
+    TRUNCATE analytics_rollup_dirty_days, analytics_rollup_dirty_customers;
+    TRUNCATE analytics_demo_daily_product_sales, analytics_demo_daily_category_sales,
+             analytics_demo_daily_tier_sales, analytics_demo_daily_payment_sales,
+             analytics_demo_customer_totals;
+
+    PERFORM analytics_rollup_days(ARRAY(SELECT DISTINCT order_date::date FROM analytics_demo_orders));
+    PERFORM analytics_rollup_customers(ARRAY(SELECT DISTINCT customer_id FROM analytics_demo_orders));
+END;
+$$;
+
+-- ============================================================================
+-- Change capture
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION analytics_rollup_after_statement()
+RETURNS VOID
+LANGUAGE plpgsql
+SET search_path FROM CURRENT
+AS $$
+BEGIN
+    IF COALESCE(current_setting('analytics.rollup_mode', true), '') <> 'deferred' THEN
+        PERFORM analytics_refresh_rollups();
+    END IF;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION analytics_rollup_orders_changed()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SET search_path FROM CURRENT
+AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO analytics_rollup_dirty_days SELECT DISTINCT order_date::date FROM new_rows;
+        INSERT INTO analytics_rollup_dirty_customers SELECT DISTINCT customer_id FROM new_rows;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO analytics_rollup_dirty_days SELECT DISTINCT order_date::date FROM old_rows;
+        INSERT INTO analytics_rollup_dirty_customers SELECT DISTINCT customer_id FROM old_rows;
+    END IF;
+    PERFORM analytics_rollup_after_statement();
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION analytics_rollup_order_items_changed()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SET search_path FROM CURRENT
+AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO analytics_rollup_dirty_days
+        SELECT DISTINCT o.order_date::date
+        FROM new_rows i JOIN analytics_demo_orders o ON o.id = i.order_id;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO analytics_rollup_dirty_days
+        SELECT DISTINCT o.order_date::date
+        FROM old_rows i JOIN analytics_demo_orders o ON o.id = i.order_id;
+    END IF;
+    PERFORM analytics_rollup_after_statement();
+    RETURN NULL;
+END;
+$$;
+
+-- Category and tier are denormalized into the rollups; re-derive the days
+-- that contain a product/customer whose category/tier changed
+CREATE OR REPLACE FUNCTION analytics_rollup_products_changed()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SET search_path FROM CURRENT
+AS $$
+BEGIN
+    INSERT INTO analytics_rollup_dirty_days
+    SELECT DISTINCT s.sales_date
+    FROM old_rows o
+    JOIN new_rows n ON n.id = o.id
+    JOIN analytics_demo_daily_product_sales s ON s.product_id = n.id
+    WHERE o.category IS DISTINCT FROM n.category;
+    PERFORM analytics_rollup_after_statement();
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION analytics_rollup_customers_changed()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SET search_path FROM CURRENT
+AS $$
+BEGIN
+    INSERT INTO analytics_rollup_dirty_days
+    SELECT DISTINCT ord.order_date::date
+    FROM old_rows o
+    JOIN new_rows n ON n.id = o.id
+    JOIN analytics_demo_orders ord ON ord.customer_id = n.id
+    WHERE o.loyalty_tier IS DISTINCT FROM n.loyalty_tier;
+    PERFORM analytics_rollup_after_statement();
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS analytics_rollup_orders_insert ON analytics_demo_orders;
+DROP TRIGGER IF EXISTS analytics_rollup_orders_update ON analytics_demo_orders;
+DROP TRIGGER IF EXISTS analytics_rollup_orders_delete ON analytics_demo_orders;
+CREATE TRIGGER analytics_rollup_orders_insert AFTER INSERT ON analytics_demo_orders
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics_rollup_orders_changed();
+CREATE TRIGGER analytics_rollup_orders_update AFTER UPDATE ON analytics_demo_orders
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics_rollup_orders_changed();
+CREATE TRIGGER analytics_rollup_orders_delete AFTER DELETE ON analytics_demo_orders
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics_rollup_orders_changed();
+
+DROP TRIGGER IF EXISTS analytics_rollup_order_items_insert ON analytics_demo_order_items;
+DROP TRIGGER IF EXISTS analytics_rollup_order_items_update ON analytics_demo_order_items;
+DROP TRIGGER IF EXISTS analytics_rollup_order_items_delete ON analytics_demo_order_items;
+CREATE TRIGGER analytics_rollup_order_items_insert AFTER INSERT ON analytics_demo_order_items
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics_rollup_order_items_changed();
+CREATE TRIGGER analytics_rollup_order_items_update AFTER UPDATE ON analytics_demo_order_items
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics_rollup_order_items_changed();
+CREATE TRIGGER analytics_rollup_order_items_delete AFTER DELETE ON analytics_demo_order_items
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics_rollup_order_items_changed();
+
+DROP TRIGGER IF EXISTS analytics_rollup_products_update ON analytics_demo_products;
+CREATE TRIGGER analytics_rollup_products_update AFTER UPDATE ON analytics_demo_products
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics_rollup_products_changed();
+
+DROP TRIGGER IF EXISTS analytics_rollup_customers_update ON analytics_demo_customers;
+CREATE TRIGGER analytics_rollup_customers_update AFTER UPDATE ON analytics_demo_customers
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics_rollup_customers_changed();
+
+-- Rollup writes bump their own versions, so cached results over them invalidate too
+SELECT public.analytics_track_table_version(current_schema(), t)
+FROM unnest(ARRAY[
+    'analytics_demo_daily_product_sales',
+    'analytics_demo_daily_category_sales',
+    'analytics_demo_daily_tier_sales',
+    'analytics_demo_daily_payment_sales',
+    'analytics_demo_customer_totals'
+]) AS t;
+
+-- Initial fill
+SELECT analytics_rebuild_rollups();
+
+COMMENT ON TABLE analytics_demo_daily_product_sales IS 'Daily units/revenue per product and order status (maintained by triggers)';
+COMMENT ON TABLE analytics_demo_daily_category_sales IS 'Daily orders/units/revenue per product category and order status (maintained by triggers)';
+COMMENT ON TABLE analytics_demo_daily_tier_sales IS 'Daily orders/revenue per customer loyalty tier and order status (maintained by triggers)';
+COMMENT ON TABLE analytics_demo_daily_payment_sales IS 'Daily orders/revenue per payment method and order status (maintained by triggers)';
+COMMENT ON TABLE analytics_demo_customer_totals IS 'Lifetime order counts and value per customer (maintained by triggers)';
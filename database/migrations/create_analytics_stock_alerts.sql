@@ -0,0 +1,132 @@
+-- Low-stock set and reorder alerts for the analytics agent
+-- Run this after create_analytics_demo_tables.sql and create_analytics_table_versions.sql
+--
+-- analytics_demo_low_stock holds exactly the inventory rows with
+-- quantity_on_hand <= reorder_point. A statement-level trigger on
+-- analytics_demo_inventory re-checks only the products a statement touched
+-- (through the partial index below), so the set stays current at any catalog
+-- size and get_low_stock reads just the low rows. Products entering or
+-- leaving the set are announced with pg_notify on the analytics_stock_alerts
+-- channel when the transaction commits; agents/analytics_agent/stock_alerts.py
+-- listens and forwards them.
+--
+-- Table names are unqualified and functions pin the search_path they were
+-- created with, so the file can be applied per schema.
+
+-- Only low rows are indexed, so the index stays as small as the low set
+CREATE INDEX IF NOT EXISTS idx_inventory_low_stock
+    ON analytics_demo_inventory (product_id)
+    INCLUDE (quantity_on_hand, reorder_point, reorder_quantity, warehouse_location)
+    WHERE quantity_on_hand <= reorder_point;
+
+CREATE TABLE IF NOT EXISTS analytics_demo_low_stock (
+    product_id UUID PRIMARY KEY,
+    quantity_on_hand INTEGER NOT NULL,
+    reorder_point INTEGER NOT NULL,
+    reorder_quantity INTEGER NOT NULL,
+    warehouse_location VARCHAR(50),
+    low_since TIMESTAMP NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Re-check products against their reorder points; returns the number of transitions
+CREATE OR REPLACE FUNCTION analytics_stock_sync(p_products UUID[])
+RETURNS INTEGER
+LANGUAGE plpgsql
+SET search_path FROM CURRENT
+AS $$
+DECLARE
+    v_events JSONB;
+    v_event JSONB;
+BEGIN
+    WITH restocked AS (
+        DELETE FROM analytics_demo_low_stock s
+        WHERE s.product_id = ANY(p_products)
+        AND NOT EXISTS (
+            SELECT 1 FROM analytics_demo_inventory i
+            WHERE i.product_id = s.product_id AND i.quantity_on_hand <= i.reorder_point
+        )
+        RETURNING s.product_id
+    ),
+    low AS (
+        INSERT INTO analytics_demo_low_stock
+            (product_id, quantity_on_hand, reorder_point, reorder_quantity, warehouse_location)
+        SELECT i.product_id, i.quantity_on_hand, i.reorder_point, i.reorder_quantity, i.warehouse_location
+        FROM analytics_demo_inventory i
+        WHERE i.product_id = ANY(p_products)
+        AND i.quantity_on_hand <= i.reorder_point
+        ON CONFLICT (product_id) DO UPDATE SET
+            quantity_on_hand = EXCLUDED.quantity_on_hand,
+            reorder_point = EXCLUDED.reorder_point,
+            reorder_quantity = EXCLUDED.reorder_quantity,
+            warehouse_location = EXCLUDED.warehouse_location,
+            updated_at = NOW()
+        -- xmax = 0: a new row, i.e. the product just went low
+        RETURNING product_id, quantity_on_hand, reorder_point, reorder_quantity, warehouse_location, (xmax = 0) AS went_low
+    )
+    SELECT COALESCE(jsonb_agg(e), '[]'::jsonb) INTO v_events
+    FROM (
+        SELECT 'low_stock' AS event, product_id, quantity_on_hand, reorder_point, reorder_quantity, warehouse_location
+        FROM low WHERE went_low
+        UNION ALL
+        SELECT 'restocked', r.product_id, i.quantity_on_hand, i.reorder_point, i.reorder_quantity, i.warehouse_location
+        FROM restocked r LEFT JOIN analytics_demo_inventory i ON i.product_id = r.product_id
+    ) e;
+
+    -- Bulk changes send one summary instead of a notification per product
+    IF jsonb_array_length(v_events) > 50 THEN
+        PERFORM pg_notify('analytics_stock_alerts', jsonb_build_object(
+            'schema', current_schema(),
+            'event', 'bulk',
+            'low_stock', (SELECT COUNT(*) FROM jsonb_array_elements(v_events) x WHERE x->>'event' = 'low_stock'),
+            'restocked', (SELECT COUNT(*) FROM jsonb_array_elements(v_events) x WHERE x->>'event' = 'restocked')
+        )::text);
+    ELSE
+        FOR v_event IN SELECT * FROM jsonb_array_elements(v_events) LOOP
+            PERFORM pg_notify('analytics_stock_alerts', (v_event || jsonb_build_object('schema', current_schema()))::text);
+        END LOOP;
+    END IF;
+    RETURN jsonb_array_length(v_events);
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION analytics_stock_inventory_changed()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SET search_path FROM CURRENT
+AS $$
+DECLARE
+    v_products UUID[] := '{}';
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        v_products := v_products || ARRAY(SELECT product_id FROM new_rows);
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        v_products := v_products || ARRAY(SELECT product_id FROM old_rows);
+    END IF;
+    PERFORM analytics_stock_sync(v_products);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS analytics_stock_inventory_insert ON analytics_demo_inventory;
+DROP TRIGGER IF EXISTS analytics_stock_inventory_update ON analytics_demo_inventory;
+DROP TRIGGER IF EXISTS analytics_stock_inventory_delete ON analytics_demo_inventory;
+CREATE TRIGGER analytics_stock_inventory_insert AFTER INSERT ON analytics_demo_inventory
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics_stock_inventory_changed();
+CREATE TRIGGER analytics_stock_inventory_update AFTER UPDATE ON analytics_demo_inventory
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics_stock_inventory_changed();
+CREATE TRIGGER analytics_stock_inventory_delete AFTER DELETE ON analytics_demo_inventory
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION analytics_stock_inventory_changed();
+
+SELECT public.analytics_track_table_version(current_schema(), 'analytics_demo_low_stock');
+
+-- Initial fill (after a TRUNCATE or a load with triggers disabled, run
+-- SELECT analytics_stock_sync(ARRAY(SELECT product_id FROM analytics_demo_inventory
+--                                   UNION SELECT product_id FROM analytics_demo_low_stock));)
+SELECT analytics_stock_sync(ARRAY(SELECT product_id FROM analytics_demo_inventory));
+
+COMMENT ON TABLE analytics_demo_low_stock IS 'Inventory rows at or below their reorder point (maintained by triggers)';
@@ -0,0 +1,151 @@
+-- Change counters for the analytics tables
+-- Run this after create_analytics_demo_tables.sql
+-- Every INSERT/UPDATE/DELETE/TRUNCATE statement bumps the table's version once;
+-- agents/analytics_agent/result_cache.py keys cached query results on these
+-- versions so entries are invalidated by writes instead of by TTL.
+--
+-- A bump is a row appended to analytics_table_version_log, and a table's version
+-- is the sum of its log rows. The log has no unique key, so writers never wait
+-- on each other (or deadlock) over a counter row. The counter is transactional:
+-- a write and its bump become visible together, and readers see the version
+-- that matches the data in their snapshot. A rolled-back write leaves no bump.
+-- Now and then a writer folds a table's rows into one (the sum is unchanged).
+
+CREATE TABLE IF NOT EXISTS public.analytics_table_versions (
+    table_schema VARCHAR(63) NOT NULL,
+    table_name VARCHAR(63) NOT NULL,
+    PRIMARY KEY (table_schema, table_name)
+);
+
+CREATE TABLE IF NOT EXISTS public.analytics_table_version_log (
+    table_schema VARCHAR(63) NOT NULL,
+    table_name VARCHAR(63) NOT NULL,
+    bumps BIGINT NOT NULL DEFAULT 1
+);
+
+CREATE INDEX IF NOT EXISTS idx_analytics_table_version_log_table
+ON public.analytics_table_version_log(table_schema, table_name);
+
+-- Fold the log rows of every table into one row per table
+CREATE OR REPLACE FUNCTION public.analytics_compact_table_versions()
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- One compaction at a time; writers that lose the race just skip it
+    IF NOT pg_try_advisory_xact_lock(hashtext('analytics_table_version_log')) THEN
+        RETURN;
+    END IF;
+    WITH folded AS (
+        DELETE FROM public.analytics_table_version_log
+        RETURNING table_schema, table_name, bumps
+    )
+    INSERT INTO public.analytics_table_version_log (table_schema, table_name, bumps)
+    SELECT table_schema, table_name, SUM(bumps)
+    FROM folded
+    GROUP BY table_schema, table_name;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.analytics_bump_table_version()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO public.analytics_table_version_log (table_schema, table_name)
+    VALUES (TG_TABLE_SCHEMA, TG_TABLE_NAME);
+    IF random() < 0.01 THEN
+        PERFORM public.analytics_compact_table_versions();
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Attach a statement-level trigger to one table and register it
+CREATE OR REPLACE FUNCTION public.analytics_track_table_version(p_schema TEXT, p_table TEXT)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    EXECUTE format('DROP TRIGGER IF EXISTS analytics_table_version_bump ON %I.%I', p_schema, p_table);
+    EXECUTE format(
+        'CREATE TRIGGER analytics_table_version_bump
+         AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I.%I
+         FOR EACH STATEMENT EXECUTE FUNCTION public.analytics_bump_table_version()',
+        p_schema, p_table
+    );
+    INSERT INTO public.analytics_table_versions (table_schema, table_name)
+    VALUES (p_schema, p_table)
+    ON CONFLICT (table_schema, table_name) DO NOTHING;
+END;
+$$;
+
+-- Move counters kept by earlier versions of this script (a version column, then
+-- per-table sequences) into the log
+DROP VIEW IF EXISTS public.analytics_table_version_values;
+DO $$
+DECLARE
+    v_row RECORD;
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = 'analytics_table_versions' AND column_name = 'version'
+    ) THEN
+        EXECUTE $q$
+            INSERT INTO public.analytics_table_version_log (table_schema, table_name, bumps)
+            SELECT table_schema, table_name, version
+            FROM public.analytics_table_versions
+            WHERE version > 0
+        $q$;
+        ALTER TABLE public.analytics_table_versions DROP COLUMN version;
+    END IF;
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = 'analytics_table_versions' AND column_name = 'version_sequence'
+    ) THEN
+        FOR v_row IN EXECUTE $q$
+            SELECT v.table_schema, v.table_name, v.version_sequence, s.last_value
+            FROM public.analytics_table_versions v
+            LEFT JOIN pg_catalog.pg_sequences s
+                ON s.schemaname = v.table_schema AND s.sequencename = v.version_sequence
+            WHERE v.version_sequence IS NOT NULL
+        $q$ LOOP
+            IF v_row.last_value > 0 THEN
+                INSERT INTO public.analytics_table_version_log (table_schema, table_name, bumps)
+                VALUES (v_row.table_schema, v_row.table_name, v_row.last_value);
+            END IF;
+            EXECUTE format('DROP SEQUENCE IF EXISTS %I.%I', v_row.table_schema, v_row.version_sequence);
+        END LOOP;
+        ALTER TABLE public.analytics_table_versions DROP COLUMN version_sequence;
+    END IF;
+END;
+$$;
+
+ALTER TABLE public.analytics_table_versions DROP COLUMN IF EXISTS updated_at;
+DROP TABLE IF EXISTS public.analytics_table_version_commits;
+DROP FUNCTION IF EXISTS public.analytics_commit_table_version();
+
+-- Version of every tracked table (0 until its first write)
+CREATE VIEW public.analytics_table_version_values AS
+SELECT v.table_schema, v.table_name, COALESCE(SUM(l.bumps), 0)::bigint AS version
+FROM public.analytics_table_versions v
+LEFT JOIN public.analytics_table_version_log l
+    ON l.table_schema = v.table_schema AND l.table_name = v.table_name
+GROUP BY v.table_schema, v.table_name;
+
+SELECT public.analytics_track_table_version('public', t)
+FROM unnest(ARRAY[
+    'analytics_demo_customers',
+    'analytics_demo_products',
+    'analytics_demo_orders',
+    'analytics_demo_order_items',
+    'analytics_demo_inventory'
+]) AS t;
+
+-- Re-attach the trigger on tables registered earlier (tenant schemas, rollups, ...)
+SELECT public.analytics_track_table_version(table_schema, table_name)
+FROM public.analytics_table_versions
+WHERE to_regclass(format('%I.%I', table_schema, table_name)) IS NOT NULL;
+
+COMMENT ON TABLE public.analytics_table_versions IS 'Tables with write counters used to invalidate cached analytics results';
+COMMENT ON TABLE public.analytics_table_version_log IS 'One row per write statement (or folded total) per tracked table; version = SUM(bumps)';
@@ -0,0 +1,14 @@
+-- Per-business execution limits for LLM-generated analytics SQL
+-- Used by agents/analytics_agent/query_guard.py; a NULL column (or no row)
+-- falls back to the ANALYTICS_* environment defaults.
+
+CREATE TABLE IF NOT EXISTS public.analytics_tenant_limits (
+    business_id VARCHAR(100) PRIMARY KEY,
+    statement_timeout_ms INTEGER,         -- SET LOCAL statement_timeout
+    max_plan_cost DOUBLE PRECISION,       -- reject when EXPLAIN total cost exceeds this
+    max_plan_rows BIGINT,                 -- reject when EXPLAIN estimates more rows than this
+    row_cap INTEGER,                      -- LIMIT injected/tightened above this many rows
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+COMMENT ON TABLE public.analytics_tenant_limits IS 'Statement timeout, plan cost/row limits and row cap per business for generated SQL';
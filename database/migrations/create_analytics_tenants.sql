@@ -0,0 +1,81 @@
+-- Per-business schemas for the analytics tables
+-- Run this after create_analytics_demo_tables.sql and create_analytics_table_versions.sql
+--
+-- Each business listed in analytics_tenants gets its own schema holding
+-- tables shaped like public.analytics_demo_*. agents/analytics_agent sets the
+-- search_path to that schema, so generated SQL and the fixed tools only ever
+-- see (and scan) that business's rows. Businesses without a row keep using
+-- the public tables.
+--
+-- Create a tenant with
+--     SELECT public.analytics_create_tenant('<business_id>');
+-- or python -m agents.analytics_agent.tenants create <business_id>, which also
+-- builds the rollups in the new schema.
+
+CREATE TABLE IF NOT EXISTS public.analytics_tenants (
+    business_id VARCHAR(100) PRIMARY KEY,
+    schema_name VARCHAR(63) NOT NULL UNIQUE,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION public.analytics_create_tenant(p_business_id TEXT, p_schema TEXT DEFAULT NULL)
+RETURNS TEXT
+LANGUAGE plpgsql
+-- Restored on exit; switched to the tenant schema below while copying foreign keys
+SET search_path = public
+AS $$
+DECLARE
+    v_schema TEXT := COALESCE(p_schema, 'analytics_t_' || substr(md5(p_business_id), 1, 16));
+    v_existing TEXT;
+    v_table TEXT;
+    v_constraint RECORD;
+BEGIN
+    SELECT schema_name INTO v_existing FROM public.analytics_tenants WHERE business_id = p_business_id;
+    IF v_existing IS NOT NULL THEN
+        RETURN v_existing;
+    END IF;
+
+    EXECUTE format('CREATE SCHEMA IF NOT EXISTS %I', v_schema);
+
+    -- Base tables, with write counters for the result cache and local replica
+    FOREACH v_table IN ARRAY ARRAY[
+        'analytics_demo_customers',
+        'analytics_demo_products',
+        'analytics_demo_orders',
+        'analytics_demo_order_items',
+        'analytics_demo_inventory'
+    ] LOOP
+        EXECUTE format('CREATE TABLE IF NOT EXISTS %I.%I (LIKE public.%I INCLUDING ALL)', v_schema, v_table, v_table);
+        PERFORM public.analytics_track_table_version(v_schema, v_table);
+    END LOOP;
+
+    -- LIKE does not copy foreign keys; recreate them against the tenant's own tables
+    -- (with the tenant schema on the path, definitions name the public targets
+    -- as public.x, and stripping that makes them resolve to the tenant's copy)
+    PERFORM set_config('search_path', quote_ident(v_schema), true);
+    FOR v_constraint IN
+        SELECT c.conname, r.relname, pg_get_constraintdef(c.oid) AS definition
+        FROM pg_catalog.pg_constraint c
+        JOIN pg_catalog.pg_class r ON r.oid = c.conrelid
+        WHERE c.contype = 'f'
+        AND c.connamespace = 'public'::regnamespace
+        AND r.relname LIKE 'analytics\_demo\_%'
+    LOOP
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_catalog.pg_constraint
+            WHERE conname = v_constraint.conname AND connamespace = v_schema::regnamespace
+        ) THEN
+            EXECUTE format(
+                'ALTER TABLE %I.%I ADD CONSTRAINT %I %s',
+                v_schema, v_constraint.relname, v_constraint.conname,
+                replace(v_constraint.definition, 'public.', '')
+            );
+        END IF;
+    END LOOP;
+
+    INSERT INTO public.analytics_tenants (business_id, schema_name) VALUES (p_business_id, v_schema);
+    RETURN v_schema;
+END;
+$$;
+
+COMMENT ON TABLE public.analytics_tenants IS 'Schema holding each business''s analytics tables (unlisted businesses use public)';
@@ -0,0 +1,25 @@
+-- Track which embedding model/dimensions each vector table was built with,
+-- and any online re-embedding migration in progress.
+-- Used by utils/embedding_migration.py and by every reader that embeds queries.
+
+CREATE TABLE IF NOT EXISTS embedding_models (
+    table_schema VARCHAR(63) NOT NULL,
+    table_name VARCHAR(63) NOT NULL,
+    model VARCHAR(100) NOT NULL,              -- model of the live "embedding" column
+    dimensions INTEGER,                       -- NULL = model default
+    status VARCHAR(20) NOT NULL DEFAULT 'active',  -- 'active' or 'migrating'
+    target_model VARCHAR(100),                -- model being written to "embedding_next"
+    target_dimensions INTEGER,
+    rows_migrated INTEGER NOT NULL DEFAULT 0,
+    started_at TIMESTAMP,
+    completed_at TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (table_schema, table_name)
+);
+
+-- Current state of the assistant knowledge base
+INSERT INTO embedding_models (table_schema, table_name, model, dimensions)
+VALUES ('public', 'assistant_knowledge_base', 'text-embedding-3-small', NULL)
+ON CONFLICT (table_schema, table_name) DO NOTHING;
+
+COMMENT ON TABLE embedding_models IS 'Embedding model per vector table and online re-embedding migration state';
@@ -54,6 +54,8 @@ class AnalyticsAgentAdapter(AgentAdapter):
         self._call_tool_fn: Callable[[str, Dict[str, Any]], Dict[str, Any]] = call_analytics_tool
         self._schemas = MCP_TOOL_SCHEMAS
         self._descriptions = TOOL_DESCRIPTIONS
+        # Time budget per chat request; the agent degrades (e.g. skips the summary) to fit it
+        self._timeout_ms = int(os.getenv('ANALYTICS_CHAT_TIMEOUT_MS', '20000'))
 
     def list_tools(self) -> list[Dict[str, Any]]:
         tools: list[Dict[str, Any]] = []
@@ -66,7 +68,7 @@ class AnalyticsAgentAdapter(AgentAdapter):
         return tools
 
     def call_tool(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
-        return self._call_tool_fn(name, arguments)
+        return self._call_tool_fn(name, {"timeout_ms": self._timeout_ms, **arguments})
 
 
 # Public registry mapping agent identifier -> adapter factory
@@ -549,7 +549,7 @@ def api_chat():
         # Analytics agent commands
         elif agent == 'analytics':
             if lower.startswith('/stats'):
-                result = adapter.call_tool('get_quick_stats', {})
+                result = adapter.call_tool('get_quick_stats', {"business_id": business_id})
                 if result.get('success'):
                     stats = result.get('stats', {})
                     lines = [f"📊 **Business Overview**"]
@@ -568,7 +568,7 @@ def api_chat():
                 limit = 10
                 if len(parts) > 1 and parts[1].isdigit():
                     limit = min(int(parts[1]), 50)
-                result = adapter.call_tool('get_top_products', {"limit": limit})
+                result = adapter.call_tool('get_top_products', {"business_id": business_id, "limit": limit})
                 if result.get('success'):
                     products = result.get('top_products', [])
                     lines = [f"🏆 **Top {len(products)} Products**"]
@@ -579,7 +579,7 @@ def api_chat():
                 return jsonify({"text": f"Error: {result.get('error') or 'unknown'}"})
 
             if lower.startswith('/customers'):
-                result = adapter.call_tool('get_customer_insights', {})
+                result = adapter.call_tool('get_customer_insights', {"business_id": business_id})
                 if result.get('success'):
                     insights = result.get('customer_insights', [])
                     lines = ["👥 **Customer Insights by Tier**"]
@@ -592,9 +592,47 @@ def api_chat():
                     return jsonify({"text": "\n".join(lines)})
                 return jsonify({"text": f"Error: {result.get('error') or 'unknown'}"})
 
+            if lower.startswith('/segments'):
+                result = adapter.call_tool('get_customer_segments', {"business_id": business_id})
+                if result.get('success'):
+                    lines = [f"🧭 **Customer Segments** (RFM, as of {result.get('as_of', 'N/A')})"]
+                    for s in result.get('segments', []):
+                        lines.append(f"\n{s.get('segment', 'Unknown')}: {s.get('customer_count', 0)} customers ({(s.get('share') or 0) * 100:.0f}%)")
+                        lines.append(f"  - Avg Orders: {s.get('avg_frequency', 0)} | Avg Value: ${s.get('avg_monetary', 0):,.2f} | Avg Days Since Order: {s.get('avg_recency_days', 0)}")
+                    return jsonify({"text": "\n".join(lines)})
+                return jsonify({"text": f"Error: {result.get('error') or 'unknown'}"})
+
+            if lower.startswith('/trends'):
+                arguments = {"business_id": business_id}
+                for part in lower.split()[1:]:
+                    if part in ('revenue', 'orders', 'avg_order_value'):
+                        arguments['metric'] = part
+                    elif part in ('day', 'week', 'month'):
+                        arguments['granularity'] = part
+                    elif part.isdigit():
+                        arguments['periods'] = min(int(part), 366)
+                result = adapter.call_tool('get_sales_trends', arguments)
+                if result.get('success'):
+                    return jsonify({"text": f"📈 {result.get('answer', '')}"})
+                return jsonify({"text": f"Error: {result.get('error') or 'unknown'}"})
+
+            if lower.startswith('/low_stock'):
+                parts = lower.split()
+                limit = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 20
+                result = adapter.call_tool('get_low_stock', {"business_id": business_id, "limit": limit})
+                if result.get('success'):
+                    items = result.get('items', [])
+                    if not items:
+                        return jsonify({"text": "📦 No products are at or below their reorder point."})
+                    lines = [f"📦 **Low Stock** ({result.get('total_low', 0)} products at or below reorder point)"]
+                    for i, item in enumerate(items, 1):
+                        lines.append(f"{i}. {item.get('product_name', 'Unknown')} ({item.get('sku', '')}) - {item.get('quantity_on_hand', 0)} on hand, reorder point {item.get('reorder_point', 0)}, reorder {item.get('reorder_quantity', 0)} [{item.get('warehouse_location') or 'N/A'}]")
+                    return jsonify({"text": "\n".join(lines)})
+                return jsonify({"text": f"Error: {result.get('error') or 'unknown'}"})
+
             # Natural language query
             if not lower.startswith('/'):
-                result = adapter.call_tool('query_database', {"question": message})
+                result = adapter.call_tool('query_database', {"business_id": business_id, "question": message})
                 if result.get('success'):
                     answer = result.get('answer', 'No answer available.')
                     # Clean up the answer - remove markdown artifacts and extra formatting
@@ -627,7 +665,7 @@ def api_chat():
                 return jsonify({"text": f"Error: {result.get('error') or 'unknown'}"})
 
             # Analytics help
-            return jsonify({"text": "Analytics Commands:\n- /stats - Business overview\n- /top_products [limit] - Top products\n- /customers - Customer insights\n- Or ask any question about your data!"})
+            return jsonify({"text": "Analytics Commands:\n- /stats - Business overview\n- /top_products [limit] - Top products\n- /customers - Customer insights\n- /segments - RFM customer segments\n- /trends [revenue|orders|avg_order_value] [day|week|month] [periods] - Trend and forecast\n- /low_stock [limit] - Products at or below reorder point\n- Or ask any question about your data!"})
 
         # General help
         return jsonify({"text": "Please select an agent (marketing or analytics) and try your command again."})
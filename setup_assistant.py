@@ -14,6 +14,13 @@ from dotenv import load_dotenv
 # Add utils to path
 sys.path.append(os.path.dirname(__file__))
 
+ASSISTANT_MIGRATIONS = [
+    'database/migrations/create_assistant_tables.sql',
+    'database/migrations/add_kb_chunk_structure_fields.sql',
+    'database/migrations/add_chunk_sources_field.sql',
+    'database/migrations/create_embedding_migrations.sql',
+]
+
 def check_env():
     """Check if required environment variables are set"""
     load_dotenv()
@@ -40,10 +47,11 @@ def create_tables():
         conn = psycopg2.connect(os.getenv('DATABASE_URL'))
         cur = conn.cursor()
         
-        # Read and execute migration
-        with open('database/migrations/create_assistant_tables.sql', 'r') as f:
-            sql = f.read()
-            cur.execute(sql)
+        # Read and execute migrations in order
+        for migration in ASSISTANT_MIGRATIONS:
+            with open(migration, 'r') as f:
+                sql = f.read()
+                cur.execute(sql)
         
         conn.commit()
         cur.close()
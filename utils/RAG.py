@@ -2,18 +2,14 @@ import os
 import psycopg2
 from dotenv import load_dotenv
 from utils.pdf_chunker import embed_chunks
-from openai import OpenAI
 from utils.supa import SupabaseClient
+from utils.embedding_store import embed_texts
+from utils.embedding_migration import get_embedding_config
 
 load_dotenv()
 
-def embed_query(query: str):
-    client = OpenAI()
-    embeddings = client.embeddings.create(
-        input=query,
-        model="text-embedding-3-large"
-    )
-    return embeddings.data[0].embedding
+def embed_query(query: str, model: str = "text-embedding-3-large", dimensions: int = None):
+    return embed_texts([query], model=model, dimensions=dimensions)[0]
 
 
 def list_tables():
@@ -31,7 +27,8 @@ def pull_data_from_db(query: str, table: str) -> list[dict]:
     supabase = SupabaseClient()
     cur = supabase.cur
     
-    embedding = embed_query(query)
+    model, dimensions = get_embedding_config(table, cur=cur)
+    embedding = embed_query(query, model, dimensions)
 
     cur.execute(f"""
     SELECT text_content FROM {table} ORDER BY embedding <-> '{embedding}' LIMIT 2
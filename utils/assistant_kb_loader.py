@@ -5,12 +5,21 @@ Run this once to populate the assistant's knowledge base.
 """
 
 import os
+import re
+import json
 from openai import OpenAI
 from utils.supa import SupabaseClient
+from utils.tokens import count_tokens
+from utils.dedup import deduplicate_chunks
+from utils.embedding_store import embed_texts
+from utils.embedding_migration import get_embedding_config, lock_embedding_config, vector_literal
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Estimated Jaccard similarity at which chunks are collapsed before embedding
+DEDUP_THRESHOLD = float(os.getenv('KB_DEDUP_THRESHOLD', '0.85'))
+
 KNOWLEDGE_BASE = """# Streamline Automation — Knowledge Base
 
 ## Company Overview
@@ -136,53 +145,147 @@ If a user asks a question that is not covered in this documentation, the chatbot
 """
 
 
-def chunk_knowledge_base(text: str, chunk_size: int = 200, overlap: int = 50) -> list:
-    """Split knowledge base into overlapping chunks with metadata"""
+HEADING_PATTERN = re.compile(r'^(#{1,6})\s+(.+?)\s*$')
+QUESTION_PATTERN = re.compile(r'^\*{0,2}Q:\s*(.+?)\*{0,2}\s*$')
+SEPARATOR_PATTERN = re.compile(r'^\s*(-{3,}|\*{3,}|_{3,})\s*$')
+
+# Keyword in a top-level (##) heading -> chunk type stored with the chunk
+CHUNK_TYPE_KEYWORDS = [
+    ("faq", "faq"),
+    ("service", "services"),
+    ("pricing", "pricing"),
+    ("overview", "overview"),
+    ("contact", "contact"),
+]
+
+
+def _chunk_type_for(section_path: list) -> str:
+    """Derive the chunk type from the first heading below the document title"""
+    headings = section_path[1:] if len(section_path) > 1 else section_path
+    if not headings:
+        return "general"
+    top = headings[0].lower()
+    for keyword, chunk_type in CHUNK_TYPE_KEYWORDS:
+        if keyword in top:
+            return chunk_type
+    return "general"
+
+
+def _split_oversized(body: str, max_tokens: int, overlap: int) -> list:
+    """Split a block that exceeds max_tokens on paragraphs, then on words"""
+    pieces = []
+    current = []
+    for paragraph in re.split(r'\n\s*\n', body):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        candidate = "\n\n".join(current + [paragraph])
+        if current and count_tokens(candidate) > max_tokens:
+            pieces.append("\n\n".join(current))
+            current = []
+        current.append(paragraph)
+    if current:
+        pieces.append("\n\n".join(current))
+
+    # A single paragraph can still be too long: fall back to word windows,
+    # each grown until the next word would push it past max_tokens
     chunks = []
-    
-    # Split by major sections
-    sections = text.split('---')
-    
-    for section in sections:
-        section = section.strip()
-        if not section:
+    for piece in pieces:
+        if count_tokens(piece) <= max_tokens:
+            chunks.append(piece)
             continue
-            
-        # Determine chunk type
-        chunk_type = "general"
-        if "##" in section:
-            if "FAQ" in section:
-                chunk_type = "faq"
-            elif "Service" in section:
-                chunk_type = "services"
-            elif "Pricing" in section:
-                chunk_type = "pricing"
-            elif "Overview" in section:
-                chunk_type = "overview"
-            elif "Contact" in section:
-                chunk_type = "contact"
-        
-        # Further split long sections by words
-        words = section.split()
-        if len(words) <= chunk_size:
+        words = piece.split()
+        start = 0
+        while start < len(words):
+            end = start + 1
+            while end < len(words) and count_tokens(" ".join(words[start:end + 1])) <= max_tokens:
+                end += 1
+            chunks.append(" ".join(words[start:end]))
+            if end == len(words):
+                break
+            # Carry up to overlap tokens' worth of trailing words into the next window
+            next_start = end
+            while next_start - 1 > start and count_tokens(" ".join(words[next_start - 1:end])) <= overlap:
+                next_start -= 1
+            start = next_start
+    return chunks
+
+
+def chunk_knowledge_base(text: str, chunk_size: int = 200, overlap: int = 50) -> list:
+    """
+    Split a markdown knowledge base into structure-aware chunks.
+
+    Emits one chunk per FAQ question/answer pair and one per (sub)section.
+    Only blocks longer than chunk_size tokens are split further, with
+    up to overlap tokens carried between the resulting windows; every piece
+    of a long FAQ answer repeats its question.
+
+    Returns:
+        List of dicts with text, chunk_type, section_path and token_count
+    """
+    blocks = []
+    path = []
+    current = {"path": [], "lines": [], "kind": "section"}
+
+    def flush():
+        body = "\n".join(current["lines"]).strip()
+        if body:
+            blocks.append({"path": list(current["path"]), "body": body, "kind": current["kind"]})
+
+    for line in text.splitlines():
+        if SEPARATOR_PATTERN.match(line):
+            continue
+
+        heading = HEADING_PATTERN.match(line)
+        if heading:
+            flush()
+            level = len(heading.group(1))
+            path = path[:level - 1] + [heading.group(2).strip()]
+            current = {"path": path, "lines": [], "kind": "section"}
+            continue
+
+        question = QUESTION_PATTERN.match(line.strip())
+        if question:
+            flush()
+            current = {"path": path, "lines": [f"Q: {question.group(1).strip()}"], "kind": "faq"}
+            continue
+
+        current["lines"].append(line)
+    flush()
+
+    chunks = []
+    for block in blocks:
+        chunk_type = _chunk_type_for(block["path"])
+        # Drop the document title from the breadcrumb shown to the model
+        breadcrumb = block["path"][1:] if len(block["path"]) > 1 else block["path"]
+        section_path = " > ".join(breadcrumb)
+
+        if block["kind"] == "faq":
+            # Q&A pairs are self-describing; keep the answer on its own line
+            pieces = [re.sub(r'\n\s*\n', '\n', block["body"])]
+            question, _, answer = block["body"].partition("\n")
+            if count_tokens(pieces[0]) > chunk_size and answer.strip():
+                budget = max(1, chunk_size - count_tokens(question) - 1)
+                pieces = [
+                    question + "\n" + re.sub(r'\n\s*\n', '\n', piece)
+                    for piece in _split_oversized(answer, budget, overlap)
+                ]
+        else:
+            # Leave room for the breadcrumb line prepended below
+            budget = chunk_size - (count_tokens(section_path) + 1 if section_path else 0)
+            pieces = _split_oversized(block["body"], max(1, budget), overlap)
+
+        for piece in pieces:
+            chunk_text = piece
+            if block["kind"] != "faq" and section_path:
+                chunk_text = f"{section_path}\n{piece}"
             chunks.append({
-                "text": section,
-                "chunk_type": chunk_type
+                "text": chunk_text,
+                "chunk_type": chunk_type,
+                "section_path": section_path,
+                "token_count": count_tokens(chunk_text)
             })
-        else:
-            # Create overlapping chunks
-            start = 0
-            while start < len(words):
-                end = min(start + chunk_size, len(words))
-                chunk_text = " ".join(words[start:end])
-                chunks.append({
-                    "text": chunk_text,
-                    "chunk_type": chunk_type
-                })
-                if end == len(words):
-                    break
-                start = start + chunk_size - overlap
-    
+
     return chunks
 
 
@@ -192,13 +295,15 @@ def embed_chunks(chunks: list) -> list:
     
     texts = [chunk['text'] for chunk in chunks]
     
-    embeddings_response = client.embeddings.create(
-        input=texts,
-        model="text-embedding-3-small"  # Using small model (1536 dims) for compatibility
-    )
+    # Small model (1536 dims) unless the table has been migrated since
+    model, dimensions = get_embedding_config("assistant_knowledge_base")
+    
+    # Read through the local store so unchanged chunks are not re-embedded
+    vectors = embed_texts(texts, model=model, dimensions=dimensions, client=client)
     
-    for i, chunk in enumerate(chunks):
-        chunk['embedding'] = embeddings_response.data[i].embedding
+    for chunk, vector in zip(chunks, vectors):
+        chunk['embedding'] = vector
+        chunk['embedding_config'] = (model, dimensions)
     
     return chunks
 
@@ -208,26 +313,50 @@ def upload_to_database(chunks: list):
     supabase = SupabaseClient(customer_schema="public")
     
     try:
+        # Live model under the table lock: a cutover may have happened since embedding
+        config, target = lock_embedding_config(supabase.cur, "assistant_knowledge_base")
+        stale = [c for c in chunks if c.get('embedding_config') != config]
+        if stale:
+            print(f"Embedding model is now {config[0]}, re-embedding {len(stale)} chunks...")
+            vectors = embed_texts([c['text'] for c in stale], model=config[0], dimensions=config[1])
+            for chunk, vector in zip(stale, vectors):
+                chunk['embedding'] = vector
+                chunk['embedding_config'] = config
+        
         # Clear existing data
         print("Clearing existing knowledge base...")
         supabase.cur.execute("DELETE FROM assistant_knowledge_base")
         
+        # Dual-write the migration target while an embedding migration runs
+        next_vectors = [None] * len(chunks)
+        if target:
+            print(f"Embedding migration in progress, also writing {target[0]} embeddings...")
+            next_vectors = embed_texts([c['text'] for c in chunks], model=target[0], dimensions=target[1])
+        
         # Insert new chunks
         print(f"Uploading {len(chunks)} chunks...")
         for i, chunk in enumerate(chunks):
-            # Convert embedding list to pgvector format
-            embedding_str = '[' + ','.join(str(x) for x in chunk['embedding']) + ']'
-            
-            supabase.cur.execute("""
-                INSERT INTO assistant_knowledge_base 
-                (text_content, chunk_type, embedding, chunk_index, created_at)
-                VALUES (%s, %s, %s::vector, %s, NOW())
-            """, (
+            columns = ["text_content", "chunk_type", "section_path", "token_count", "sources", "embedding", "chunk_index"]
+            placeholders = ["%s", "%s", "%s", "%s", "%s::jsonb", "%s::vector", "%s"]
+            values = [
                 chunk['text'],
                 chunk['chunk_type'],
-                embedding_str,
+                chunk.get('section_path'),
+                chunk.get('token_count'),
+                json.dumps(chunk.get('sources', [])),
+                vector_literal(chunk['embedding']),  # pgvector format
                 i
-            ))
+            ]
+            if target:
+                columns.append("embedding_next")
+                placeholders.append("%s::vector")
+                values.append(vector_literal(next_vectors[i]))
+            
+            supabase.cur.execute(f"""
+                INSERT INTO assistant_knowledge_base 
+                ({', '.join(columns)}, created_at)
+                VALUES ({', '.join(placeholders)}, NOW())
+            """, values)
             
             if (i + 1) % 10 == 0:
                 print(f"  Uploaded {i + 1}/{len(chunks)} chunks...")
@@ -249,7 +378,16 @@ def main():
     # Step 1: Chunk the knowledge base
     print("\n1. Chunking knowledge base...")
     chunks = chunk_knowledge_base(KNOWLEDGE_BASE)
-    print(f"   Created {len(chunks)} chunks")
+    print(f"   Created {len(chunks)} chunks ({sum(c['token_count'] for c in chunks)} tokens)")
+
+    chunks, report = deduplicate_chunks(
+        chunks,
+        threshold=DEDUP_THRESHOLD,
+        source_fields=("section_path", "chunk_type")
+    )
+    print(f"   Kept {report['unique_chunks']} unique chunks "
+          f"({report['duplicates_removed']} near-duplicates removed, "
+          f"{report['reduction_ratio']:.1%} reduction)")
     
     # Step 2: Generate embeddings
     print("\n2. Generating embeddings...")
@@ -4,37 +4,76 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from openai import OpenAI
 from utils.supa import SupabaseClient
+from utils.embedding_store import embed_texts
+from utils.embedding_migration import get_embedding_config
 from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _load_snapshot(path: str):
+    """Open a memory-mapped KB snapshot, or None to query Postgres instead"""
+    if not path:
+        return None
+    try:
+        from utils.kb_snapshot import KBSnapshot
+        snapshot = KBSnapshot(path)
+        print(f"Loaded KB snapshot {path} ({len(snapshot)} chunks, {snapshot.model})")
+        return snapshot
+    except Exception as e:
+        print(f"Error loading KB snapshot {path}, falling back to database: {e}")
+        return None
+
 class AssistantRAG:
     """RAG system for the Streamline Automation assistant"""
     
-    def __init__(self):
+    def __init__(self, snapshot_path: str = None):
         self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
         self.table_name = "assistant_knowledge_base"
+        # Memory-mapped snapshot shared by forked workers (see utils/kb_snapshot.py)
+        self.snapshot = _load_snapshot(snapshot_path or os.getenv('ASSISTANT_KB_SNAPSHOT'))
         self.conversation_memory = {}  # Store conversation history by session_id
         self.pending_leads = {}  # Track users in lead capture flow
         
-    def embed_query(self, query: str) -> list:
+    def embed_query(self, query: str, model: str = "text-embedding-3-small", dimensions: int = None) -> list:
         """Generate embedding for a user query"""
-        embeddings = self.client.embeddings.create(
-            input=query,
-            model="text-embedding-3-small"  # Using small model (1536 dims) for compatibility
-        )
-        return embeddings.data[0].embedding
+        return embed_texts(
+            [query],
+            model=model,  # Small model (1536 dims) by default for compatibility
+            dimensions=dimensions,
+            client=self.client
+        )[0]
+    
+    def _pricing_query(self, query: str) -> bool:
+        """Check for pricing-related keywords"""
+        pricing_keywords = ['cost', 'price', 'pricing', 'expensive', 'fee', 'charge', 'pay']
+        query_lower = query.lower()
+        return any(keyword in query_lower for keyword in pricing_keywords)
+    
+    def retrieve_context_from_snapshot(self, query: str, limit: int = 5) -> list:
+        """Retrieve relevant context from the in-memory snapshot"""
+        try:
+            if self._pricing_query(query):
+                # For pricing questions, prioritize pricing chunks
+                pricing_results = self.snapshot.by_type('pricing', 2)
+                if pricing_results:
+                    return pricing_results
+            
+            embedding = self.embed_query(query, self.snapshot.model, self.snapshot.dimensions)
+            return self.snapshot.search(embedding, limit)
+        except Exception as e:
+            print(f"Error retrieving context from snapshot: {e}")
+            return []
     
     def retrieve_context(self, query: str, limit: int = 5) -> list:
         """Retrieve relevant context from knowledge base using vector similarity"""
+        if self.snapshot is not None:
+            return self.retrieve_context_from_snapshot(query, limit)
+        
         supabase = SupabaseClient(customer_schema="public")
         
         try:
-            # Check for pricing-related keywords
-            pricing_keywords = ['cost', 'price', 'pricing', 'expensive', 'fee', 'charge', 'pay']
-            query_lower = query.lower()
-            
-            if any(keyword in query_lower for keyword in pricing_keywords):
+            if self._pricing_query(query):
                 # For pricing questions, prioritize pricing chunks
                 supabase.cur.execute(f"""
                     SELECT text_content, chunk_type, 1.0 as similarity
@@ -48,7 +87,9 @@ class AssistantRAG:
                     return pricing_results
             
             # Standard vector similarity search
-            embedding = self.embed_query(query)
+            # Embed with whatever model the table currently holds (it may have been migrated)
+            model, dimensions = get_embedding_config(self.table_name, cur=supabase.cur)
+            embedding = self.embed_query(query, model, dimensions)
             
             # Convert embedding list to pgvector string format
             embedding_str = '[' + ','.join(str(x) for x in embedding) + ']'
@@ -0,0 +1,173 @@
+"""
+Near-duplicate chunk detection for the ingestion paths.
+
+Uses MinHash signatures over word shingles with LSH banding, so each new
+chunk is only compared against candidates that share a band. Duplicates
+are collapsed into the first chunk seen, which keeps the provenance of
+every collapsed source.
+"""
+
+import hashlib
+import random
+import re
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def _shingles(text: str, size: int) -> set:
+    """Hashed word n-grams of the normalized text"""
+    words = _WORD_PATTERN.findall(text.lower())
+    if not words:
+        return set()
+    size = min(size, len(words))
+    return {
+        int.from_bytes(hashlib.blake2b(" ".join(words[i:i + size]).encode("utf-8"), digest_size=8).digest(), "big")
+        for i in range(len(words) - size + 1)
+    }
+
+
+def _choose_bands(num_perm: int, threshold: float) -> tuple:
+    """Pick (bands, rows) whose LSH threshold sits just below the target"""
+    best = (num_perm, 1)
+    best_error = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        lsh_threshold = (1.0 / bands) ** (1.0 / rows)
+        # Prefer a slightly lower LSH threshold: false candidates are
+        # filtered by the signature check, missed ones are lost for good
+        error = abs(lsh_threshold - threshold) + (0.1 if lsh_threshold > threshold else 0.0)
+        if best_error is None or error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class NearDuplicateIndex:
+    """
+    Incremental MinHash/LSH index of chunk texts.
+
+    One index can be shared across several documents so boilerplate that
+    repeats between files is only kept once.
+    """
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 64, shingle_size: int = 5, seed: int = 1):
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold must be in (0, 1]")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+
+        rng = random.Random(seed)
+        self._perms = [
+            (rng.randint(1, _MERSENNE_PRIME - 1), rng.randint(0, _MERSENNE_PRIME - 1))
+            for _ in range(num_perm)
+        ]
+        self.bands, self.rows = _choose_bands(num_perm, threshold)
+
+        self._buckets = [{} for _ in range(self.bands)]
+        self._signatures = []
+        self.entries = []  # [{"text": ..., "sources": [...]}, ...]
+        self.seen = 0
+
+    def signature(self, text: str) -> tuple:
+        """MinHash signature of a text"""
+        shingles = _shingles(text, self.shingle_size)
+        if not shingles:
+            return tuple([_MAX_HASH] * self.num_perm)
+        return tuple(
+            min(((a * s + b) % _MERSENNE_PRIME) & _MAX_HASH for s in shingles)
+            for a, b in self._perms
+        )
+
+    def similarity(self, sig_a: tuple, sig_b: tuple) -> float:
+        """Estimated Jaccard similarity of two signatures"""
+        return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / self.num_perm
+
+    def add(self, text: str, source: dict = None) -> tuple:
+        """
+        Add a text to the index.
+
+        Returns:
+            (entry_id, is_duplicate) where entry_id is the index of the
+            entry that now holds this text's provenance
+        """
+        self.seen += 1
+        sig = self.signature(text)
+        band_keys = [sig[b * self.rows:(b + 1) * self.rows] for b in range(self.bands)]
+
+        candidates = set()
+        for band, key in enumerate(band_keys):
+            candidates.update(self._buckets[band].get(key, ()))
+
+        best_id, best_score = None, 0.0
+        for entry_id in candidates:
+            score = self.similarity(sig, self._signatures[entry_id])
+            if score >= self.threshold and score > best_score:
+                best_id, best_score = entry_id, score
+
+        if best_id is not None:
+            if source is not None:
+                self.entries[best_id]["sources"].append(dict(source, similarity=round(best_score, 3)))
+            return best_id, True
+
+        entry_id = len(self.entries)
+        self.entries.append({"text": text, "sources": [source] if source is not None else []})
+        self._signatures.append(sig)
+        for band, key in enumerate(band_keys):
+            self._buckets[band].setdefault(key, []).append(entry_id)
+        return entry_id, False
+
+    def report(self) -> dict:
+        """Summary of how much the index collapsed"""
+        unique = len(self.entries)
+        removed = self.seen - unique
+        return {
+            "input_chunks": self.seen,
+            "unique_chunks": unique,
+            "duplicates_removed": removed,
+            "reduction_ratio": round(removed / self.seen, 4) if self.seen else 0.0,
+            "threshold": self.threshold
+        }
+
+
+def deduplicate_chunks(chunks: list, threshold: float = 0.85, source_fields: tuple = (),
+                       index: NearDuplicateIndex = None) -> tuple:
+    """
+    Collapse near-duplicate chunks.
+
+    Args:
+        chunks: Chunk dicts with a 'text' key
+        threshold: Estimated Jaccard similarity at which chunks are merged
+        source_fields: Chunk keys copied into each provenance record
+        index: Optional shared index to dedupe against earlier documents
+
+    Returns:
+        (kept_chunks, report) - kept chunks gain a 'sources' list holding
+        the provenance of every chunk collapsed into them
+    """
+    index = index or NearDuplicateIndex(threshold=threshold)
+    seen_before = index.seen
+    entries_before = len(index.entries)
+
+    kept = []
+    for chunk in chunks:
+        source = {field: chunk.get(field) for field in source_fields}
+        entry_id, is_duplicate = index.add(chunk["text"], source)
+        if is_duplicate:
+            continue
+        # Share the entry's list so later duplicates extend this provenance
+        kept.append(dict(chunk, sources=index.entries[entry_id]["sources"]))
+
+    seen = index.seen - seen_before
+    removed = seen - (len(index.entries) - entries_before)
+    report = {
+        "input_chunks": seen,
+        "unique_chunks": len(kept),
+        "duplicates_removed": removed,
+        "reduction_ratio": round(removed / seen, 4) if seen else 0.0,
+        "threshold": index.threshold
+    }
+    return kept, report
@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+Online embedding-model migration for vector tables.
+
+Re-embeds a table into a new model and/or reduced `dimensions` without
+downtime:
+
+1. start    - add an "embedding_next" column and mark the table as migrating,
+              so loaders dual-write new rows into both columns
+2. backfill - re-embed existing rows in small batches (resumable)
+3. cutover  - index the new column, then swap the columns and the active
+              model in one transaction
+
+Writers embed with a briefly cached config, so they call
+lock_embedding_config inside their write transaction and re-embed if a
+cutover changed the model in the meantime.
+
+Usage:
+    python -m utils.embedding_migration assistant_knowledge_base --model text-embedding-3-large --dimensions 1024
+    python -m utils.embedding_migration assistant_knowledge_base --status
+    python -m utils.embedding_migration assistant_knowledge_base --abort
+"""
+
+import sys
+import time
+import argparse
+import threading
+from psycopg2 import sql
+from dotenv import load_dotenv
+from utils.supa import SupabaseClient
+from utils.embedding_store import embed_texts
+
+load_dotenv()
+
+# Native output size of each model (used when no reduced dimensions are set)
+MODEL_DIMENSIONS = {
+    'text-embedding-3-small': 1536,
+    'text-embedding-3-large': 3072,
+    'text-embedding-ada-002': 1536,
+}
+
+# Model each table was built with before it was tracked in embedding_models
+DEFAULT_TABLE_MODELS = {
+    'assistant_knowledge_base': ('text-embedding-3-small', None),
+    'analytics_query_cache': ('text-embedding-3-small', None),
+}
+FALLBACK_MODEL = ('text-embedding-3-large', None)
+
+# pgvector cannot build ivfflat/hnsw indexes above this many dimensions
+MAX_INDEXED_DIMENSIONS = 2000
+
+CONFIG_TTL_SECONDS = 30
+_config_cache = {}
+_config_lock = threading.Lock()
+
+
+def _state_table_exists(cur) -> bool:
+    cur.execute("SELECT to_regclass('public.embedding_models') IS NOT NULL AS present")
+    row = cur.fetchone()
+    return bool(row['present'] if isinstance(row, dict) else row[0])
+
+
+def _read_state(cur, schema: str, table: str):
+    if not _state_table_exists(cur):
+        return None
+    cur.execute("""
+        SELECT model, dimensions, status, target_model, target_dimensions, rows_migrated,
+               started_at, completed_at
+        FROM public.embedding_models
+        WHERE table_schema = %s AND table_name = %s
+    """, (schema, table))
+    return cur.fetchone()
+
+
+def get_embedding_config(table: str, schema: str = 'public', cur=None) -> tuple:
+    """
+    Model and dimensions to embed queries with for a table.
+
+    Pass the cursor the caller will search with to read the live value in
+    the same round trip; without one the answer is cached briefly.
+    """
+    default = DEFAULT_TABLE_MODELS.get(table, FALLBACK_MODEL)
+
+    if cur is not None:
+        state = _read_state(cur, schema, table)
+        return (state['model'], state['dimensions']) if state else default
+
+    key = (schema, table)
+    with _config_lock:
+        cached = _config_cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+    supabase = SupabaseClient(customer_schema="public")
+    try:
+        state = _read_state(supabase.cur, schema, table)
+        config = (state['model'], state['dimensions']) if state else default
+    except Exception as e:
+        print(f"Error reading embedding config for {schema}.{table}: {e}")
+        config = default
+    finally:
+        supabase.close()
+
+    with _config_lock:
+        _config_cache[key] = (time.monotonic() + CONFIG_TTL_SECONDS, config)
+    return config
+
+
+def get_migration_target(cur, table: str, schema: str = 'public'):
+    """(model, dimensions) loaders must also write to embedding_next, or None"""
+    state = _read_state(cur, schema, table)
+    if state and state['status'] == 'migrating':
+        return state['target_model'], state['target_dimensions']
+    return None
+
+
+def lock_embedding_config(cur, table: str, schema: str = 'public') -> tuple:
+    """
+    Live ((model, dimensions), migration target) for a write to a table.
+
+    Takes the ROW EXCLUSIVE lock writes take anyway first, so no cutover can
+    swap the columns until the caller's transaction ends; vectors embedded
+    with a cached config must match the returned one.
+    """
+    cur.execute(sql.SQL("LOCK TABLE {} IN ROW EXCLUSIVE MODE").format(sql.Identifier(schema, table)))
+    config = get_embedding_config(table, schema, cur=cur)
+    with _config_lock:
+        _config_cache[(schema, table)] = (time.monotonic() + CONFIG_TTL_SECONDS, config)
+    return config, get_migration_target(cur, table, schema)
+
+
+def invalidate_embedding_config(table: str = None, schema: str = 'public'):
+    """Forget cached configs (all of them when no table is given)"""
+    with _config_lock:
+        if table is None:
+            _config_cache.clear()
+        else:
+            _config_cache.pop((schema, table), None)
+
+
+def vector_literal(vector: list) -> str:
+    """pgvector text format"""
+    return '[' + ','.join(str(x) for x in vector) + ']'
+
+
+class EmbeddingMigration:
+    """Re-embed one table into a new model/dimensions while it stays online"""
+
+    def __init__(self, table: str, target_model: str = None, target_dimensions: int = None,
+                 schema: str = 'public', text_column: str = 'text_content', key_column: str = 'id',
+                 batch_size: int = 100, drop_old: bool = True):
+        self.table = table
+        self.schema = schema
+        self.target_model = target_model
+        self.target_dimensions = target_dimensions
+        self.text_column = text_column
+        self.key_column = key_column
+        self.batch_size = batch_size
+        self.drop_old = drop_old
+
+    def _ident(self):
+        return sql.Identifier(self.schema, self.table)
+
+    def _target_size(self) -> int:
+        if self.target_dimensions:
+            return self.target_dimensions
+        if self.target_model not in MODEL_DIMENSIONS:
+            raise ValueError(f"Unknown model {self.target_model}; pass --dimensions")
+        return MODEL_DIMENSIONS[self.target_model]
+
+    def status(self) -> dict:
+        supabase = SupabaseClient(customer_schema="public")
+        try:
+            state = _read_state(supabase.cur, self.schema, self.table)
+            if not state:
+                return {"table": f"{self.schema}.{self.table}", "status": "untracked"}
+            result = dict(state)
+            if state['status'] == 'migrating':
+                supabase.cur.execute(sql.SQL(
+                    "SELECT COUNT(*) AS remaining FROM {} WHERE embedding_next IS NULL"
+                ).format(self._ident()))
+                result['rows_remaining'] = supabase.cur.fetchone()['remaining']
+            return result
+        finally:
+            supabase.close()
+
+    def start(self):
+        """Add the shadow column and switch loaders to dual-writing"""
+        if not self.target_model:
+            raise ValueError("target_model is required to start a migration")
+
+        current_model, current_dims = get_embedding_config(self.table, self.schema)
+        supabase = SupabaseClient(customer_schema="public")
+        try:
+            state = _read_state(supabase.cur, self.schema, self.table)
+            if state and state['status'] == 'migrating':
+                if (state['target_model'], state['target_dimensions']) != (self.target_model, self.target_dimensions):
+                    raise RuntimeError(
+                        f"{self.schema}.{self.table} is already migrating to "
+                        f"{state['target_model']} ({state['target_dimensions'] or 'default'} dims); abort it first"
+                    )
+                print(f"Resuming migration of {self.schema}.{self.table}")
+                return
+
+            supabase.cur.execute(sql.SQL(
+                "ALTER TABLE {} ADD COLUMN IF NOT EXISTS embedding_next vector({})"
+            ).format(self._ident(), sql.Literal(self._target_size())))
+
+            supabase.cur.execute("""
+                INSERT INTO public.embedding_models
+                    (table_schema, table_name, model, dimensions, status,
+                     target_model, target_dimensions, rows_migrated, started_at, updated_at)
+                VALUES (%s, %s, %s, %s, 'migrating', %s, %s, 0, NOW(), NOW())
+                ON CONFLICT (table_schema, table_name) DO UPDATE SET
+                    status = 'migrating',
+                    target_model = EXCLUDED.target_model,
+                    target_dimensions = EXCLUDED.target_dimensions,
+                    rows_migrated = 0,
+                    started_at = NOW(),
+                    completed_at = NULL,
+                    updated_at = NOW()
+            """, (self.schema, self.table, current_model, current_dims,
+                  self.target_model, self.target_dimensions))
+            supabase.commit()
+            print(f"✅ Started migration of {self.schema}.{self.table}: "
+                  f"{current_model} -> {self.target_model} ({self._target_size()} dims)")
+        except Exception:
+            supabase.rollback()
+            raise
+        finally:
+            supabase.close()
+
+    def _backfill_batch(self, supabase) -> int:
+        """Re-embed one batch of rows still missing embedding_next"""
+        supabase.cur.execute(sql.SQL("""
+            SELECT {key} AS key, {text} AS text
+            FROM {table}
+            WHERE embedding_next IS NULL
+            ORDER BY {key}
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """).format(
+            key=sql.Identifier(self.key_column),
+            text=sql.Identifier(self.text_column),
+            table=self._ident()
+        ), (self.batch_size,))
+        rows = supabase.cur.fetchall()
+        if not rows:
+            return 0
+
+        vectors = embed_texts([r['text'] for r in rows], self.target_model, self.target_dimensions)
+        supabase.cur.executemany(sql.SQL(
+            "UPDATE {} SET embedding_next = %s::vector WHERE {} = %s"
+        ).format(self._ident(), sql.Identifier(self.key_column)), [
+            (vector_literal(v), r['key']) for r, v in zip(rows, vectors)
+        ])
+        supabase.cur.execute("""
+            UPDATE public.embedding_models
+            SET rows_migrated = rows_migrated + %s, updated_at = NOW()
+            WHERE table_schema = %s AND table_name = %s
+        """, (len(rows), self.schema, self.table))
+        return len(rows)
+
+    def backfill(self, max_batches: int = None) -> int:
+        """Re-embed existing rows batch by batch; safe to interrupt and resume"""
+        total = 0
+        batches = 0
+        supabase = SupabaseClient(customer_schema="public")
+        try:
+            while max_batches is None or batches < max_batches:
+                migrated = self._backfill_batch(supabase)
+                supabase.commit()
+                if not migrated:
+                    break
+                total += migrated
+                batches += 1
+                print(f"  Re-embedded {total} rows...")
+            return total
+        except Exception:
+            supabase.rollback()
+            raise
+        finally:
+            supabase.close()
+
+    def _create_index(self):
+        """Build the vector index on the new column without blocking writes"""
+        size = self._target_size()
+        if size > MAX_INDEXED_DIMENSIONS:
+            print(f"⚠️  {size} dims is above pgvector's index limit; skipping index")
+            return
+
+        supabase = SupabaseClient(customer_schema="public")
+        try:
+            supabase.conn.autocommit = True  # CONCURRENTLY cannot run in a transaction
+            supabase.cur.execute(sql.SQL("""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS {index}
+                ON {table} USING ivfflat (embedding_next vector_cosine_ops)
+                WITH (lists = 100)
+            """).format(
+                index=sql.Identifier(f"{self.table}_embedding_{size}_idx"),
+                table=self._ident()
+            ))
+        finally:
+            supabase.close()
+
+    def cutover(self):
+        """Swap embedding_next in as the live column, atomically"""
+        state = self.status()
+        if state.get('status') != 'migrating':
+            raise RuntimeError(f"{self.schema}.{self.table} has no migration in progress")
+        self.target_model = state['target_model']
+        self.target_dimensions = state['target_dimensions']
+
+        # Re-embed outside the lock; writers dual-write rows added meanwhile
+        self.backfill()
+        self._create_index()
+
+        supabase = SupabaseClient(customer_schema="public")
+        try:
+            # Block writers only for the swap itself: no embedding calls under the lock
+            supabase.cur.execute(sql.SQL("LOCK TABLE {} IN SHARE ROW EXCLUSIVE MODE").format(self._ident()))
+            supabase.cur.execute(sql.SQL(
+                "SELECT COUNT(*) AS remaining FROM {} WHERE embedding_next IS NULL"
+            ).format(self._ident()))
+            remaining = supabase.cur.fetchone()['remaining']
+            if remaining:
+                raise RuntimeError(
+                    f"{remaining} rows of {self.schema}.{self.table} were written without embedding_next "
+                    f"during cutover; run it again"
+                )
+
+            supabase.cur.execute(sql.SQL(
+                "ALTER TABLE {table} RENAME COLUMN embedding TO embedding_prev"
+            ).format(table=self._ident()))
+            supabase.cur.execute(sql.SQL(
+                "ALTER TABLE {table} RENAME COLUMN embedding_next TO embedding"
+            ).format(table=self._ident()))
+            supabase.cur.execute(sql.SQL(
+                "ALTER TABLE {table} ALTER COLUMN embedding SET NOT NULL"
+            ).format(table=self._ident()))
+            if self.drop_old:
+                supabase.cur.execute(sql.SQL(
+                    "ALTER TABLE {table} DROP COLUMN embedding_prev"
+                ).format(table=self._ident()))
+
+            supabase.cur.execute("""
+                UPDATE public.embedding_models
+                SET model = target_model,
+                    dimensions = target_dimensions,
+                    status = 'active',
+                    target_model = NULL,
+                    target_dimensions = NULL,
+                    completed_at = NOW(),
+                    updated_at = NOW()
+                WHERE table_schema = %s AND table_name = %s
+            """, (self.schema, self.table))
+            supabase.commit()
+            invalidate_embedding_config(self.table, self.schema)
+            print(f"✅ {self.schema}.{self.table} now serves {self.target_model} embeddings")
+        except Exception:
+            supabase.rollback()
+            raise
+        finally:
+            supabase.close()
+
+    def abort(self):
+        """Drop the shadow column and keep the current model"""
+        supabase = SupabaseClient(customer_schema="public")
+        try:
+            supabase.cur.execute(sql.SQL(
+                "ALTER TABLE {} DROP COLUMN IF EXISTS embedding_next"
+            ).format(self._ident()))
+            supabase.cur.execute("""
+                UPDATE public.embedding_models
+                SET status = 'active', target_model = NULL, target_dimensions = NULL, updated_at = NOW()
+                WHERE table_schema = %s AND table_name = %s
+            """, (self.schema, self.table))
+            supabase.commit()
+            print(f"Aborted migration of {self.schema}.{self.table}")
+        except Exception:
+            supabase.rollback()
+            raise
+        finally:
+            supabase.close()
+
+    def run(self):
+        """Start (or resume), backfill and cut over"""
+        self.start()
+        self.backfill()
+        self.cutover()
+
+
+def start_background_migration(migration: EmbeddingMigration) -> threading.Thread:
+    """Run a migration on a daemon thread; the service keeps serving meanwhile"""
+    def _run():
+        try:
+            migration.run()
+        except Exception as e:
+            print(f"❌ Embedding migration of {migration.schema}.{migration.table} failed: {e}")
+
+    thread = threading.Thread(target=_run, name=f"embedding-migration-{migration.table}", daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-embed a vector table online")
+    parser.add_argument("table")
+    parser.add_argument("--schema", default="public")
+    parser.add_argument("--model", help="Target embedding model")
+    parser.add_argument("--dimensions", type=int, help="Reduced output dimensions")
+    parser.add_argument("--text-column", default="text_content")
+    parser.add_argument("--key-column", default="id")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--keep-old", action="store_true", help="Keep the old column as embedding_prev")
+    parser.add_argument("--status", action="store_true")
+    parser.add_argument("--abort", action="store_true")
+    parser.add_argument("--no-cutover", action="store_true", help="Start and backfill only")
+    args = parser.parse_args(argv)
+
+    migration = EmbeddingMigration(
+        args.table,
+        target_model=args.model,
+        target_dimensions=args.dimensions,
+        schema=args.schema,
+        text_column=args.text_column,
+        key_column=args.key_column,
+        batch_size=args.batch_size,
+        drop_old=not args.keep_old
+    )
+
+    if args.status:
+        for key, value in migration.status().items():
+            print(f"  {key}: {value}")
+        return 0
+    if args.abort:
+        migration.abort()
+        return 0
+
+    if not args.model:
+        parser.error("--model is required to run a migration")
+
+    migration.start()
+    migration.backfill()
+    if not args.no_cutover:
+        migration.cutover()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
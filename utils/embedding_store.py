@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Content-addressed local embedding store.
+
+Embeddings are keyed by (model, dimensions, sha256(text)) in a SQLite file,
+so every ingestion path and query embedder only pays OpenAI for text it has
+never embedded before. The store is size-bounded (least recently used rows
+are evicted first) and can be exported/imported to start CI or a new
+environment warm:
+
+    python -m utils.embedding_store stats
+    python -m utils.embedding_store export embeddings_snapshot.sqlite3
+    python -m utils.embedding_store import embeddings_snapshot.sqlite3
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+from array import array
+from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_STORE_PATH = os.getenv('EMBEDDING_STORE_PATH', '.cache/embeddings.sqlite3')
+DEFAULT_MAX_BYTES = int(os.getenv('EMBEDDING_STORE_MAX_MB', '512')) * 1024 * 1024
+EMBEDDING_BATCH_SIZE = 512  # OpenAI accepts up to 2048 inputs per request
+# Cache hits only note last_used in memory; it is written out this often
+TOUCH_FLUSH_SECONDS = 60
+TOUCH_FLUSH_ENTRIES = 10000
+
+
+def text_hash(text: str) -> str:
+    """Content address of a text"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingStore:
+    """SQLite-backed (model, dimensions, sha256) -> float32 vector store"""
+
+    def __init__(self, path: str = None, max_bytes: int = None):
+        self.path = Path(path or DEFAULT_STORE_PATH)
+        self.max_bytes = max_bytes if max_bytes is not None else DEFAULT_MAX_BYTES
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._touched = {}  # (model, dims, hash) -> last_used not yet written
+        self._touched_flushed = time.monotonic()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                dimensions INTEGER NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, dimensions, text_hash)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used_idx ON embeddings(last_used)")
+        self._conn.commit()
+
+    def get_many(self, model: str, dimensions: int, texts: list) -> list:
+        """Look up vectors for texts; misses come back as None"""
+        dims = dimensions or 0
+        hashes = [text_hash(t) for t in texts]
+        found = {}
+
+        with self._lock:
+            unique = list(dict.fromkeys(hashes))
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND dimensions = ? AND text_hash IN ({placeholders})",
+                    [model, dims, *batch]
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = array('f', blob).tolist()
+
+            now = time.time()
+            for h in found:
+                self._touched[(model, dims, h)] = now
+            if (len(self._touched) >= TOUCH_FLUSH_ENTRIES
+                    or time.monotonic() - self._touched_flushed > TOUCH_FLUSH_SECONDS):
+                self._flush_touched()
+
+        return [found.get(h) for h in hashes]
+
+    def _flush_touched(self):
+        """Write pending last_used times in one transaction (caller holds the lock)"""
+        self._touched_flushed = time.monotonic()
+        if not self._touched:
+            return
+        self._conn.executemany(
+            "UPDATE embeddings SET last_used = ? WHERE model = ? AND dimensions = ? AND text_hash = ?",
+            [(used, model, dims, h) for (model, dims, h), used in self._touched.items()]
+        )
+        self._conn.commit()
+        self._touched.clear()
+
+    def put_many(self, model: str, dimensions: int, texts: list, vectors: list):
+        """Store vectors for texts, evicting old entries if over budget"""
+        dims = dimensions or 0
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            blob = array('f', vector).tobytes()
+            rows.append((model, dims, text_hash(text), blob, len(blob), now))
+
+        with self._lock:
+            self._conn.executemany("""
+                INSERT OR REPLACE INTO embeddings (model, dimensions, text_hash, vector, size, last_used)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, rows)
+            self._conn.commit()
+        self.evict()
+
+    def evict(self) -> int:
+        """Drop least recently used vectors until the store fits max_bytes"""
+        if not self.max_bytes:
+            return 0
+
+        with self._lock:
+            self._flush_touched()
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+
+            excess = total - self.max_bytes
+            cursor = self._conn.execute(
+                "SELECT model, dimensions, text_hash, size FROM embeddings ORDER BY last_used"
+            )
+            victims = []
+            for model, dims, h, size in cursor:
+                victims.append((model, dims, h))
+                excess -= size
+                if excess <= 0:
+                    break
+
+            self._conn.executemany(
+                "DELETE FROM embeddings WHERE model = ? AND dimensions = ? AND text_hash = ?",
+                victims
+            )
+            self._conn.commit()
+            removed = len(victims)
+        return removed
+
+    def stats(self) -> dict:
+        """Entry counts and sizes per model"""
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT model, dimensions, COUNT(*), COALESCE(SUM(size), 0)
+                FROM embeddings
+                GROUP BY model, dimensions
+                ORDER BY model, dimensions
+            """).fetchall()
+        return {
+            "path": str(self.path),
+            "max_bytes": self.max_bytes,
+            "total_bytes": sum(r[3] for r in rows),
+            "models": [
+                {"model": r[0], "dimensions": r[1] or None, "entries": r[2], "bytes": r[3]}
+                for r in rows
+            ]
+        }
+
+    def export_to(self, path: str) -> int:
+        """Write a consistent copy of the store to path"""
+        target = sqlite3.connect(str(path))
+        try:
+            with self._lock:
+                self._flush_touched()
+                self._conn.backup(target)
+            return target.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        finally:
+            target.close()
+
+    def import_from(self, path: str) -> int:
+        """Merge vectors from an exported store; existing entries win"""
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("ATTACH DATABASE ? AS incoming", (str(path),))
+            try:
+                self._conn.execute("""
+                    INSERT OR IGNORE INTO embeddings (model, dimensions, text_hash, vector, size, last_used)
+                    SELECT model, dimensions, text_hash, vector, size, last_used FROM incoming.embeddings
+                """)
+                self._conn.commit()
+            finally:
+                self._conn.execute("DETACH DATABASE incoming")
+            imported = self._conn.total_changes - before
+        self.evict()
+        return imported
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self._conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_embedding_store() -> EmbeddingStore:
+    """Process-wide store at EMBEDDING_STORE_PATH"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = EmbeddingStore()
+    return _store
+
+
+def embed_texts(texts: list, model: str, dimensions: int = None, client=None,
+                store: EmbeddingStore = None) -> list:
+    """
+    Embed texts through the local store, calling OpenAI only for misses.
+
+    Args:
+        texts: Texts to embed
+        model: OpenAI embedding model name
+        dimensions: Optional reduced output dimensions
+        client: Optional OpenAI client (one is created on demand)
+        store: Optional store (defaults to the process-wide store)
+
+    Returns:
+        List of embedding vectors in the order of texts
+    """
+    store = store or get_embedding_store()
+    vectors = store.get_many(model, dimensions, texts)
+
+    missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+    if missing:
+        if client is None:
+            from openai import OpenAI
+            client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+
+        fresh = {}
+        for start in range(0, len(missing), EMBEDDING_BATCH_SIZE):
+            batch = missing[start:start + EMBEDDING_BATCH_SIZE]
+            kwargs = {"input": batch, "model": model}
+            if dimensions:
+                kwargs["dimensions"] = dimensions
+            response = client.embeddings.create(**kwargs)
+            batch_vectors = [item.embedding for item in response.data]
+            store.put_many(model, dimensions, batch, batch_vectors)
+            fresh.update(zip(batch, batch_vectors))
+
+        vectors = [v if v is not None else fresh[t] for t, v in zip(texts, vectors)]
+
+    return vectors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the local embedding store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="Show entry counts per model")
+    export_cmd = sub.add_parser("export", help="Copy the store to a file")
+    export_cmd.add_argument("path")
+    import_cmd = sub.add_parser("import", help="Merge an exported store")
+    import_cmd.add_argument("path")
+    sub.add_parser("evict", help="Evict down to EMBEDDING_STORE_MAX_MB")
+    args = parser.parse_args(argv)
+
+    store = get_embedding_store()
+    if args.command == "stats":
+        stats = store.stats()
+        print(f"Store: {stats['path']} ({stats['total_bytes'] / 1e6:.1f} MB of {stats['max_bytes'] / 1e6:.0f} MB)")
+        for m in stats['models']:
+            print(f"  {m['model']} [{m['dimensions'] or 'default'} dims]: {m['entries']} vectors, {m['bytes'] / 1e6:.1f} MB")
+    elif args.command == "export":
+        count = store.export_to(args.path)
+        print(f"✅ Exported {count} vectors to {args.path}")
+    elif args.command == "import":
+        if not os.path.exists(args.path):
+            print(f"❌ No such file: {args.path}")
+            return 1
+        count = store.import_from(args.path)
+        print(f"✅ Imported {count} new vectors from {args.path}")
+    elif args.command == "evict":
+        print(f"Evicted {store.evict()} vectors")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
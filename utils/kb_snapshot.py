@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Memory-mappable snapshots of knowledge-base / chunk tables.
+
+A snapshot bundle is a directory holding:
+    manifest.json   - format version, source table, embedding model, dtype, row count
+    embeddings.npy  - (rows, dims) float32/float16 matrix of L2-normalized vectors
+    records.bin     - UTF-8 JSON of every row's non-vector columns, back to back
+    offsets.npy     - uint64 byte offsets into records.bin (rows + 1 entries)
+
+Workers open the bundle with np.load(mmap_mode='r') instead of pulling rows
+from Postgres, so booting takes milliseconds and forked workers share pages.
+
+The bundle path is a symlink to a versioned directory next to it. Each export
+writes a new directory and swaps the link, so a reader opens either the old
+bundle or the new one, never a mix.
+
+Usage:
+    python -m utils.kb_snapshot export snapshots/assistant_kb --table assistant_knowledge_base --dtype float16
+    python -m utils.kb_snapshot info snapshots/assistant_kb
+"""
+
+import os
+import sys
+import json
+import mmap
+import shutil
+import argparse
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+import numpy as np
+from psycopg2 import sql
+from dotenv import load_dotenv
+from utils.supa import SupabaseClient
+from utils.embedding_migration import get_embedding_config
+
+load_dotenv()
+
+SNAPSHOT_FORMAT_VERSION = 1
+SUPPORTED_DTYPES = ('float32', 'float16')
+FETCH_SIZE = 1000
+
+
+def _parse_vector(value) -> np.ndarray:
+    """pgvector text format ('[0.1,0.2,...]') or a list -> float32 array"""
+    if isinstance(value, str):
+        return np.array(value.strip('[]').split(','), dtype=np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+
+def export_snapshot(out_dir: str, table: str = 'assistant_knowledge_base', schema: str = 'public',
+                    dtype: str = 'float32', vector_column: str = 'embedding') -> dict:
+    """
+    Write a table to a snapshot bundle.
+
+    The bundle is built in a new directory next to out_dir, then out_dir
+    (a symlink) is swapped to it with os.replace, so readers never see a
+    half-written or missing snapshot. The previous bundle is kept for
+    readers still opening it; older ones are removed.
+
+    Returns:
+        The bundle manifest
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"dtype must be one of {SUPPORTED_DTYPES}")
+
+    out_path = Path(out_dir)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = Path(tempfile.mkdtemp(prefix=f".{out_path.name}-", dir=out_path.parent))
+
+    supabase = SupabaseClient(customer_schema="public")
+    try:
+        model, dimensions = get_embedding_config(table, schema, cur=supabase.cur)
+        table_ident = sql.Identifier(schema, table)
+
+        supabase.cur.execute(sql.SQL("SELECT COUNT(*) AS count FROM {}").format(table_ident))
+        count = supabase.cur.fetchone()['count']
+
+        # Stream rows through a server-side cursor instead of one big fetchall
+        cur = supabase.conn.cursor(name='kb_snapshot_export')
+        cur.itersize = FETCH_SIZE
+        cur.execute(sql.SQL("SELECT * FROM {} ORDER BY 1").format(table_ident))
+
+        matrix = None
+        offsets = np.zeros(count + 1, dtype=np.uint64)
+        written = 0
+        with open(tmp_path / 'records.bin', 'wb') as records:
+            for row in cur:
+                if written == count:
+                    break  # rows inserted after the COUNT are left for the next snapshot
+                vector = _parse_vector(row[vector_column])
+                if matrix is None:
+                    matrix = np.lib.format.open_memmap(
+                        tmp_path / 'embeddings.npy', mode='w+', dtype=dtype, shape=(count, vector.shape[0])
+                    )
+                norm = np.linalg.norm(vector)
+                matrix[written] = vector / norm if norm else vector
+
+                record = {k: v for k, v in row.items() if k != vector_column}
+                encoded = json.dumps(record, default=str, ensure_ascii=False).encode('utf-8')
+                records.write(encoded)
+                offsets[written + 1] = offsets[written] + len(encoded)
+                written += 1
+        cur.close()
+
+        if matrix is None:
+            matrix = np.lib.format.open_memmap(tmp_path / 'embeddings.npy', mode='w+', dtype=dtype, shape=(0, 0))
+        else:
+            matrix.flush()
+        if written < count:
+            # Rows were deleted while exporting; trim the preallocated matrix
+            trimmed = np.array(matrix[:written])
+            del matrix
+            np.save(tmp_path / 'embeddings.npy', trimmed)
+            offsets = offsets[:written + 1]
+        else:
+            del matrix
+        np.save(tmp_path / 'offsets.npy', offsets)
+
+        manifest = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "schema": schema,
+            "table": table,
+            "model": model,
+            "dimensions": dimensions,
+            "dtype": dtype,
+            "count": written,
+            "normalized": True,
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }
+        with open(tmp_path / 'manifest.json', 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        _publish(tmp_path, out_path)
+        return manifest
+
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    finally:
+        supabase.close()
+
+
+def _publish(bundle_path: Path, out_path: Path):
+    """Point the out_path symlink at a finished bundle and prune old bundles"""
+    previous = os.readlink(out_path) if out_path.is_symlink() else None
+    if previous is None and out_path.exists():
+        # Bundle written before out_path became a symlink: move it aside once
+        previous = f"{bundle_path.name}-legacy"
+        os.replace(out_path, out_path.parent / previous)
+
+    link_tmp = out_path.parent / f".{out_path.name}.link-{os.getpid()}"
+    if link_tmp.is_symlink():
+        link_tmp.unlink()
+    os.symlink(bundle_path.name, link_tmp)
+    os.replace(link_tmp, out_path)
+
+    keep = {bundle_path.name, os.path.basename(previous or '')}
+    for old in out_path.parent.glob(f".{out_path.name}-*"):
+        if old.name not in keep and (old / 'manifest.json').exists():
+            shutil.rmtree(old, ignore_errors=True)
+
+
+class KBSnapshot:
+    """Read-only, memory-mapped view of a snapshot bundle"""
+
+    def __init__(self, path: str):
+        # Resolve the symlink once so every file comes from the same bundle
+        self.path = Path(path).resolve()
+        with open(self.path / 'manifest.json') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported snapshot format {self.manifest.get('format_version')} "
+                f"(expected {SNAPSHOT_FORMAT_VERSION})"
+            )
+
+        self.embeddings = np.load(self.path / 'embeddings.npy', mmap_mode='r')
+        self.offsets = np.load(self.path / 'offsets.npy', mmap_mode='r')
+        self._records_file = open(self.path / 'records.bin', 'rb')
+        size = os.fstat(self._records_file.fileno()).st_size
+        self._records = mmap.mmap(self._records_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self._chunk_types = None
+
+    @property
+    def model(self) -> str:
+        return self.manifest['model']
+
+    @property
+    def dimensions(self):
+        return self.manifest['dimensions']
+
+    def __len__(self) -> int:
+        return int(self.manifest['count'])
+
+    def record(self, i: int) -> dict:
+        """Non-vector columns of row i"""
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return json.loads(self._records[start:end])
+
+    def _rows_of_type(self, chunk_type: str) -> np.ndarray:
+        if self._chunk_types is None:
+            self._chunk_types = np.array([self.record(i).get('chunk_type') for i in range(len(self))], dtype=object)
+        return np.nonzero(self._chunk_types == chunk_type)[0]
+
+    def by_type(self, chunk_type: str, limit: int) -> list:
+        """First rows of a chunk type, shaped like the database results"""
+        results = []
+        for i in self._rows_of_type(chunk_type)[:limit]:
+            record = self.record(int(i))
+            record['similarity'] = 1.0
+            results.append(record)
+        return results
+
+    def search(self, query_vector: list, limit: int = 5, chunk_type: str = None) -> list:
+        """Top rows by cosine similarity, shaped like the database results"""
+        if not len(self):
+            return []
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        candidates = self._rows_of_type(chunk_type) if chunk_type else None
+        matrix = self.embeddings if candidates is None else self.embeddings[candidates]
+        scores = matrix.dot(query.astype(matrix.dtype)).astype(np.float32)
+
+        limit = min(limit, scores.shape[0])
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for idx in top:
+            row = int(idx) if candidates is None else int(candidates[idx])
+            record = self.record(row)
+            record['similarity'] = float(scores[idx])
+            results.append(record)
+        return results
+
+    def close(self):
+        if isinstance(self._records, mmap.mmap):
+            self._records.close()
+        self._records_file.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or inspect knowledge-base snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_cmd = sub.add_parser("export", help="Write a table to a snapshot bundle")
+    export_cmd.add_argument("out_dir")
+    export_cmd.add_argument("--table", default="assistant_knowledge_base")
+    export_cmd.add_argument("--schema", default="public")
+    export_cmd.add_argument("--dtype", choices=SUPPORTED_DTYPES, default="float32")
+    info_cmd = sub.add_parser("info", help="Show a bundle's manifest")
+    info_cmd.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        manifest = export_snapshot(args.out_dir, args.table, args.schema, args.dtype)
+        print(f"✅ Exported {manifest['count']} rows of {args.schema}.{args.table} to {args.out_dir}")
+    else:
+        snapshot = KBSnapshot(args.path)
+        for key, value in snapshot.manifest.items():
+            print(f"  {key}: {value}")
+        snapshot.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,11 +10,19 @@ Simple PDF Parser and Text Chunker
 """
 
 import os
+import json
 from pathlib import Path
 import PyPDF2
 from openai import OpenAI
 import numpy as np
 import supabase
+from utils.dedup import NearDuplicateIndex, deduplicate_chunks
+from utils.embedding_store import embed_texts
+from utils.embedding_migration import get_embedding_config, lock_embedding_config
+
+# Estimated Jaccard similarity at which chunks are collapsed before embedding
+DEDUP_THRESHOLD = float(os.getenv('PDF_DEDUP_THRESHOLD', '0.85'))
+
 
 def extract_text_from_pdf(pdf_path: Path) -> str:
     """Extract all text from a PDF file."""
@@ -61,14 +69,14 @@ def chunk_text(text: str, chunk_size: int = 50, overlap: int = 10):
     ]
 
 
-def embed_chunks(chunks: list[dict]):
-    """Embed chunks using OpenAI's API."""
-    client = OpenAI()
-    embeddings = client.embeddings.create(
-        input=[chunk['text'] for chunk in chunks],
-        model="text-embedding-3-large"
+def embed_chunks(chunks: list[dict], model: str = "text-embedding-3-large", dimensions: int = None):
+    """Embed chunks using OpenAI's API, reading through the local store."""
+    return embed_texts(
+        [chunk['text'] for chunk in chunks],
+        model=model,
+        dimensions=dimensions,
+        client=OpenAI()
     )
-    return embeddings
 
 def process_pdf(pdf_path: Path):
     text = extract_text_from_pdf(pdf_path)
@@ -76,37 +84,85 @@ def process_pdf(pdf_path: Path):
     embeddings = embed_chunks(chunks)
     return chunks, embeddings
 
-def upload_to_supabase(pdf_path: Path, table_name: str):
+def chunk_pdfs(pdf_paths: list[Path], index: NearDuplicateIndex = None):
+    """
+    Chunk several PDFs and collapse near-duplicate chunks across all of them.
+    Kept chunks carry a 'sources' list with every (file, chunk) they replace.
+    """
+    index = index or NearDuplicateIndex(threshold=DEDUP_THRESHOLD)
+    all_chunks = []
+    for pdf_path in pdf_paths:
+        text = extract_text_from_pdf(pdf_path)
+        for chunk in chunk_text(text):
+            chunk['source_file'] = pdf_path.name
+            all_chunks.append(chunk)
+
+    chunks, report = deduplicate_chunks(
+        all_chunks,
+        source_fields=("source_file", "chunk_number"),
+        index=index
+    )
+    print(f"Kept {report['unique_chunks']}/{report['input_chunks']} chunks "
+          f"({report['reduction_ratio']:.1%} near-duplicate reduction)")
+    return chunks, report
+
+
+def upload_to_supabase(pdf_path: Path, table_name: str, schema: str = "Legends"):
     """Upload pdf chunks and embeddings to Supabase."""
+    upload_chunks_to_supabase([pdf_path], table_name, schema)
+
+
+def upload_chunks_to_supabase(pdf_paths: list[Path], table_name: str, schema: str = "Legends"):
+    """Upload deduplicated chunks of one or more PDFs and their embeddings."""
     
-    # Process PDF
-    text = extract_text_from_pdf(pdf_path)
-    chunks = chunk_text(text)
+    # Process PDFs
+    chunks, _ = chunk_pdfs(pdf_paths)
     if not chunks:
-        print(f"No chunks to upload for {pdf_path}")
+        print(f"No chunks to upload for {', '.join(p.name for p in pdf_paths)}")
         return
     
-    # Get embeddings for chunks
-    embeddings = embed_chunks(chunks)
+    # Get embeddings for chunks with the model the table currently holds
+    model, dimensions = get_embedding_config(table_name, schema)
+    embeddings = embed_chunks(chunks, model, dimensions)
     
     # Connect to database
-    supabase = SupabaseClient(customer_schema="Legends")
+    supabase = SupabaseClient(customer_schema=schema)
     
     try:
+        # Live model under the table lock: a cutover may have happened since embedding
+        config, target = lock_embedding_config(supabase.cur, table_name, schema)
+        if config != (model, dimensions):
+            print(f"Embedding model of {table_name} is now {config[0]}, re-embedding...")
+            embeddings = embed_chunks(chunks, *config)
+
+        # Dual-write the migration target while an embedding migration runs
+        next_embeddings = embed_chunks(chunks, *target) if target else None
+
+        # Provenance of collapsed duplicates lives alongside the kept chunk
+        supabase.cur.execute(f"""
+            ALTER TABLE {supabase.customer_schema}.{table_name}
+            ADD COLUMN IF NOT EXISTS sources JSONB DEFAULT '[]'::jsonb
+        """)
+
         # Insert chunks and embeddings into single table
+        next_column = ", embedding_next" if target else ""
+        next_placeholder = ", %s" if target else ""
         for i, chunk in enumerate(chunks):
-            embedding_data = embeddings.data[i]
-            supabase.cur.execute("""
-                INSERT INTO {supabase.customer_schema}.{table_name}  
-                (index, embedding, source_file, chunk_number, text_content, created_at)
-                VALUES (%s, %s, %s, %s, %s, NOW())
-            """, (
+            values = [
                 i,
-                embedding_data.embedding,
-                pdf_path.name,
+                embeddings[i],
+                chunk['source_file'],
                 chunk['chunk_number'],
-                chunk['text']
-            ))
+                chunk['text'],
+                json.dumps(chunk['sources'])
+            ]
+            if target:
+                values.append(next_embeddings[i])
+            supabase.cur.execute(f"""
+                INSERT INTO {supabase.customer_schema}.{table_name}  
+                (index, embedding, source_file, chunk_number, text_content, sources{next_column}, created_at)
+                VALUES (%s, %s, %s, %s, %s, %s::jsonb{next_placeholder}, NOW())
+            """, values)
         
         supabase.commit()
         print(f"Successfully uploaded {len(chunks)} chunks and embeddings")
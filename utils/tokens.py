@@ -0,0 +1,32 @@
+"""
+Token counting helpers shared by the chunkers and prompt builders.
+Uses tiktoken when it is installed, otherwise falls back to a cheap estimate.
+"""
+
+import re
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken is optional
+    tiktoken = None
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+_encoders = {}
+
+
+def count_tokens(text: str, encoding: str = "cl100k_base") -> int:
+    """Count tokens in text (exact with tiktoken, approximate without)"""
+    if not text:
+        return 0
+
+    if tiktoken is not None:
+        encoder = _encoders.get(encoding)
+        if encoder is None:
+            encoder = _encoders[encoding] = tiktoken.get_encoding(encoding)
+        return len(encoder.encode(text))
+
+    # Approximation: long words split into ~4 character pieces
+    count = 0
+    for piece in _TOKEN_PATTERN.findall(text):
+        count += max(1, (len(piece) + 3) // 4)
+    return count